@@ -0,0 +1,115 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Non-blocking logging: callers only enqueue records, a background listener
+thread formats and writes them.
+"""
+
+import atexit
+import logging
+import threading
+
+from six.moves import queue
+
+
+# Started listeners, all stopped by one hook at interpreter exit.
+_running = set()
+_running_lock = threading.Lock()
+
+
+class QueueHandler(logging.Handler):
+    """
+    Enqueues records without blocking.
+
+    Unlike ``logging.handlers.QueueHandler`` the record is not formatted in
+    the calling thread; formatting is left to the handlers behind the
+    listener.  When the queue is full the record is dropped and counted in
+    ``dropped``.
+    """
+
+    def __init__(self, queue):
+        logging.Handler.__init__(self)
+        self.queue = queue
+        self.dropped = 0
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class QueueListener(object):
+    """Hands queued records to ``handlers`` from a daemon thread."""
+
+    _sentinel = None
+
+    def __init__(self, queue, *handlers):
+        self.queue = queue
+        self.handlers = handlers
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._monitor,
+                                        name='lbaas-log-listener')
+        self._thread.daemon = True
+        self._thread.start()
+        with _running_lock:
+            _running.add(self)
+
+    def _monitor(self):
+        while True:
+            record = self.queue.get()
+            if record is self._sentinel:
+                break
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+    def stop(self):
+        """Flush everything queued so far and stop the listener thread."""
+        if self._thread is None:
+            return
+        with _running_lock:
+            _running.discard(self)
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+        for handler in self.handlers:
+            # At exit, the stream may be closed already, e.g. sys.stderr.
+            stream = getattr(handler, 'stream', None)
+            if not getattr(stream, 'closed', False):
+                handler.flush()
+
+
+def _stop_all():
+    with _running_lock:
+        listeners = list(_running)
+    for listener in listeners:
+        listener.stop()
+
+
+atexit.register(_stop_all)
+
+
+def async_handler(handler, maxsize=10000):
+    """
+    Wrap ``handler`` so that logging to it never blocks the caller.
+
+    :returns: ``(queue_handler, listener)``; the listener is already
+              started and is stopped (flushed) at interpreter exit.
+    """
+    records = queue.Queue(maxsize)
+    listener = QueueListener(records, handler)
+    listener.start()
+    return QueueHandler(records), listener
@@ -22,14 +22,24 @@ Base utilities to build API operation managers and objects on top of.
 import abc
 import base64
 import contextlib
+import functools
 import hashlib
 import inspect
 import os
+import sqlite3
+import threading
+import time
+import weakref
 
 import six
 
+from lbaasclient import completion
 from lbaasclient import exceptions
 from lbaasclient.openstack.common import strutils
+from lbaasclient import metrics
+from lbaasclient import table
+from lbaasclient import tracing
+from lbaasclient import transport
 from lbaasclient import utils
 
 
@@ -44,6 +54,97 @@ def getid(obj):
         return obj
 
 
+def get_cache_dir():
+    """
+    Return (and create) the local cache directory of the current user and
+    endpoint, holding completion caches and the loadbalancer inventory.
+    """
+    base_dir = utils.env('LBAASCLIENT_UUID_CACHE_DIR',
+                         default="~/.lbaasclient")
+
+    # NOTE(sirp): Keep separate UUID caches for each username + endpoint
+    # pair
+    username = utils.env('OS_USERNAME', 'LBAAS_USERNAME')
+    url = utils.env('OS_URL', 'LBAAS_URL')
+    uniqifier = hashlib.md5(username.encode('utf-8') +
+                            url.encode('utf-8')).hexdigest()
+
+    cache_dir = os.path.expanduser(os.path.join(base_dir, uniqifier))
+
+    try:
+        os.makedirs(cache_dir, 0o755)
+    except OSError:
+        # NOTE(kiall): This is typicaly either permission denied while
+        #              attempting to create the directory, or the directory
+        #              already exists. Either way, don't fail.
+        pass
+    return cache_dir
+
+
+_completion_local = threading.local()
+
+
+def _completion_writers():
+    """``{id(manager): CompletionCache}`` of the current thread."""
+    writers = getattr(_completion_local, 'writers', None)
+    if writers is None:
+        writers = _completion_local.writers = {}
+    return writers
+
+
+def _traced(operation):
+    """Open a tracing span around a `Manager` CRUD method."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, url, *args, **kwargs):
+            tracer = self._tracer()
+            if not tracer.enabled:
+                return func(self, url, *args, **kwargs)
+            resource_class = self.resource_class
+            with tracer.span('lbaas.manager.%s' % operation,
+                             operation=operation,
+                             resource=getattr(resource_class, '__name__',
+                                              None),
+                             route=metrics.route_template(url)):
+                return func(self, url, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class IdentityMap(object):
+    """
+    Weakly maps resource ids to the live resource object for that id.
+
+    While an object is referenced elsewhere, new payloads for its id
+    update it in place (see ``Resource._refresh``) instead of creating a
+    duplicate.  Forgotten objects are dropped automatically.
+    """
+
+    def __init__(self):
+        self._objects = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get(self, obj_class, id):
+        return self._objects.get((obj_class, str(id)))
+
+    def load(self, manager, obj_class, info, loaded=False):
+        """Return the object for ``info``, refreshed or newly created."""
+        if not isinstance(info, dict) or info.get('id') is None:
+            return obj_class(manager, info, loaded=loaded)
+        key = (obj_class, str(info['id']))
+        with self._lock:
+            obj = self._objects.get(key)
+            if obj is None:
+                obj = self._objects[key] = obj_class(manager, info,
+                                                     loaded=loaded)
+                return obj
+        obj._refresh(info, loaded)
+        return obj
+
+
 class Manager(utils.HookableMixin):
     """
     Managers interact with a particular type of API (servers, flavors, images,
@@ -51,18 +152,28 @@ class Manager(utils.HookableMixin):
     """
     resource_class = None
 
+    # An IdentityMap, if set, makes one id map to one live object.
+    identity_map = None
+
     def __init__(self, api):
         self.api = api
 
-    def _list(self, url, response_key, obj_class=None, body=None):
+    def _make(self, obj_class, info, loaded=False):
+        if self.identity_map is not None:
+            return self.identity_map.load(self, obj_class, info,
+                                          loaded=loaded)
+        return obj_class(self, info, loaded=loaded)
+
+    def _tracer(self):
+        client = getattr(self.api, 'client', None)
+        return getattr(client, 'tracer', None) or tracing.NOOP_TRACER
+
+    def _fetch_list(self, url, response_key, body=None):
         if body:
             _resp, body = self.api.client.post(url, body=body)
         else:
             _resp, body = self.api.client.get(url)
 
-        if obj_class is None:
-            obj_class = self.resource_class
-
         data = body[response_key]
         # NOTE(ja): keystone returns values as list as {'values': [ ... ]}
         #           unlike other services which just return the list...
@@ -71,11 +182,76 @@ class Manager(utils.HookableMixin):
                 data = data['values']
             except KeyError:
                 pass
+        return data
+
+    @_traced('list')
+    def _list(self, url, response_key, obj_class=None, body=None):
+        data = self._fetch_list(url, response_key, body=body)
 
-        with self.completion_cache('human_id', obj_class, mode="w"):
-            with self.completion_cache('uuid', obj_class, mode="w"):
-                return [obj_class(self, res, loaded=True)
-                        for res in data if res]
+        if obj_class is None:
+            obj_class = self.resource_class
+
+        start = time.time()
+        if obj_class.COMPLETION_CACHE:
+            with self._completion_caches(obj_class, mode="w"):
+                items = [self._make(obj_class, res, loaded=True)
+                         for res in data if res]
+        else:
+            items = [self._make(obj_class, res, loaded=True)
+                     for res in data if res]
+        transport.record_phase('resources', time.time() - start)
+        return items
+
+    @_traced('list')
+    def _iter_list(self, url, response_key, obj_class=None, body=None,
+                   completion_cache=False):
+        """
+        Like `_list`, but return an iterator building the resources one at
+        a time as it is consumed.
+
+        The response is fetched right away.  Each raw item is released as
+        its resource is yielded, so a caller that does not keep the
+        resources holds only the current one.  The completion caches are
+        only written when ``completion_cache`` is set.
+        """
+        data = self._fetch_list(url, response_key, body=body)
+        return self._iter_resources(data, obj_class or self.resource_class,
+                                    completion_cache)
+
+    def _iter_resources(self, data, obj_class, completion_cache):
+        data = [res for res in data if res]
+        data.reverse()
+        if completion_cache and obj_class.COMPLETION_CACHE:
+            with self._completion_caches(obj_class, mode="w"):
+                while data:
+                    yield self._make(obj_class, data.pop(), loaded=True)
+        else:
+            while data:
+                yield self._make(obj_class, data.pop(), loaded=True)
+
+    @_traced('list')
+    def _list_table(self, url, response_key, columns, obj_class=None,
+                    body=None):
+        """
+        Like `_list`, but return a :class:`lbaasclient.table.ResourceTable`
+        with the given columns; resources are only built for rows accessed.
+        """
+        data = self._fetch_list(url, response_key, body=body)
+        start = time.time()
+        resources = table.ResourceTable(self, [res for res in data if res],
+                                        columns,
+                                        obj_class or self.resource_class)
+        transport.record_phase('resources', time.time() - start)
+        return resources
+
+    @property
+    def completion_cache_enabled(self):
+        """
+        Whether listings and creates write the completion caches.  Off
+        unless the client was created with ``completion_cache=True``, as
+        the shell does: library users rarely need bash completion.
+        """
+        return getattr(self.api, 'completion_cache', False) is True
 
     @contextlib.contextmanager
     def completion_cache(self, cache_type, obj_class, mode):
@@ -89,78 +265,104 @@ class Manager(utils.HookableMixin):
 
         Delete is not handled because listings are assumed to be performed
         often enough to keep the cache reasonably up-to-date.
-        """
-        base_dir = utils.env('LBAASCLIENT_UUID_CACHE_DIR',
-                             default="~/.lbaasclient")
-
-        # NOTE(sirp): Keep separate UUID caches for each username + endpoint
-        # pair
-        username = utils.env('OS_USERNAME', 'LBAAS_USERNAME')
-        url = utils.env('OS_URL', 'LBAAS_URL')
-        uniqifier = hashlib.md5(username.encode('utf-8') +
-                                url.encode('utf-8')).hexdigest()
-
-        cache_dir = os.path.expanduser(os.path.join(base_dir, uniqifier))
-
-        try:
-            os.makedirs(cache_dir, 0o755)
-        except OSError:
-            # NOTE(kiall): This is typicaly either permission denied while
-            #              attempting to create the directory, or the directory
-            #              already exists. Either way, don't fail.
-            pass
 
-        resource = obj_class.__name__.lower()
-        filename = "%s-%s-cache" % (resource, cache_type.replace('_', '-'))
-        path = os.path.join(cache_dir, filename)
-
-        cache_attr = "_%s_cache" % cache_type
-
-        try:
-            setattr(self, cache_attr, open(path, mode))
-        except IOError:
-            # NOTE(kiall): This is typicaly a permission denied while
-            #              attempting to write the cache file.
-            pass
+        Values are buffered and committed when the outermost block exits
+        without an error, so nested blocks share a single commit and a
+        failed listing leaves the previous cache in place.
+        """
+        if not self.completion_cache_enabled:
+            yield
+            return
 
+        # Each thread buffers into its own writer: managers are shared by
+        # the threads of parallel.run().
+        writers = _completion_writers()
+        writer = writers.get(id(self))
+        owner = writer is None
+        if owner:
+            writer = completion.CompletionCache(
+                get_cache_dir(), obj_class.__name__.lower())
+            writers[id(self)] = writer
+        writer.open(cache_type, mode)
+
+        committed = False
         try:
             yield
+            committed = True
         finally:
-            cache = getattr(self, cache_attr, None)
-            if cache:
-                cache.close()
-                delattr(self, cache_attr)
+            if owner:
+                del writers[id(self)]
+                if committed:
+                    try:
+                        writer.commit()
+                    except (IOError, OSError, sqlite3.Error):
+                        # NOTE(kiall): This is typicaly a permission denied
+                        #              while attempting to write the cache.
+                        pass
+
+    @contextlib.contextmanager
+    def _completion_caches(self, obj_class, mode):
+        with self.completion_cache('human_id', obj_class, mode):
+            with self.completion_cache('uuid', obj_class, mode):
+                yield
+
+    @property
+    def _completion_writer(self):
+        """The completion cache being written by the current thread."""
+        return _completion_writers().get(id(self))
 
     def write_to_completion_cache(self, cache_type, val):
-        cache = getattr(self, "_%s_cache" % cache_type, None)
-        if cache:
-            cache.write("%s\n" % val)
+        writer = self._completion_writer
+        if writer is not None:
+            writer.write(cache_type, val)
 
+    @_traced('get')
     def _get(self, url, response_key):
         _resp, body = self.api.client.get(url)
-        return self.resource_class(self, body[response_key], loaded=True)
-
-    def _create(self, url, body, response_key, return_raw=False, **kwargs):
+        start = time.time()
+        resource = self._make(self.resource_class, body[response_key],
+                              loaded=True)
+        transport.record_phase('resources', time.time() - start)
+        return resource
+
+    @_traced('create')
+    def _create(self, url, body, response_key, return_raw=False,
+                loaded=False, headers=None, **kwargs):
         self.run_hooks('modify_body_for_create', body, **kwargs)
-        _resp, body = self.api.client.post(url, body=body)
+        if headers:
+            _resp, body = self.api.client.post(url, body=body,
+                                               headers=headers)
+        else:
+            _resp, body = self.api.client.post(url, body=body)
         if return_raw:
             return body[response_key]
 
-        with self.completion_cache('human_id', self.resource_class, mode="a"):
-            with self.completion_cache('uuid', self.resource_class, mode="a"):
-                return self.resource_class(self, body[response_key])
+        start = time.time()
+        obj_class = self.resource_class
+        if obj_class.COMPLETION_CACHE:
+            with self._completion_caches(obj_class, mode="a"):
+                resource = self._make(obj_class, body[response_key],
+                                      loaded=loaded)
+        else:
+            resource = self._make(obj_class, body[response_key],
+                                  loaded=loaded)
+        transport.record_phase('resources', time.time() - start)
+        return resource
 
+    @_traced('delete')
     def _delete(self, url):
         _resp, _body = self.api.client.delete(url)
 
+    @_traced('update')
     def _update(self, url, body, response_key=None, **kwargs):
         self.run_hooks('modify_body_for_update', body, **kwargs)
         _resp, body = self.api.client.put(url, body=body)
         if body:
             if response_key:
-                return self.resource_class(self, body[response_key])
+                return self._make(self.resource_class,
+                                  body[response_key])
             else:
-                return self.resource_class(self, body)
+                return self._make(self.resource_class, body)
 
 
 class ManagerWithFind(Manager):
@@ -270,7 +472,8 @@ class BootingManagerWithFind(ManagerWithFind):
         return bdm
 
     def _do_create(self, resource_url, response_key, name, protocol, vip_type,
-              port=None, algorithm=None, nodes=None, return_raw=False, **kwargs):
+              port=None, algorithm=None, nodes=None, return_raw=False,
+              metadata=None, **kwargs):
         """
         Create (boot) a new server.
 
@@ -290,11 +493,10 @@ class BootingManagerWithFind(ManagerWithFind):
         if nodes and len(nodes) > 0:
             body["loadBalancer"]["nodes"] = []
             for node in nodes:
-                addr, port = node.split(":")
-                node_def = { "address": addr,
-                             "port": port,
-                             "condition": "ENABLED" }
-                body["loadBalancer"]["nodes"].append(node_def)
+                body["loadBalancer"]["nodes"].append(
+                    utils.parse_node_spec(node))
+        if metadata:
+            body["loadBalancer"]["metadata"] = metadata
         return self._create(resource_url, body, response_key,
                             return_raw=return_raw, **kwargs)
 
@@ -310,6 +512,13 @@ class Resource(object):
     """
     HUMAN_ID = False
     NAME_ATTR = 'name'
+    COMPLETION_CACHE = True
+
+    # {field: (old, new)} of the last in-place refresh, see IdentityMap.
+    last_changes = None
+
+    # Fields whose local changes dirty_fields() reports.
+    TRACKED_FIELDS = ()
 
     def __init__(self, manager, info, loaded=False):
         self.manager = manager
@@ -317,6 +526,10 @@ class Resource(object):
         self._add_details(info)
         self._loaded = loaded
 
+        # Only build the completion values while a cache is being written.
+        if getattr(manager, '_completion_writer', None) is None:
+            return
+
         # NOTE(sirp): ensure `id` is already present because if it isn't we'll
         # enter an infinite loop of __getattr__ -> get -> __init__ ->
         # __getattr__ -> ...
@@ -372,6 +585,37 @@ class Resource(object):
         if new:
             self._add_details(new._info)
 
+    def dirty_fields(self):
+        """
+        Return ``{field: value}`` for the :attr:`TRACKED_FIELDS` set to a
+        new value since they were loaded.
+        """
+        # Setting an attribute leaves _info, the loaded payload, unchanged.
+        return dict((k, self.__dict__[k]) for k in self.TRACKED_FIELDS
+                    if k in self.__dict__ and
+                    self.__dict__[k] != self._info.get(k))
+
+    def _mark_saved(self, fields):
+        """Record that ``{field: value}`` was stored by the API."""
+        self._info.update(fields)
+
+    def _refresh(self, info, loaded=False):
+        """
+        Update in place from a newer payload of the same resource and
+        record ``{field: (old, new)}`` for changed fields in
+        ``last_changes``.
+        """
+        changes = {}
+        for k, v in six.iteritems(info):
+            old = self._info.get(k)
+            if old != v:
+                changes[k] = (old, v)
+        if info is not self._info:
+            self._add_details(info)
+        self.last_changes = changes
+        if loaded:
+            self._loaded = True
+
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return False
@@ -379,6 +623,133 @@ class Resource(object):
             return self.id == other.id
         return self._info == other._info
 
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        # Must agree with __eq__: resources without an id only compare
+        # equal through their _info, so they all share the class hash.
+        return hash((self.__class__, self._info.get('id')))
+
+    def is_loaded(self):
+        return self._loaded
+
+    def set_loaded(self, val):
+        self._loaded = val
+
+
+class CompactResource(object):
+    """
+    A memory-lean alternative to :class:`Resource`.
+
+    The raw ``info`` dict is the only copy of the attributes: they are
+    looked up in it on access instead of being copied into ``__dict__``,
+    ``__slots__`` avoids a per-object ``__dict__``, and nothing is written
+    to the completion caches.  Setting an attribute that is not a slot
+    stores it in ``info``.
+    """
+    __slots__ = ('manager', '_info', '_loaded', 'last_changes', '_saved',
+                 '__weakref__')
+
+    HUMAN_ID = False
+    NAME_ATTR = 'name'
+    COMPLETION_CACHE = False
+    TRACKED_FIELDS = ()
+
+    def __init__(self, manager, info, loaded=False):
+        self.manager = manager
+        self._info = info
+        self._loaded = loaded
+        self.last_changes = None
+        # {field: loaded value} of tracked fields set since, or None.
+        self._saved = None
+
+    @property
+    def human_id(self):
+        name = self._info.get(self.NAME_ATTR)
+        if name and self.HUMAN_ID:
+            return utils.slugify(name)
+        return None
+
+    def _add_details(self, info):
+        self._info.update(info)
+
+    def __getattr__(self, k):
+        if k in CompactResource.__slots__:
+            # Not initialized yet, e.g. while unpickling.
+            raise AttributeError(k)
+        try:
+            return self._info[k]
+        except KeyError:
+            #NOTE(bcwaldon): disallow lazy-loading if already loaded once
+            if not self.is_loaded():
+                self.get()
+                return self.__getattr__(k)
+            raise AttributeError(k)
+
+    def __setattr__(self, k, v):
+        if k in CompactResource.__slots__ or hasattr(type(self), k):
+            object.__setattr__(self, k, v)
+        else:
+            if k in self.TRACKED_FIELDS:
+                if self._saved is None:
+                    self._saved = {}
+                self._saved.setdefault(k, self._info.get(k))
+            self._info[k] = v
+
+    def dirty_fields(self):
+        """See :meth:`Resource.dirty_fields`."""
+        return dict((k, self._info.get(k))
+                    for k, v in six.iteritems(self._saved or {})
+                    if self._info.get(k) != v)
+
+    def _mark_saved(self, fields):
+        if self._saved:
+            for k in fields:
+                self._saved.pop(k, None)
+
+    def __repr__(self):
+        info = ", ".join("%s=%s" % (k, self._info[k])
+                         for k in sorted(self._info) if k[0] != '_')
+        return "<%s %s>" % (self.__class__.__name__, info)
+
+    def get(self):
+        # set_loaded() first ... so if we have to bail, we know we tried.
+        self.set_loaded(True)
+        if not hasattr(self.manager, 'get'):
+            return
+
+        new = self.manager.get(self.id)
+        if new:
+            self._add_details(new._info)
+            self._saved = None
+
+    def _refresh(self, info, loaded=False):
+        changes = {}
+        for k, v in six.iteritems(info):
+            old = self._info.get(k)
+            if old != v:
+                changes[k] = (old, v)
+        if info is not self._info:
+            self._info.update(info)
+            self._saved = None
+        self.last_changes = changes
+        if loaded:
+            self._loaded = True
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return False
+        if 'id' in self._info and 'id' in other._info:
+            return self._info['id'] == other._info['id']
+        return self._info == other._info
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.__class__, self._info.get('id')))
+
     def is_loaded(self):
         return self._loaded
 
@@ -9,21 +9,97 @@ OpenStack Client interface. Handles the REST calls and responses.
 
 import logging
 import os
+import random
+import threading
 import time
 
 import requests
+import six
 
 try:
     import json
 except ImportError:
     import simplejson as json
 
+from lbaasclient import asynclog
 from lbaasclient import exceptions
+from lbaasclient import metrics as lbaas_metrics
 from lbaasclient import service_catalog
+from lbaasclient import tracing
+from lbaasclient import transport
 from lbaasclient import utils
 from lbaasclient.openstack.common.py3kcompat import urlutils
 
 
+# Request and response bodies longer than this are truncated in the
+# debug log.
+DEFAULT_LOG_BODY_BYTES = 4096
+
+
+def _truncate(text, limit):
+    if limit is None or len(text) <= limit:
+        return text
+    return "%s... [%d more bytes]" % (text[:limit], len(text) - limit)
+
+
+def _byte_length(data):
+    """Length of a request body as sent: text counts once encoded."""
+    if not data:
+        return 0
+    if isinstance(data, six.text_type):
+        data = data.encode('utf-8')
+    return len(data)
+
+
+class _CurlMessage(object):
+    """A request rendered as a curl command line only when it is logged."""
+
+    def __init__(self, args, kwargs, max_body):
+        self.args = args
+        # The headers dict is reused (and the token replaced) on retries.
+        self.headers = dict(kwargs['headers'])
+        self.data = kwargs.get('data')
+        self.max_body = max_body
+
+    def __str__(self):
+        string_parts = ['curl -i']
+        for element in self.args:
+            if element in ('GET', 'POST', 'DELETE', 'PUT'):
+                string_parts.append(' -X %s' % element)
+            else:
+                string_parts.append(' %s' % element)
+
+        for element in self.headers:
+            header = ' -H "%s: %s"' % (element, self.headers[element])
+            string_parts.append(header)
+
+        if self.data is not None:
+            string_parts.append(" -d '%s'" % _truncate(self.data,
+                                                       self.max_body))
+        return "\nREQ: %s\n" % "".join(string_parts)
+
+
+class _ResponseMessage(object):
+    """A response rendered only when it is logged."""
+
+    def __init__(self, resp, max_body):
+        self.resp = resp
+        self.max_body = max_body
+
+    def __str__(self):
+        content = self.resp.content or b''
+        if self.max_body is not None:
+            content = content[:self.max_body]
+        # Decode what is shown ourselves instead of resp.text, which runs
+        # charset detection over the whole body.
+        body = content.decode(self.resp.encoding or 'utf-8', 'replace')
+        hidden = len(self.resp.content or b'') - len(content)
+        if hidden > 0:
+            body = "%s... [%d more bytes]" % (body, hidden)
+        return "RESP: [%s] %s\nRESP BODY: %s\n" % (self.resp.status_code,
+                                                    self.resp.headers, body)
+
+
 class HTTPClient(object):
 
     USER_AGENT = 'python-lbaasclient'
@@ -37,7 +113,11 @@ class HTTPClient(object):
                  os_cache=False, no_cache=True,
                  http_log_debug=False, auth_system='keystone',
                  auth_plugin=None,
-                 cacert=None, tenant_id=None):
+                 cacert=None, tenant_id=None,
+                 prewarm_connections=0, dns_cache_ttl=None,
+                 metrics=None, tracer=None, request_log=None,
+                 http_log_sample_rate=1.0,
+                 http_log_max_body=DEFAULT_LOG_BODY_BYTES):
         self.user = user
         self.password = password
         self.projectid = projectid
@@ -61,12 +141,20 @@ class HTTPClient(object):
         self.bypass_url = bypass_url
         self.os_cache = os_cache or not no_cache
         self.http_log_debug = http_log_debug
+        self.http_log_sample_rate = http_log_sample_rate
+        self.http_log_max_body = http_log_max_body
         if timeout is not None:
             self.timeout = float(timeout)
         else:
             self.timeout = None
 
+        # Only filled in when timings are enabled; long-lived processes
+        # should rely on the bounded metrics registry instead.
         self.times = []  # [("item", starttime, endtime), ...]
+        self.timing_details = []  # [{"url": ..., "dns": ..., ...}, ...]
+        self.metrics = metrics
+        self.tracer = tracer or tracing.NOOP_TRACER
+        self.request_log = request_log
 
         self.management_url = None
         self.auth_token = None
@@ -88,8 +176,10 @@ class HTTPClient(object):
 
         self._logger = logging.getLogger(__name__)
         if self.http_log_debug and not self._logger.handlers:
-            # Logging level is already set on the root logger
-            ch = logging.StreamHandler()
+            # Logging level is already set on the root logger.  Records are
+            # written from a background thread so that debug output never
+            # slows down the requests themselves.
+            ch, _listener = asynclog.async_handler(logging.StreamHandler())
             self._logger.addHandler(ch)
             self._logger.propagate = False
             if hasattr(requests, 'logging'):
@@ -101,6 +191,15 @@ class HTTPClient(object):
                 rql.setLevel(logging.WARNING)
         # requests within the same session can reuse TCP connections from pool
         self.http = requests.Session()
+        if self.timings:
+            transport.install_resolver()
+            self.http.mount('http://', transport.TimingAdapter())
+            self.http.mount('https://', transport.TimingAdapter())
+
+        self.prewarm_connections = prewarm_connections or 0
+        self._prewarm_threads = []
+        if dns_cache_ttl:
+            transport.install_dns_cache(dns_cache_ttl)
 
     def use_token_cache(self, use_it):
         self.os_cache = use_it
@@ -113,39 +212,59 @@ class HTTPClient(object):
     def set_management_url(self, url):
         self.management_url = url
 
-    def get_timings(self):
+    def prewarm(self, count=None):
+        """Open pooled connections to the management url in the background.
+
+        The first real API call then reuses an already resolved, connected
+        and TLS-negotiated connection instead of paying for it inline.
+        """
+        if count is None:
+            count = self.prewarm_connections
+        if not count or not self.management_url:
+            return
+        self._prewarm_threads = transport.prewarm(
+            self.http, self.management_url, count=count,
+            verify=self.verify_cert, timeout=self.timeout)
+
+    def get_timings(self, detailed=False):
+        """Return the timings of the requests made so far.
+
+        Requests are only timed with ``timings`` enabled; otherwise the
+        list stays empty.
+
+        :param detailed: return dicts holding the url, start and end of each
+                         request plus its phase breakdown (dns, connect, tls,
+                         ttfb, download, decode, resources) and byte counts
+                         instead of ``(url, start, end)`` tuples.
+        """
+        if detailed:
+            return self.timing_details
         return self.times
 
     def reset_timings(self):
         self.times = []
+        self.timing_details = []
+
+    def _http_log_sampled(self):
+        """Decide once per request whether it is debug logged."""
+        if not self.http_log_debug:
+            return False
+        if not self._logger.isEnabledFor(logging.DEBUG):
+            return False
+        rate = self.http_log_sample_rate
+        return rate >= 1 or random.random() < rate
 
     def http_log_req(self, args, kwargs):
         if not self.http_log_debug:
             return
-
-        string_parts = ['curl -i']
-        for element in args:
-            if element in ('GET', 'POST', 'DELETE', 'PUT'):
-                string_parts.append(' -X %s' % element)
-            else:
-                string_parts.append(' %s' % element)
-
-        for element in kwargs['headers']:
-            header = ' -H "%s: %s"' % (element, kwargs['headers'][element])
-            string_parts.append(header)
-
-        if 'data' in kwargs:
-            string_parts.append(" -d '%s'" % (kwargs['data']))
-        self._logger.debug("\nREQ: %s\n" % "".join(string_parts))
+        self._logger.debug("%s", _CurlMessage(args, kwargs,
+                                              self.http_log_max_body))
 
     def http_log_resp(self, resp):
         if not self.http_log_debug:
             return
-        self._logger.debug(
-            "RESP: [%s] %s\nRESP BODY: %s\n",
-            resp.status_code,
-            resp.headers,
-            resp.text)
+        self._logger.debug("%s", _ResponseMessage(resp,
+                                                  self.http_log_max_body))
 
     def request(self, url, method, **kwargs):
         kwargs.setdefault('headers', kwargs.get('headers', {}))
@@ -158,13 +277,19 @@ class HTTPClient(object):
         if self.timeout is not None:
             kwargs.setdefault('timeout', self.timeout)
 
-        self.http_log_req((url, method,), kwargs)
-        resp = self.http.request(
-            method,
-            url,
-            verify=self.verify_cert,
-            **kwargs)
-        self.http_log_resp(resp)
+        log_http = self._http_log_sampled()
+        if log_http:
+            self.http_log_req((url, method,), kwargs)
+        if self.timings:
+            resp = self._timed_http_request(url, method, **kwargs)
+        else:
+            resp = self.http.request(
+                method,
+                url,
+                verify=self.verify_cert,
+                **kwargs)
+        if log_http:
+            self.http_log_resp(resp)
 
         if resp.text:
             # TODO(dtroyer): verify the note below in a requests context
@@ -177,11 +302,13 @@ class HTTPClient(object):
                 if ('Connection refused' in resp.text or
                     'actively refused' in resp.text):
                     raise exceptions.ConnectionRefused(resp.text)
+            decode_start = time.time()
             try:
                 body = json.loads(resp.text)
             except ValueError:
                 pass
                 body = None
+            transport.record_phase('decode', time.time() - decode_start)
         else:
             body = None
 
@@ -190,14 +317,105 @@ class HTTPClient(object):
 
         return resp, body
 
-    def _time_request(self, url, method, **kwargs):
+    def _timed_http_request(self, url, method, **kwargs):
+        """Send a request while recording its transport phases.
+
+        The body is streamed so that the time to the first byte and the
+        time spent downloading the payload can be told apart.  DNS, connect
+        and TLS times are reported by :mod:`lbaasclient.transport`.
+        """
+        phases = transport.start_phases()
+        try:
+            phases['bytes_sent'] = _byte_length(kwargs.get('data'))
+            start = time.time()
+            resp = self.http.request(
+                method,
+                url,
+                verify=self.verify_cert,
+                stream=True,
+                **kwargs)
+            phases['ttfb'] = (time.time() - start - phases['dns'] -
+                              phases['connect'] - phases['tls'])
+            start = time.time()
+            content = resp.content
+            phases['download'] = time.time() - start
+            phases['bytes_received'] = len(content or '')
+            return resp
+        finally:
+            transport.finish_phases()
+
+    def _time_request(self, url, method, retry_count=0, **kwargs):
         start_time = time.time()
-        resp, body = self.request(url, method, **kwargs)
-        self.times.append(("%s %s" % (method, url),
-                           start_time, time.time()))
+        if self.metrics is not None or self.request_log is not None:
+            resp, body = self._measured_request(url, method, retry_count,
+                                                **kwargs)
+        else:
+            resp, body = self.request(url, method, **kwargs)
+        if not self.timings:
+            return resp, body
+        end_time = time.time()
+        self.times.append(("%s %s" % (method, url), start_time, end_time))
+        phases = transport.last_phases()
+        if phases is not None:
+            # Kept by reference: the managers add the time spent building
+            # resources from the body once this call has returned.
+            phases.update(url="%s %s" % (method, url),
+                          start=start_time, end=end_time,
+                          thread_id=threading.current_thread().ident)
+            self.timing_details.append(phases)
         return resp, body
 
+    def _measured_request(self, url, method, retry_count, **kwargs):
+        """Perform a request, recording it in the metrics registry and
+        the structured request log."""
+        status = request_id = None
+        bytes_sent = bytes_received = 0
+        start_time = time.time()
+        try:
+            resp, body = self.request(url, method, **kwargs)
+            status = resp.status_code
+            request = getattr(resp, 'request', None)
+            bytes_sent = _byte_length(getattr(request, 'body', None))
+            bytes_received = len(resp.content or '')
+            if resp.headers:
+                request_id = resp.headers.get('x-compute-request-id')
+            return resp, body
+        except exceptions.ClientException as e:
+            status = e.code
+            request_id = e.request_id
+            raise
+        finally:
+            end_time = time.time()
+            if self.metrics is not None:
+                self.metrics.observe_request(
+                    method,
+                    lbaas_metrics.route_template(url, self.management_url),
+                    status, end_time - start_time,
+                    bytes_sent=bytes_sent, bytes_received=bytes_received)
+            if self.request_log is not None:
+                self.request_log.log(
+                    method, url, status, start_time, end_time,
+                    base_url=self.management_url, bytes_sent=bytes_sent,
+                    bytes_received=bytes_received, request_id=request_id,
+                    retry_count=retry_count,
+                    phases=transport.last_phases() if self.timings else None)
+
     def _cs_request(self, url, method, **kwargs):
+        if not self.tracer.enabled:
+            return self._do_cs_request(url, method, tracing.NOOP_SPAN,
+                                       **kwargs)
+
+        route = lbaas_metrics.route_template(url)
+        with self.tracer.span('lbaas.request', method=method, route=route,
+                              retry_count=0) as span:
+            resp, body = self._do_cs_request(url, method, span, **kwargs)
+            span.set_attribute('status_code', resp.status_code)
+            if resp.headers:
+                span.set_attribute(
+                    'request_id', resp.headers.get('x-compute-request-id'))
+            return resp, body
+
+    def _do_cs_request(self, url, method, span, **kwargs):
         if not self.management_url:
             self.authenticate()
 
@@ -213,6 +431,10 @@ class HTTPClient(object):
                                             **kwargs)
             return resp, body
         except exceptions.Unauthorized as e:
+            if self.metrics is not None:
+                self.metrics.inc_retry('unauthorized')
+            span.set_attribute('retry_count', 1)
+            span.set_attribute('retry_reason', 'unauthorized')
             try:
                 # frist discard auth token, to avoid the possibly expired
                 # token being re-used in the re-authentication attempt
@@ -220,7 +442,8 @@ class HTTPClient(object):
                 self.authenticate()
                 kwargs['headers']['X-Auth-Token'] = self.auth_token
                 resp, body = self._time_request(self.management_url + url,
-                                                method, **kwargs)
+                                                method, retry_count=1,
+                                                **kwargs)
                 return resp, body
             except exceptions.Unauthorized:
                 raise e
@@ -298,6 +521,18 @@ class HTTPClient(object):
                                              extract_token=False)
 
     def authenticate(self):
+        with self.tracer.span('lbaas.authenticate',
+                              auth_system=self.auth_system):
+            if self.metrics is None:
+                return self._do_authenticate()
+            try:
+                self._do_authenticate()
+            except Exception:
+                self.metrics.inc_auth('failure')
+                raise
+            self.metrics.inc_auth('success')
+
+    def _do_authenticate(self):
         magic_tuple = urlutils.urlsplit(self.auth_url)
         scheme, netloc, path, query, frag = magic_tuple
         port = magic_tuple.port
@@ -359,6 +594,9 @@ class HTTPClient(object):
         elif not self.management_url:
             raise exceptions.Unauthorized('Nova Client')
 
+        if self.prewarm_connections:
+            self.prewarm()
+
         # Store the token/mgmt url in the keyring for later requests.
         if self.keyring_saver and self.os_cache and not self.keyring_saved:
             self.keyring_saver.save(self.auth_token,
@@ -408,7 +646,8 @@ class HTTPClient(object):
         elif self.projectid:
             body['auth']['tenantName'] = self.projectid
 
-        return self._authenticate(url, body)
+        with self.tracer.span('lbaas.v2_auth', auth_url=url):
+            return self._authenticate(url, body)
 
     def _authenticate(self, url, body, **kwargs):
         """Authenticate and extract the service catalog."""
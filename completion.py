@@ -0,0 +1,178 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Completion caches: UUIDs and human-friendly ids of listed resources, for
+bash completion.
+
+Values are buffered in memory and committed once.  The plain text cache
+files (one value per line) are replaced atomically through a temporary
+file and a rename, so concurrent runs never leave a truncated or
+interleaved file behind.  Commits are serialized by a lock, and across
+processes by a lock file where ``fcntl`` is available, so appends read,
+merge and replace a file without losing each other's values.  The values
+also go to a sqlite index that answers prefix queries without reading
+whole files.
+"""
+
+import contextlib
+import os
+import sqlite3
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+INDEX_FILENAME = 'completion.sqlite'
+LOCK_FILENAME = 'completion.lock'
+
+_commit_lock = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completion (
+    resource TEXT NOT NULL,
+    cache_type TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (resource, cache_type, value)
+);
+"""
+
+
+def text_path(cache_dir, resource, cache_type):
+    filename = "%s-%s-cache" % (resource, cache_type.replace('_', '-'))
+    return os.path.join(cache_dir, filename)
+
+
+def _connect(cache_dir):
+    conn = sqlite3.connect(os.path.join(cache_dir, INDEX_FILENAME),
+                           timeout=10)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _read_lines(path):
+    try:
+        with open(path) as f:
+            return [line.rstrip('\n') for line in f if line.strip()]
+    except IOError:
+        return []
+
+
+@contextlib.contextmanager
+def _locked(cache_dir):
+    with _commit_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(cache_dir, LOCK_FILENAME), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _atomic_write(path, values):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.completion')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for value in values:
+                f.write("%s\n" % value)
+        os.chmod(tmp_path, 0o644)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+class CompletionCache(object):
+    """
+    Buffers the completion values of one resource type until
+    :meth:`commit`.
+
+    Each cache type is opened with mode ``"w"`` (replace what is cached,
+    after a listing) or ``"a"`` (add to it, after a create).
+    """
+
+    def __init__(self, cache_dir, resource):
+        self.cache_dir = cache_dir
+        self.resource = resource
+        self._buffers = {}  # {cache_type: [value, ...]}
+        self._modes = {}
+
+    def open(self, cache_type, mode):
+        self._buffers.setdefault(cache_type, [])
+        self._modes[cache_type] = mode
+
+    def write(self, cache_type, value):
+        buf = self._buffers.get(cache_type)
+        if buf is not None:
+            buf.append(value)
+
+    def commit(self):
+        with _locked(self.cache_dir):
+            conn = _connect(self.cache_dir)
+            try:
+                with conn:
+                    for cache_type, values in self._buffers.items():
+                        self._commit_type(conn, cache_type, values)
+            finally:
+                conn.close()
+        self._buffers = {}
+        self._modes = {}
+
+    def _commit_type(self, conn, cache_type, values):
+        path = text_path(self.cache_dir, self.resource, cache_type)
+        if self._modes[cache_type] == 'a':
+            values = _read_lines(path) + values
+        else:
+            conn.execute("DELETE FROM completion WHERE resource = ? AND "
+                         "cache_type = ?", (self.resource, cache_type))
+        # Drop duplicates, keeping the first occurrence.
+        seen = set()
+        values = [v for v in values if not (v in seen or seen.add(v))]
+        _atomic_write(path, values)
+        conn.executemany("INSERT OR IGNORE INTO completion "
+                         "(resource, cache_type, value) VALUES (?, ?, ?)",
+                         [(self.resource, cache_type, value)
+                          for value in values])
+
+
+def _next_char(char):
+    # The exclusive upper bound of a prefix range.
+    return u'%c' % (ord(char) + 1)
+
+
+def complete(cache_dir, resource, cache_type, prefix='', limit=None):
+    """Return cached values starting with ``prefix``, sorted."""
+    if not os.path.exists(os.path.join(cache_dir, INDEX_FILENAME)):
+        return []
+    # A range scan on the primary key; unlike LIKE it is case sensitive
+    # and does not need escaping.
+    query = ("SELECT value FROM completion WHERE resource = ? AND "
+             "cache_type = ? AND value >= ?")
+    params = [resource, cache_type, prefix]
+    if prefix:
+        query += " AND value < ?"
+        params.append(prefix[:-1] + _next_char(prefix[-1]))
+    query += " ORDER BY value"
+    if limit:
+        query += " LIMIT %d" % int(limit)
+    conn = _connect(cache_dir)
+    try:
+        return [row[0] for row in conn.execute(query, params)]
+    finally:
+        conn.close()
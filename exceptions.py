@@ -132,6 +132,16 @@ class Conflict(ClientException):
     message = "Conflict"
 
 
+class UnprocessableEntity(ClientException):
+    """
+    HTTP 422 - Unprocessable entity: the request is valid but cannot be
+    applied now, e.g. to a loadbalancer that is immutable while a previous
+    change is pending.
+    """
+    http_status = 422
+    message = "Unprocessable entity"
+
+
 class OverLimit(ClientException):
     """
     HTTP 413 - Over limit: you're over the API limits for this time period.
@@ -172,8 +182,8 @@ class HTTPNotImplemented(ClientException):
 #
 # Instead, we have to hardcode it:
 _error_classes = [BadRequest, Unauthorized, Forbidden, NotFound,
-                  MethodNotAllowed, Conflict, OverLimit, RateLimit,
-                  HTTPNotImplemented]
+                  MethodNotAllowed, Conflict, UnprocessableEntity, OverLimit,
+                  RateLimit, HTTPNotImplemented]
 _code_map = dict((c.http_status, c) for c in _error_classes)
 
 
@@ -206,7 +216,7 @@ def from_response(response, body, url, method=None):
         details = "n/a"
 
         if hasattr(body, 'keys'):
-            error = body[body.keys()[0]]
+            error = list(body.values())[0]
             #message = error.get('message', None)
             #details = error.get('details', None)
             message = error
@@ -0,0 +1,192 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+A persistent local copy of the loadbalancer inventory.
+
+The store is seeded with one full listing and then kept current with
+``changes-since`` listings, which only return what changed (including
+deleted loadbalancers) since the previous sync.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+
+# Seconds subtracted from the time a sync started before it is used as
+# the next ``changes-since``, to tolerate clock skew with the API.
+SYNC_OVERLAP = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    status TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class CachedList(list):
+    """
+    A list of resources read from an :class:`InventoryStore`.
+
+    :ivar synced_at: epoch seconds of the last sync, ``None`` if the store
+                     was never synced.
+    """
+
+    def __init__(self, items, synced_at=None):
+        super(CachedList, self).__init__(items)
+        self.synced_at = synced_at
+
+    @property
+    def age(self):
+        """Seconds since the last sync, ``None`` if never synced."""
+        if self.synced_at is None:
+            return None
+        return time.time() - self.synced_at
+
+
+class SyncResult(object):
+    """What a sync changed: updated resource dicts and deleted ids."""
+
+    def __init__(self, full, changed, deleted, synced_at):
+        self.full = full
+        self.changed = changed
+        self.deleted = deleted
+        self.synced_at = synced_at
+
+    def __repr__(self):
+        return "<SyncResult full=%s changed=%d deleted=%d>" % (
+            self.full, len(self.changed), len(self.deleted))
+
+
+class InventoryStore(object):
+    """
+    Resource dicts kept in a sqlite database at ``path`` (``':memory:'``
+    for a throwaway store).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?",
+                                 (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) "
+                           "VALUES (?, ?)", (key, value))
+
+    @property
+    def synced_at(self):
+        with self._lock:
+            value = self._get_meta('synced_at')
+        return float(value) if value is not None else None
+
+    def is_seeded(self):
+        return self.synced_at is not None
+
+    def _upsert(self, items):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO resources (id, name, status, data) "
+            "VALUES (?, ?, ?, ?)",
+            [(str(item['id']), item.get('name'), item.get('status'),
+              json.dumps(item)) for item in items])
+
+    def replace_all(self, items, synced_at):
+        """Replace the whole inventory with ``items``."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM resources")
+                self._upsert(items)
+                self._set_meta('synced_at', repr(synced_at))
+
+    def apply_changes(self, changed, deleted, synced_at):
+        """Store ``changed`` resource dicts and drop ``deleted`` ids."""
+        with self._lock:
+            with self._conn:
+                self._upsert(changed)
+                self._conn.executemany("DELETE FROM resources WHERE id = ?",
+                                       [(str(id),) for id in deleted])
+                self._set_meta('synced_at', repr(synced_at))
+
+    def put(self, items):
+        """Store resource dicts without touching the sync time."""
+        with self._lock:
+            with self._conn:
+                self._upsert(items)
+
+    def items(self):
+        """Return every stored resource dict, ordered by id."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM resources "
+                "ORDER BY length(id), id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get(self, id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM resources "
+                                     "WHERE id = ?", (str(id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT count(*) FROM resources").fetchone()[0]
+
+
+def sync(store, list_fn, full=False, deleted_status='DELETED',
+         clock=time.time):
+    """
+    Bring ``store`` up to date.
+
+    :param list_fn: ``list_fn(changes_since)`` returns resources changed
+                    since the given epoch seconds, or all of them when it
+                    is ``None``.
+    :param full: re-seed the store even if it was synced before.
+    :rtype: :class:`SyncResult`
+    """
+    last_sync = store.synced_at
+    full = full or last_sync is None
+    started = clock()
+
+    if full:
+        resources = list_fn(None)
+        items = [r._info for r in resources
+                 if getattr(r, 'status', None) != deleted_status]
+        store.replace_all(items, started)
+        return SyncResult(True, items, [], started)
+
+    changed = []
+    deleted = []
+    for resource in list_fn(last_sync - SYNC_OVERLAP):
+        if getattr(resource, 'status', None) == deleted_status:
+            deleted.append(str(resource.id))
+        else:
+            changed.append(resource._info)
+    store.apply_changes(changed, deleted, started)
+    return SyncResult(False, changed, deleted, started)
@@ -0,0 +1,185 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Append-only journal of a bulk operation, so that it can be resumed.
+
+A bulk operation records each of its items as :data:`PLANNED`, then
+:data:`SUBMITTED` just before the API call and :data:`DONE` or
+:data:`FAILED` after it.  Rerun with the same journal, it skips the items
+already done and only checks the ones that were in flight (submitted but
+never finished) before submitting them again.
+
+The journal is a JSON document per line, flushed after each write, so it
+survives the process being killed; a line cut short by a crash is
+ignored, and ended before new records are appended.  The first line
+names the operation.  A journal kept across runs can be compacted with
+:meth:`Journal.prune`.
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+
+
+PLANNED = 'planned'
+SUBMITTED = 'submitted'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Journal(object):
+    """
+    The journal of ``operation`` (e.g. ``'delete'``) in the file ``path``,
+    created if missing.
+
+    :raises: ValueError if the file is the journal of another operation.
+    """
+
+    def __init__(self, path, operation):
+        self.path = path
+        self.operation = operation
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        header = None
+        if os.path.exists(path):
+            header = self._read()
+            if header is not None and header.get('operation') != operation:
+                raise ValueError("%s is the journal of %s, not %s" % (
+                    path, header.get('operation'), operation))
+        self._file = open(path, 'a')
+        if not self._ends_with_newline():
+            # End the line a crash cut short, or the next record would be
+            # appended to it and both would be lost.
+            self._file.write('\n')
+            self._file.flush()
+        if header is None:
+            header = {'operation': operation, 'started': time.time()}
+            self._write([header])
+        self._header = header
+
+    def _read(self):
+        header = None
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if header is None:
+                    header = record
+                else:
+                    entry = self._entries.setdefault(record['key'], {})
+                    entry.update(record)
+        return header
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if not f.tell():
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _write(self, records):
+        self._file.write(''.join(json.dumps(record, sort_keys=True) + '\n'
+                                 for record in records))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, key):
+        return str(key) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Return what is known about ``key``: the data of all its records,
+        the latest winning, or ``None``.
+        """
+        return self._entries.get(str(key))
+
+    def state(self, key):
+        entry = self.get(key)
+        return entry['state'] if entry is not None else None
+
+    def entries(self):
+        """Return ``[(key, entry), ...]`` in the order planned."""
+        return list(self._entries.items())
+
+    def record(self, key, state, **data):
+        """Record the new ``state`` (and ``data``) of ``key``."""
+        self.record_many([key], state, **data)
+
+    def record_many(self, keys, state, **data):
+        """Record the same ``state`` for several keys with one write."""
+        records = []
+        for key in keys:
+            record = dict(data, key=str(key), state=state, time=time.time())
+            records.append(record)
+        with self._lock:
+            for record in records:
+                self._entries.setdefault(record['key'], {}).update(record)
+            self._write(records)
+
+    def prune(self, before):
+        """
+        Forget the entries done or failed before ``before`` (a timestamp),
+        rewriting the file with one record per entry left.
+
+        :returns: the number of entries dropped.
+        """
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if entry.get('state') in (DONE, FAILED) and
+                     entry.get('time', 0) < before]
+            if not stale:
+                return 0
+            for key in stale:
+                del self._entries[key]
+            path = self.path + '.tmp'
+            with open(path, 'w') as f:
+                for record in [self._header] + list(self._entries.values()):
+                    f.write(json.dumps(record, sort_keys=True) + '\n')
+            self._file.close()
+            os.rename(path, self.path)
+            self._file = open(self.path, 'a')
+        return len(stale)
+
+    def plan(self, items):
+        """
+        Record ``items``, ``[(key, data), ...]``, as planned unless already
+        journaled, e.g. by the run being resumed.
+
+        :returns: the keys not done yet, in the order of ``items``.
+        """
+        new = [(str(key), data) for key, data in items if key not in self]
+        if new:
+            now = time.time()
+            records = [dict(data, key=key, state=PLANNED, time=now)
+                       for key, data in new]
+            with self._lock:
+                for record in records:
+                    self._entries[record['key']] = dict(record)
+                self._write(records)
+        return [key for key, _data in items if self.state(key) != DONE]
@@ -0,0 +1,157 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Reverse lookups over loadbalancer dicts: which loadbalancers use an IP
+address (as a virtual IP or node), have addresses in a network, or have a
+name matching a regular expression.
+"""
+
+import bisect
+import collections
+import re
+
+import ipaddress
+import six
+
+
+Match = collections.namedtuple('Match', ['id', 'name', 'kind', 'value'])
+
+_regex_meta_re = re.compile(r'[\\.^$*+?{}\[\]|()]')
+
+
+def _trigrams(text):
+    text = text.lower()
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def _parse_address(value):
+    try:
+        return ipaddress.ip_address(six.text_type(value))
+    except ValueError:
+        return None
+
+
+class LookupIndex(object):
+    """
+    An incrementally updated index of loadbalancer dicts.
+
+    Addresses are kept in one sorted list of ``(version, int(address))``
+    keys per address, so an exact address is a bisect and a network is a
+    bisect range between its first and last address.  Names are indexed
+    by their trigrams; a query without regex syntax only checks names
+    sharing all of its trigrams.
+    """
+
+    def __init__(self, items=()):
+        self._names = {}      # {id: name}
+        self._trigrams = {}   # {trigram: set(id)}
+        self._keys = []       # sorted [(version, int(address), id, kind)]
+        self._entries = {}    # {id: [key, ...]}
+        for item in items:
+            self._add(item)
+        # Sorting once is much cheaper than inserting keys one by one.
+        self._keys = sorted(key for keys in self._entries.values()
+                            for key in keys)
+
+    def __len__(self):
+        return len(self._names)
+
+    def update(self, item):
+        """Add ``item`` (a loadbalancer dict) or replace its old entry."""
+        self.remove(item['id'])
+        for key in self._add(item):
+            bisect.insort(self._keys, key)
+
+    def _add(self, item):
+        lb_id = str(item['id'])
+        name = item.get('name') or ''
+        self._names[lb_id] = name
+        for trigram in _trigrams(name):
+            self._trigrams.setdefault(trigram, set()).add(lb_id)
+
+        keys = []
+        for kind, addresses in (('vip', item.get('virtualIps') or ()),
+                                ('node', item.get('nodes') or ())):
+            for entry in addresses:
+                address = _parse_address(entry.get('address'))
+                if address is None:
+                    continue
+                keys.append((address.version, int(address), lb_id, kind))
+        self._entries[lb_id] = keys
+        return keys
+
+    def remove(self, lb_id):
+        """Drop a loadbalancer from the index; unknown ids are ignored."""
+        lb_id = str(lb_id)
+        name = self._names.pop(lb_id, None)
+        if name is None:
+            return
+        for trigram in _trigrams(name):
+            ids = self._trigrams.get(trigram)
+            if ids is not None:
+                ids.discard(lb_id)
+                if not ids:
+                    del self._trigrams[trigram]
+        for key in self._entries.pop(lb_id, ()):
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    def _range(self, version, first, last):
+        start = bisect.bisect_left(self._keys, (version, first))
+        end = bisect.bisect_left(self._keys, (version, last + 1))
+        for _version, value, lb_id, kind in self._keys[start:end]:
+            yield Match(lb_id, self._names.get(lb_id), kind,
+                        str(ipaddress.ip_address(value)))
+
+    def by_address(self, address):
+        """Loadbalancers with ``address`` as a virtual IP or node."""
+        address = ipaddress.ip_address(six.text_type(address))
+        return list(self._range(address.version, int(address),
+                                int(address)))
+
+    def by_network(self, network):
+        """Loadbalancers with a virtual IP or node inside ``network``."""
+        network = ipaddress.ip_network(six.text_type(network), strict=False)
+        return list(self._range(network.version,
+                                int(network.network_address),
+                                int(network.broadcast_address)))
+
+    def by_name(self, pattern):
+        """Loadbalancers whose name matches the regex ``pattern``."""
+        regex = re.compile(pattern, re.I)
+        candidates = self._names
+        if not _regex_meta_re.search(pattern) and len(pattern) >= 3:
+            ids = None
+            for trigram in _trigrams(pattern):
+                found = self._trigrams.get(trigram, set())
+                ids = found if ids is None else ids & found
+            candidates = dict((lb_id, self._names[lb_id])
+                              for lb_id in ids or ())
+        return [Match(lb_id, name, 'name', name)
+                for lb_id, name in sorted(candidates.items())
+                if regex.search(name)]
+
+    def lookup(self, query):
+        """
+        Dispatch on the query: an IP address, a network in CIDR notation,
+        or else a name regex.
+        """
+        if '/' in query:
+            try:
+                return self.by_network(query)
+            except ValueError:
+                pass
+        elif _parse_address(query) is not None:
+            return self.by_address(query)
+        return self.by_name(query)
@@ -0,0 +1,271 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Fixed-size request metrics with a Prometheus text format exporter.
+"""
+
+import bisect
+import os
+import re
+import tempfile
+import threading
+
+from lbaasclient.openstack.common.py3kcompat import urlutils
+from lbaasclient.openstack.common import uuidutils
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0, 60.0)
+
+# Routes beyond this many are folded into OVERFLOW_ROUTE so a caller
+# hitting many distinct urls cannot grow the registry without bound.
+DEFAULT_MAX_ROUTES = 256
+OVERFLOW_ROUTE = '{other}'
+
+_id_re = re.compile(r'^\d+$')
+
+
+def route_template(url, base_url=None):
+    """
+    Turn a request url into a route template, e.g.
+    ``https://host/v1.0/1234/loadbalancers/42/nodes?x=1`` relative to the
+    management url ``https://host/v1.0/1234`` becomes
+    ``/loadbalancers/{id}/nodes``.
+    """
+    if base_url and url.startswith(base_url):
+        url = url[len(base_url):]
+    path = urlutils.urlsplit(url).path
+    parts = []
+    for part in path.split('/'):
+        if _id_re.match(part) or uuidutils.is_uuid_like(part):
+            part = '{id}'
+        parts.append(part)
+    return '/'.join(parts) or '/'
+
+
+def status_class(status):
+    """Return ``2xx``, ``4xx``... for an HTTP status, ``error`` otherwise."""
+    try:
+        return '%dxx' % (int(status) // 100)
+    except (TypeError, ValueError):
+        return 'error'
+
+
+class Histogram(object):
+    """A latency histogram with fixed bucket upper bounds (in seconds)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # The last slot counts observations above the largest bound.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """
+        Estimate the ``q`` (0-100) percentile by linear interpolation inside
+        the bucket holding it, clamped to the observed min and max.
+        """
+        if not self.count:
+            return None
+        rank = self.count * q / 100.0
+        seen = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(self.counts):
+            if index < len(self.buckets):
+                upper = self.buckets[index]
+            else:
+                upper = self.max
+            if bucket_count and seen + bucket_count >= rank:
+                fraction = (rank - seen) / float(bucket_count)
+                value = lower + (upper - lower) * fraction
+                return min(max(value, self.min), self.max)
+            seen += bucket_count
+            lower = upper
+        return self.max
+
+    def cumulative(self):
+        """Yield ``(upper_bound, cumulative_count)``, ending with +Inf."""
+        total = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            total += bucket_count
+            yield bound, total
+        yield float('inf'), self.count
+
+
+class MetricsRegistry(object):
+    """
+    Request counters, latency histograms and byte counts per route.
+
+    Memory is bounded by ``max_routes`` route templates times the number
+    of status classes, independently of how many requests are recorded.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, max_routes=DEFAULT_MAX_ROUTES,
+                 prefix='lbaasclient'):
+        self.buckets = tuple(buckets)
+        self.max_routes = max_routes
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}     # {(method, route, status_class): count}
+            self.latency = {}      # {(method, route): Histogram}
+            self.bytes_sent = {}   # {(method, route): bytes}
+            self.bytes_received = {}
+            self.retries = {}      # {reason: count}
+            self.auth = {}         # {outcome: count}
+
+    def _route_key(self, method, route):
+        key = (method, route)
+        if key not in self.latency and len(self.latency) >= self.max_routes:
+            key = (method, OVERFLOW_ROUTE)
+        return key
+
+    def observe_request(self, method, route, status, seconds,
+                        bytes_sent=0, bytes_received=0):
+        with self._lock:
+            key = self._route_key(method, route)
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            count_key = key + (status_class(status),)
+            self.requests[count_key] = self.requests.get(count_key, 0) + 1
+            self.bytes_sent[key] = self.bytes_sent.get(key, 0) + bytes_sent
+            self.bytes_received[key] = (self.bytes_received.get(key, 0) +
+                                        bytes_received)
+
+    def inc_retry(self, reason):
+        with self._lock:
+            self.retries[reason] = self.retries.get(reason, 0) + 1
+
+    def inc_auth(self, outcome):
+        with self._lock:
+            self.auth[outcome] = self.auth.get(outcome, 0) + 1
+
+    def percentile(self, method, route, q):
+        with self._lock:
+            histogram = self.latency.get((method, route))
+            return histogram.percentile(q) if histogram else None
+
+    def snapshot(self):
+        """Return a summary dict keyed by ``"METHOD route"``."""
+        with self._lock:
+            routes = {}
+            for (method, route), histogram in self.latency.items():
+                statuses = dict((sc, count) for (m, r, sc), count
+                                in self.requests.items()
+                                if (m, r) == (method, route))
+                routes["%s %s" % (method, route)] = {
+                    'count': histogram.count,
+                    'statuses': statuses,
+                    'sum': histogram.sum,
+                    'min': histogram.min,
+                    'max': histogram.max,
+                    'p50': histogram.percentile(50),
+                    'p90': histogram.percentile(90),
+                    'p99': histogram.percentile(99),
+                    'bytes_sent': self.bytes_sent.get((method, route), 0),
+                    'bytes_received': self.bytes_received.get(
+                        (method, route), 0),
+                }
+            return {'routes': routes,
+                    'retries': dict(self.retries),
+                    'auth': dict(self.auth)}
+
+    def to_prometheus(self):
+        """Render the registry in the Prometheus text exposition format."""
+        p = self.prefix
+        lines = []
+
+        def _labels(**labels):
+            return ','.join('%s="%s"' % (k, _escape(v))
+                            for k, v in sorted(labels.items()))
+
+        with self._lock:
+            lines.append('# HELP %s_requests_total HTTP requests made.' % p)
+            lines.append('# TYPE %s_requests_total counter' % p)
+            for (method, route, sc), count in sorted(self.requests.items()):
+                lines.append('%s_requests_total{%s} %d' % (
+                    p, _labels(method=method, route=route, status_class=sc),
+                    count))
+
+            name = '%s_request_duration_seconds' % p
+            lines.append('# HELP %s HTTP request latency.' % name)
+            lines.append('# TYPE %s histogram' % name)
+            for (method, route), histogram in sorted(self.latency.items()):
+                for bound, total in histogram.cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('%s_bucket{%s} %d' % (
+                        name, _labels(method=method, route=route, le=le),
+                        total))
+                labels = _labels(method=method, route=route)
+                lines.append('%s_sum{%s} %r' % (name, labels, histogram.sum))
+                lines.append('%s_count{%s} %d' % (name, labels,
+                                                  histogram.count))
+
+            name = '%s_bytes_total' % p
+            lines.append('# HELP %s HTTP payload bytes.' % name)
+            lines.append('# TYPE %s counter' % name)
+            for direction, counters in (('sent', self.bytes_sent),
+                                        ('received', self.bytes_received)):
+                for (method, route), value in sorted(counters.items()):
+                    lines.append('%s{%s} %d' % (
+                        name, _labels(method=method, route=route,
+                                      direction=direction), value))
+
+            for metric, counters, label in (('retries', self.retries,
+                                             'reason'),
+                                            ('auth', self.auth, 'outcome')):
+                name = '%s_%s_total' % (p, metric)
+                lines.append('# TYPE %s counter' % name)
+                for value, count in sorted(counters.items()):
+                    lines.append('%s{%s} %d' % (
+                        name, _labels(**{label: value}), count))
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """
+        Write the exposition atomically (temp file plus rename) so that a
+        node_exporter textfile collector never reads a partial file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.lbaas-metrics')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.to_prometheus())
+            os.chmod(tmp_path, 0o644)
+            os.rename(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
@@ -0,0 +1,244 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Apply many changes to many loadbalancers.
+
+A loadbalancer rejects changes (HTTP 422) while a previous one is still
+being applied (``PENDING_UPDATE``).  A :class:`MutationQueue` applies the
+changes of each loadbalancer in order, waiting for it to be ACTIVE again
+between them, and handles different loadbalancers in parallel.  All the
+threads waiting share one paged listing per poll.
+"""
+
+import collections
+import threading
+import time
+
+from lbaasclient import base
+from lbaasclient import exceptions
+from lbaasclient import parallel
+from lbaasclient import waiter
+
+
+# Times a change rejected as immutable (422) is retried.
+IMMUTABLE_RETRIES = 5
+
+
+class Operation(object):
+    """
+    A queued change of one loadbalancer: either a settings update
+    (``fields``) or a call of ``fn``.
+    """
+
+    def __init__(self, lb_id, fn=None, args=(), kwargs=None, fields=None):
+        self.lb_id = lb_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.fields = fields
+
+    def apply(self, manager):
+        if self.fields is not None:
+            return manager.update(self.lb_id, **self.fields)
+        return self.fn(*self.args, **self.kwargs)
+
+    def __repr__(self):
+        if self.fields is not None:
+            what = "update %s" % ', '.join(sorted(self.fields))
+        else:
+            what = getattr(self.fn, '__name__', repr(self.fn))
+        return "<Operation %s: %s>" % (self.lb_id, what)
+
+
+class ActiveWaiter(object):
+    """
+    Blocks threads until their loadbalancer is ACTIVE.
+
+    One of the waiting threads lists the loadbalancers for all of them;
+    a thread only trusts a listing started after it began waiting, so a
+    listing racing with its last change cannot report a stale ACTIVE.
+    """
+
+    def __init__(self, list_fn, initial_interval=1.0, max_interval=10.0,
+                 backoff=1.5, timeout=None,
+                 error_states=waiter.DEFAULT_ERROR_STATES,
+                 sleep=time.sleep, clock=time.time):
+        self._list_fn = list_fn
+        self._initial_interval = initial_interval
+        self._interval = initial_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._timeout = timeout
+        self._errors = set(state.upper() for state in error_states)
+        self._sleep = sleep
+        self._clock = clock
+
+        self._cond = threading.Condition()
+        self._polling = False
+        self._started = 0       # listings started
+        self._listed = 0        # index of the listing in _statuses
+        self._statuses = {}     # {str(id): status}
+        self._waiting = 0
+
+    def wait(self, lb_id):
+        """
+        Return once ``lb_id`` is ACTIVE.
+
+        :raises: :class:`lbaasclient.waiter.WaitError` if it is in an error
+                 state, missing, or the timeout expires.
+        """
+        lb_id = str(lb_id)
+        start = self._clock()
+        with self._cond:
+            self._waiting += 1
+            needed = self._started + 1
+            try:
+                while True:
+                    if self._listed >= needed:
+                        status = self._statuses.get(lb_id, waiter.DELETED)
+                        if status == 'ACTIVE':
+                            return
+                        if status in self._errors or status == waiter.DELETED:
+                            self._fail(lb_id, status, 'error', start)
+                    if (self._timeout is not None and
+                            self._clock() - start >= self._timeout):
+                        self._fail(lb_id, self._statuses.get(lb_id),
+                                   'timeout', start)
+                    if self._polling:
+                        self._cond.wait()
+                    else:
+                        self._poll()
+            finally:
+                self._waiting -= 1
+                if not self._waiting:
+                    self._interval = self._initial_interval
+
+    def _fail(self, lb_id, status, outcome, start):
+        result = waiter.WaitResult(lb_id)
+        result.status = status
+        result.outcome = outcome
+        result.elapsed = self._clock() - start
+        raise waiter.WaitError(result)
+
+    def _poll(self):
+        # Called with the condition held; released while listing.
+        self._polling = True
+        self._started += 1
+        index = self._started
+        interval = self._interval
+        self._cond.release()
+        try:
+            self._sleep(interval)
+            statuses = dict((str(lb.id), (lb.status or '').upper())
+                            for lb in self._list_fn())
+        finally:
+            self._cond.acquire()
+            self._polling = False
+            self._cond.notify_all()
+        self._statuses = statuses
+        self._listed = index
+        self._interval = min(interval * self._backoff, self._max_interval)
+
+
+class MutationQueue(object):
+    """
+    Collects changes of loadbalancers, then applies them with :meth:`run`.
+
+    The changes of one loadbalancer are applied in the order queued, each
+    once the previous one is done; consecutive updates are merged into a
+    single PUT.  Loadbalancers are handled ``concurrency`` at a time.
+
+    :param manager: a :class:`LoadbalancerManager`.
+    """
+
+    def __init__(self, manager, concurrency=parallel.DEFAULT_CONCURRENCY,
+                 retries=IMMUTABLE_RETRIES, **wait_kwargs):
+        self.manager = manager
+        self.concurrency = concurrency
+        self.retries = retries
+        self.wait_kwargs = wait_kwargs
+        self._operations = collections.OrderedDict()
+
+    def __len__(self):
+        return sum(len(ops) for ops in self._operations.values())
+
+    def _queue(self, loadbalancer):
+        return self._operations.setdefault(base.getid(loadbalancer), [])
+
+    def update(self, loadbalancer, **fields):
+        """
+        Queue a settings update, e.g. ``queue.update(lb, name='web')``.
+
+        It is merged into the previous operation of the loadbalancer if
+        that is an update too; later values win.
+        """
+        operations = self._queue(loadbalancer)
+        if operations and operations[-1].fields is not None:
+            operations[-1].fields.update(fields)
+            return operations[-1]
+        operation = Operation(base.getid(loadbalancer), fields=dict(fields))
+        operations.append(operation)
+        return operation
+
+    def call(self, loadbalancer, fn, *args, **kwargs):
+        """
+        Queue ``fn(*args, **kwargs)`` as a change of ``loadbalancer``, e.g.
+        ``queue.call(lb, cs.nodes.add, lb, ['10.0.0.1:80'])``.
+        """
+        operation = Operation(base.getid(loadbalancer), fn, args, kwargs)
+        self._queue(loadbalancer).append(operation)
+        return operation
+
+    def run(self):
+        """
+        Apply and clear the queued changes.
+
+        When a change fails, the later changes of the same loadbalancer
+        are not applied and get the same error.  The last change of each
+        loadbalancer is not waited for.
+
+        :returns: ``{loadbalancer id: [Outcome, ...]}`` with one
+                  :class:`lbaasclient.parallel.Outcome` per operation.
+        """
+        operations, self._operations = (self._operations,
+                                        collections.OrderedDict())
+        active = ActiveWaiter(self.manager.iterlist, **self.wait_kwargs)
+        outcomes = parallel.run(
+            lambda lb_id: self._run_loadbalancer(active, operations[lb_id]),
+            list(operations), concurrency=self.concurrency)
+        return dict((outcome.item, outcome.result) for outcome in outcomes)
+
+    def _run_loadbalancer(self, active, operations):
+        outcomes = []
+        error = None
+        for index, operation in enumerate(operations):
+            if error is None:
+                try:
+                    if index:
+                        active.wait(operation.lb_id)
+                    result = self._apply(active, operation)
+                    outcomes.append(parallel.Outcome(operation, result))
+                    continue
+                except Exception as e:
+                    error = e
+            outcomes.append(parallel.Outcome(operation, error=error))
+        return outcomes
+
+    def _apply(self, active, operation):
+        for attempt in range(self.retries + 1):
+            try:
+                return operation.apply(self.manager)
+            except exceptions.UnprocessableEntity:
+                if attempt == self.retries:
+                    raise
+                active.wait(operation.lb_id)
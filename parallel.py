@@ -0,0 +1,118 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Run independent API calls on a bounded number of threads.
+
+The HTTP session is shared, so the calls reuse its pooled connections.
+"""
+
+import sys
+import threading
+import time
+
+from six.moves import queue
+
+
+DEFAULT_CONCURRENCY = 8
+
+
+class Outcome(object):
+    """
+    The result of calling a function on one item.
+
+    :ivar result: the return value, ``None`` if the call raised.
+    :ivar error: the exception raised, ``None`` on success.
+    :ivar wait_result: the :class:`lbaasclient.waiter.WaitResult` of
+                       operations that also wait for the resource.
+    """
+
+    def __init__(self, item, result=None, error=None, exc_info=None):
+        self.item = item
+        self.result = result
+        self.error = error
+        self.exc_info = exc_info
+        self.wait_result = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return "<Outcome %r: ok>" % (self.item,)
+        return "<Outcome %r: %r>" % (self.item, self.error)
+
+
+class Pacer(object):
+    """
+    Spaces calls of :meth:`wait`, from any thread, at least ``interval``
+    seconds apart.
+    """
+
+    def __init__(self, interval, clock=time.time, sleep=time.sleep):
+        self.interval = interval
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next = None
+
+    def wait(self):
+        with self._lock:
+            now = self._clock()
+            start = now if self._next is None else max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            self._sleep(start - now)
+
+
+def _call(fn, item):
+    try:
+        return Outcome(item, result=fn(item))
+    except Exception as e:
+        return Outcome(item, error=e, exc_info=sys.exc_info())
+
+
+def run(fn, items, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Call ``fn(item)`` for every item, at most ``concurrency`` at a time.
+
+    Exceptions do not stop the other calls; they are returned in the
+    :class:`Outcome` of their item.
+
+    :returns: list of :class:`Outcome`, in the order of ``items``.
+    """
+    items = list(items)
+    if concurrency <= 1 or len(items) <= 1:
+        return [_call(fn, item) for item in items]
+
+    outcomes = [None] * len(items)
+    todo = queue.Queue()
+    for index, item in enumerate(items):
+        todo.put((index, item))
+
+    def worker():
+        while True:
+            try:
+                index, item = todo.get_nowait()
+            except queue.Empty:
+                return
+            outcomes[index] = _call(fn, item)
+
+    threads = [threading.Thread(target=worker, name='lbaas-worker-%d' % i)
+               for i in range(min(concurrency, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
@@ -0,0 +1,421 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Declarative loadbalancer configuration.
+
+:func:`plan` compares a config, a list of loadbalancers each given by
+``name`` (or ``id``) with any of their settings, ``nodes``, ``accessList``
+and ``healthMonitor``, with the live state and returns the changes needed;
+:meth:`Plan.apply` makes them.
+
+Only what an entry mentions is managed: an entry without ``nodes`` leaves
+the nodes alone, ``healthMonitor: null`` removes the monitor.  Live
+loadbalancers missing from the config are left alone.  A loadbalancer
+that does not exist yet is created.
+"""
+
+import collections
+import json
+
+import six
+
+from lbaasclient import parallel
+from lbaasclient import utils
+from lbaasclient.v1_0 import access_lists
+from lbaasclient.v1_0 import nodes
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+# Settings changed with PUT /loadbalancers/{id}, see
+# lbaasclient.v1_0.loadbalancers.UPDATABLE_FIELDS.
+SETTINGS = ('name', 'algorithm', 'protocol', 'port', 'timeout',
+            'halfClosed', 'httpsRedirect')
+
+# Settings accepted by LoadbalancerManager.create().
+CREATE_SETTINGS = ('name', 'protocol', 'port', 'algorithm')
+
+# Node fields compared, besides the address and port identifying a node.
+NODE_FIELDS = ('condition', 'weight', 'type')
+
+
+def load_config(path):
+    """
+    Read the loadbalancer entries of a YAML or JSON config file: a list,
+    or a mapping with a ``loadbalancers`` list.
+
+    YAML needs PyYAML; without it only JSON can be read.
+    """
+    with open(path) as f:
+        text = f.read()
+    if yaml is not None:
+        data = yaml.safe_load(text)
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ValueError("%s is not valid JSON (%s); install PyYAML to "
+                             "read YAML configs" % (path, e))
+
+    if isinstance(data, dict):
+        data = data.get('loadbalancers')
+    if not isinstance(data, list) or not all(
+            isinstance(entry, dict) and (entry.get('name') or 'id' in entry)
+            for entry in data):
+        raise ValueError("%s must hold a list of loadbalancers, each with "
+                         "a name or an id" % path)
+    return data
+
+
+def _chunk_count(count, size):
+    return (count + size - 1) // size
+
+
+class Change(object):
+    """
+    One step of a plan, making ``calls`` API calls.
+
+    Settings updates have ``fields``; other changes call
+    ``fn(loadbalancer_id, *args, **kwargs)``.
+
+    :ivar outcome: the :class:`lbaasclient.parallel.Outcome` once applied.
+    """
+
+    def __init__(self, action, description, calls, fn=None, args=(),
+                 kwargs=None, fields=None):
+        self.action = action
+        self.description = description
+        self.calls = calls
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.fields = fields
+        self.outcome = None
+
+    def queue(self, queue, lb_id):
+        if self.fields is not None:
+            queue.update(lb_id, **self.fields)
+        else:
+            queue.call(lb_id, self.fn, lb_id, *self.args, **self.kwargs)
+
+    def __str__(self):
+        return "%s %s" % (self.action, self.description)
+
+
+class LoadbalancerPlan(object):
+    """
+    The changes of one configured loadbalancer.
+
+    :ivar create: the create arguments when it does not exist yet.
+    """
+
+    def __init__(self, name, lb_id=None, create=None):
+        self.name = name
+        self.id = lb_id
+        self.create = create
+        self.create_outcome = None
+        self.changes = []
+
+    @property
+    def calls(self):
+        return (sum(change.calls for change in self.changes) +
+                (1 if self.create is not None else 0))
+
+    def __str__(self):
+        if self.id is None:
+            return "%s (new)" % self.name
+        return "%s (%s)" % (self.name, self.id)
+
+
+class Plan(object):
+    """The changes needed by a config, per loadbalancer."""
+
+    def __init__(self, cs, loadbalancers):
+        self.cs = cs
+        self.loadbalancers = loadbalancers
+
+    @property
+    def changed(self):
+        return [lb for lb in self.loadbalancers if lb.calls]
+
+    @property
+    def calls(self):
+        return sum(lb.calls for lb in self.loadbalancers)
+
+    def format(self):
+        lines = []
+        for lb in self.changed:
+            lines.append("%s:" % lb)
+            if lb.create is not None:
+                lines.append("  + create loadbalancer  [1 call]")
+            for change in lb.changes:
+                lines.append("  %s  [%d call%s]" % (
+                    change, change.calls, '' if change.calls == 1 else 's'))
+        created = len([lb for lb in self.changed if lb.create is not None])
+        lines.append("Plan: %d API calls, %d loadbalancers to change, %d to "
+                     "create, %d unchanged." % (
+                         self.calls, len(self.changed) - created, created,
+                         len(self.loadbalancers) - len(self.changed)))
+        return '\n'.join(lines)
+
+    def apply(self, concurrency=parallel.DEFAULT_CONCURRENCY):
+        """
+        Make the changes: those of one loadbalancer in order, waiting for
+        it to be ACTIVE in between, different loadbalancers in parallel.
+
+        New loadbalancers are created (and waited for) while the existing
+        ones are changed, then get their remaining changes.  Every change
+        gets its ``outcome``.
+
+        :returns: the changes that failed.
+        """
+        existing = [lb for lb in self.changed if lb.create is None]
+        created = [lb for lb in self.changed if lb.create is not None]
+        parallel.run(lambda phase: phase(), [
+            lambda: self._apply_changes(existing, concurrency),
+            lambda: self._apply_creates(created, concurrency)], concurrency=2)
+        return [change for lb in self.changed for change in lb.changes
+                if change.outcome is not None and not change.outcome.ok]
+
+    def _apply_changes(self, loadbalancers, concurrency):
+        queue = self.cs.loadbalancers.mutations(concurrency=concurrency)
+        for lb in loadbalancers:
+            for change in lb.changes:
+                change.queue(queue, lb.id)
+        results = queue.run()
+        for lb in loadbalancers:
+            for change, outcome in zip(lb.changes, results.get(lb.id, ())):
+                change.outcome = outcome
+
+    def _apply_creates(self, loadbalancers, concurrency):
+        if not loadbalancers:
+            return
+        outcomes = self.cs.loadbalancers.create_many(
+            [lb.create for lb in loadbalancers], concurrency=concurrency)
+        ready = []
+        for lb, outcome in zip(loadbalancers, outcomes):
+            lb.create_outcome = outcome
+            if outcome.result is not None:
+                lb.id = outcome.result.id
+            if outcome.ok:
+                ready.append(lb)
+            else:
+                for change in lb.changes:
+                    change.outcome = parallel.Outcome(change,
+                                                      error=outcome.error)
+        self._apply_changes(ready, concurrency)
+
+
+def _node_key(node):
+    return (node.get('address'), int(node.get('port') or 0))
+
+
+def _describe_node(node):
+    address = node.get('address')
+    if ':' in address:
+        address = '[%s]' % address
+    return '%s:%s' % (address, node.get('port'))
+
+
+def _access_key(item):
+    return (item.get('address'), (item.get('type') or '').upper())
+
+
+def _describe_changes(current, fields):
+    return ', '.join('%s %s -> %s' % (field, current.get(field), value)
+                     for field, value in sorted(fields.items()))
+
+
+def _diff_settings(cs, entry, info):
+    fields = dict((field, entry[field]) for field in SETTINGS
+                  if field in entry and entry[field] != info.get(field))
+    if not fields:
+        return []
+    return [Change('~', 'update %s' % _describe_changes(info, fields), 1,
+                   fields=fields)]
+
+
+def _diff_nodes(cs, entry, live_nodes):
+    desired = collections.OrderedDict()
+    for spec in entry.get('nodes') or ():
+        node = utils.parse_node_spec(spec)
+        desired[_node_key(node)] = node
+    live = dict((_node_key(node), node) for node in live_nodes or ())
+
+    changes = []
+    to_add = [node for key, node in desired.items() if key not in live]
+    if to_add:
+        changes.append(Change(
+            '+', 'add nodes %s' % ', '.join(_describe_node(node)
+                                            for node in to_add),
+            _chunk_count(len(to_add), nodes.ADD_CHUNK_SIZE),
+            cs.nodes.add, (to_add,)))
+
+    to_delete = [node for key, node in sorted(live.items())
+                 if key not in desired]
+    if to_delete:
+        changes.append(Change(
+            '-', 'delete nodes %s' % ', '.join(_describe_node(node)
+                                               for node in to_delete),
+            _chunk_count(len(to_delete), nodes.DELETE_CHUNK_SIZE),
+            cs.nodes.delete, ([node['id'] for node in to_delete],)))
+
+    for key, node in desired.items():
+        current = live.get(key)
+        if current is None:
+            continue
+        fields = dict((field, node[field]) for field in NODE_FIELDS
+                      if field in node and node[field] != current.get(field))
+        if fields:
+            changes.append(Change(
+                '~', 'update node %s: %s' % (
+                    _describe_node(node), _describe_changes(current, fields)),
+                1, cs.nodes.update, (current['id'],), kwargs=fields))
+    return changes
+
+
+def _diff_access_list(cs, entry, live_items):
+    desired = collections.OrderedDict(
+        (_access_key(item), item) for item in entry.get('accessList') or ())
+    live = dict((_access_key(item), item) for item in live_items or ())
+
+    changes = []
+    to_add = [dict(item, type=key[1])
+              for key, item in desired.items() if key not in live]
+    if to_add:
+        changes.append(Change(
+            '+', 'add access list %s' % ', '.join(
+                '%s %s' % (item['type'], item['address'])
+                for item in to_add),
+            1, cs.access_lists.add, (to_add,)))
+    to_delete = [item for key, item in sorted(live.items())
+                 if key not in desired]
+    if to_delete:
+        changes.append(Change(
+            '-', 'delete access list %s' % ', '.join(
+                '%s %s' % (item.get('type'), item.get('address'))
+                for item in to_delete),
+            _chunk_count(len(to_delete), access_lists.DELETE_CHUNK_SIZE),
+            cs.access_lists.delete, ([item['id'] for item in to_delete],)))
+    return changes
+
+
+def _diff_health_monitor(cs, entry, live_monitor):
+    desired = entry.get('healthMonitor')
+    live_monitor = live_monitor or {}
+    if desired is None:
+        if live_monitor.get('type'):
+            return [Change('-', 'delete health monitor', 1,
+                           cs.health_monitors.delete)]
+        return []
+    fields = dict((field, value) for field, value in six.iteritems(desired)
+                  if live_monitor.get(field) != value)
+    if not fields:
+        return []
+    return [Change('~', 'update health monitor %s' % _describe_changes(
+        live_monitor, fields), 1, cs.health_monitors.update,
+        kwargs=desired)]
+
+
+def _diff(cs, entry, info, access_list=None, health_monitor=None):
+    changes = _diff_settings(cs, entry, info)
+    if 'nodes' in entry:
+        changes.extend(_diff_nodes(cs, entry, info.get('nodes')))
+    if 'accessList' in entry:
+        changes.extend(_diff_access_list(cs, entry, access_list))
+    if 'healthMonitor' in entry:
+        changes.extend(_diff_health_monitor(cs, entry, health_monitor))
+    return changes
+
+
+def _plan_create(cs, entry):
+    name = entry.get('name')
+    if not name or not entry.get('protocol'):
+        raise ValueError("Loadbalancer %s does not exist; creating it needs "
+                         "a name and a protocol" % (name or entry.get('id')))
+    create = dict((field, entry[field]) for field in CREATE_SETTINGS
+                  if field in entry)
+    create['vip_type'] = entry.get('vip_type', 'PUBLIC')
+    create['nodes'] = [utils.parse_node_spec(node)
+                       for node in entry.get('nodes') or ()]
+    create['loaded'] = True
+
+    lb = LoadbalancerPlan(name, create=create)
+    # Everything create() does not set is changed once it is ACTIVE.
+    info = dict(create, nodes=create['nodes'])
+    rest = dict((key, value) for key, value in six.iteritems(entry)
+                if key not in ('nodes', 'vip_type'))
+    lb.changes = _diff(cs, rest, info, access_list=[], health_monitor={})
+    return lb
+
+
+def _fetch(cs, entry, lb_id):
+    info = cs.loadbalancers.get(lb_id)._info
+    access_list = health_monitor = None
+    if 'accessList' in entry:
+        access_list = info.get('accessList')
+        if access_list is None:
+            access_list = [item._info for item in cs.access_lists.list(lb_id)]
+    if 'healthMonitor' in entry:
+        health_monitor = info.get('healthMonitor')
+        if health_monitor is None:
+            health_monitor = cs.health_monitors.get(lb_id)._info
+    return info, access_list, health_monitor
+
+
+def plan(cs, config, concurrency=parallel.DEFAULT_CONCURRENCY):
+    """
+    Compare ``config`` (see :func:`load_config`) with the live state and
+    return a :class:`Plan`.
+
+    The loadbalancers are listed once, then the details of the configured
+    ones are fetched ``concurrency`` at a time.
+    """
+    by_id = {}
+    by_name = {}
+    for lb in cs.loadbalancers.iterlist():
+        by_id[str(lb.id)] = lb
+        by_name.setdefault(lb.name, []).append(lb)
+
+    plans = []
+    to_fetch = []
+    for entry in config:
+        if 'id' in entry:
+            lb = by_id.get(str(entry['id']))
+            if lb is None:
+                raise ValueError("No loadbalancer with id %s" % entry['id'])
+        else:
+            matches = by_name.get(entry['name'], [])
+            if len(matches) > 1:
+                raise ValueError("Several loadbalancers are named %s, use "
+                                 "an id" % entry['name'])
+            lb = matches[0] if matches else None
+        if lb is None:
+            plans.append(_plan_create(cs, entry))
+        else:
+            plans.append(LoadbalancerPlan(entry.get('name') or lb.name,
+                                          lb.id))
+            to_fetch.append((len(plans) - 1, entry))
+
+    outcomes = parallel.run(lambda item: _fetch(cs, item[1],
+                                                plans[item[0]].id),
+                            to_fetch, concurrency=concurrency)
+    for outcome in outcomes:
+        if not outcome.ok:
+            six.reraise(*outcome.exc_info)
+        index, entry = outcome.item
+        plans[index].changes = _diff(cs, entry, *outcome.result)
+    return Plan(cs, plans)
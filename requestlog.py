@@ -0,0 +1,132 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Structured request log: one JSON object per line (NDJSON) per HTTP call,
+plus the offline analyzer behind ``lbaas log-analyze``.
+"""
+
+import json
+import logging
+import re
+
+from lbaasclient import asynclog
+from lbaasclient import metrics
+from lbaasclient import timings
+from lbaasclient import transport
+
+
+_token_re = re.compile(r'(/tokens/)[^/?]+')
+_query_token_re = re.compile(r'((?:token|password|key)=)[^&]+', re.I)
+
+
+def redact(url):
+    """Strip tokens and credentials that may be embedded in a url."""
+    url = _token_re.sub(r'\1***', url)
+    return _query_token_re.sub(r'\1***', url)
+
+
+class _NDJSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        return json.dumps(record.msg, sort_keys=True)
+
+
+class RequestLog(object):
+    """
+    Writes one NDJSON record per request to ``path``.
+
+    Records are handed to a background thread through a bounded queue, so
+    serializing and writing them never delays the request itself.
+    """
+
+    def __init__(self, path, maxsize=10000):
+        self.path = path
+        handler = logging.FileHandler(path)
+        handler.setFormatter(_NDJSONFormatter())
+        self.handler, self.listener = asynclog.async_handler(handler,
+                                                             maxsize=maxsize)
+        self.logger = logging.Logger('lbaasclient.requestlog')
+        self.logger.addHandler(self.handler)
+
+    def log(self, method, url, status, start, end, base_url=None,
+            bytes_sent=0, bytes_received=0, request_id=None, retry_count=0,
+            phases=None):
+        record = {'ts': start,
+                  'method': method,
+                  'route': metrics.route_template(url, base_url),
+                  'url': redact(url),
+                  'status': status,
+                  'duration': end - start,
+                  'bytes_sent': bytes_sent,
+                  'bytes_received': bytes_received,
+                  'request_id': request_id,
+                  'retry_count': retry_count}
+        if phases:
+            record['phases'] = dict((name, phases[name])
+                                    for name in transport.PHASES)
+        self.logger.info(record)
+
+    def close(self):
+        self.listener.stop()
+        self.handler.close()
+
+
+def read_records(paths):
+    """Yield the records of one or more NDJSON request logs."""
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A truncated last line from an interrupted run.
+                    continue
+
+
+def analyze(records):
+    """
+    Summarize request records per ``METHOD route``.
+
+    :returns: a list of dicts with ``route``, ``count``, ``errors``,
+              ``error_rate``, ``p50``, ``p90``, ``p99``, ``max`` and
+              ``retries``, slowest p90 first.
+    """
+    routes = {}
+    for record in records:
+        key = "%s %s" % (record.get('method'), record.get('route'))
+        stats = routes.setdefault(key, {'durations': [], 'errors': 0,
+                                        'retries': 0})
+        stats['durations'].append(record.get('duration') or 0.0)
+        status = record.get('status')
+        if status is None or status >= 400:
+            stats['errors'] += 1
+        stats['retries'] += record.get('retry_count') or 0
+
+    summary = []
+    for route, stats in routes.items():
+        durations = sorted(stats['durations'])
+        count = len(durations)
+        summary.append({'route': route,
+                        'count': count,
+                        'errors': stats['errors'],
+                        'error_rate': stats['errors'] / float(count),
+                        'p50': timings.percentile(durations, 50),
+                        'p90': timings.percentile(durations, 90),
+                        'p99': timings.percentile(durations, 99),
+                        'max': durations[-1],
+                        'retries': stats['retries']})
+    summary.sort(key=lambda row: row['p90'], reverse=True)
+    return summary
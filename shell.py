@@ -53,7 +53,12 @@ import lbaasclient.auth_plugin
 from lbaasclient import client
 from lbaasclient import exceptions as exc
 import lbaasclient.extension
+from lbaasclient import metrics
 from lbaasclient.openstack.common import strutils
+from lbaasclient import requestlog
+from lbaasclient import timings
+from lbaasclient import tracing
+from lbaasclient import transport
 from lbaasclient import utils
 from lbaasclient.v1_0 import shell as shell_v1_0
 
@@ -242,6 +247,22 @@ class OpenStackComputeShell(object):
             action='store_true',
             help="Print debugging output")
 
+        parser.add_argument('--debug-sample-rate',
+            default=utils.env('LBAAS_DEBUG_SAMPLE_RATE', default=1.0),
+            type=float,
+            metavar='<rate>',
+            help="With --debug, only log this fraction (0-1) of HTTP "
+                 "requests. Defaults to env[LBAAS_DEBUG_SAMPLE_RATE] or 1.")
+
+        parser.add_argument('--debug-max-body',
+            default=utils.env('LBAAS_DEBUG_MAX_BODY',
+                              default=client.DEFAULT_LOG_BODY_BYTES),
+            type=int,
+            metavar='<bytes>',
+            help="With --debug, truncate logged request and response bodies "
+                 "to this many bytes. Defaults to env[LBAAS_DEBUG_MAX_BODY] "
+                 "or %d." % client.DEFAULT_LOG_BODY_BYTES)
+
         parser.add_argument('--no-cache',
             default=not utils.bool_from_str(
                     utils.env('OS_NO_CACHE', default='true')),
@@ -263,12 +284,54 @@ class OpenStackComputeShell(object):
             action='store_true',
             help="Print call timing info")
 
+        parser.add_argument('--timings-trace',
+            default=None,
+            metavar='<file>',
+            help="Write a Chrome/Perfetto trace of the CLI phases, "
+                 "operations and HTTP calls to this file.")
+
+        parser.add_argument('--request-log',
+            default=utils.env('LBAAS_REQUEST_LOG', default=None),
+            metavar='<file>',
+            help="Append one JSON record per HTTP call to this file "
+                 "(see log-analyze). Defaults to env[LBAAS_REQUEST_LOG].")
+
+        parser.add_argument('--metrics-file',
+            default=utils.env('LBAAS_METRICS_FILE', default=None),
+            metavar='<path>',
+            help="Write request metrics in the Prometheus text format to "
+                 "this file (e.g. for the node_exporter textfile "
+                 "collector). Defaults to env[LBAAS_METRICS_FILE].")
+
         parser.add_argument('--timeout',
             default=600,
             metavar='<seconds>',
             type=positive_non_zero_float,
             help="Set HTTP call timeout (in seconds)")
 
+        parser.add_argument('--prewarm-connections',
+            default=utils.env('LBAAS_PREWARM_CONNECTIONS', default=0),
+            metavar='<count>',
+            type=int,
+            help="Open this many connections to the API endpoint in the "
+                 "background right after authenticating. "
+                 "Defaults to env[LBAAS_PREWARM_CONNECTIONS] or 0.")
+
+        parser.add_argument('--dns-cache-ttl',
+            default=utils.env('LBAAS_DNS_CACHE_TTL', default=None),
+            metavar='<seconds>',
+            type=positive_non_zero_float,
+            help="Cache DNS lookups for this many seconds. "
+                 "Defaults to env[LBAAS_DNS_CACHE_TTL].")
+
+        parser.add_argument('--idempotency-header',
+            default=utils.env('LBAAS_IDEMPOTENCY_HEADER', default=None),
+            metavar='<header>',
+            help="Header the server takes idempotency keys of creates in, "
+                 "e.g. Idempotency-Key; without it keys are checked through "
+                 "loadbalancer metadata. "
+                 "Defaults to env[LBAAS_IDEMPOTENCY_HEADER].")
+
         parser.add_argument('--os-username',
             metavar='<auth-user-name>',
             default=utils.env('OS_USERNAME', 'LBAAS_USERNAME'),
@@ -499,18 +562,22 @@ class OpenStackComputeShell(object):
                             format=streamformat)
 
     def main(self, argv):
+        self.phase_timer = timings.PhaseTimer()
+        phase = self.phase_timer.phase
 
         # Parse args once to find version and debug settings
-        parser = self.get_base_parser()
-        (options, args) = parser.parse_known_args(argv)
+        with phase('parse base arguments'):
+            parser = self.get_base_parser()
+            (options, args) = parser.parse_known_args(argv)
         self.setup_debugging(options.debug)
 
-        # Discover available auth plugins
-        lbaasclient.auth_plugin.discover_auth_systems()
+        with phase('discover extensions'):
+            # Discover available auth plugins
+            lbaasclient.auth_plugin.discover_auth_systems()
 
-        # build available subcommands based on version
-        self.extensions = self._discover_extensions(
-                options.os_compute_api_version)
+            # build available subcommands based on version
+            self.extensions = self._discover_extensions(
+                    options.os_compute_api_version)
         self._run_extension_hooks('__pre_parse_args__')
 
         # NOTE(dtroyer): Hackery to handle --endpoint_type due to argparse
@@ -521,15 +588,17 @@ class OpenStackComputeShell(object):
             spot = argv.index('--endpoint_type')
             argv[spot] = '--endpoint-type'
 
-        subcommand_parser = self.get_subcommand_parser(
-                options.os_compute_api_version)
+        with phase('build subcommand parser'):
+            subcommand_parser = self.get_subcommand_parser(
+                    options.os_compute_api_version)
         self.parser = subcommand_parser
 
         if options.help or not argv:
             subcommand_parser.print_help()
             return 0
 
-        args = subcommand_parser.parse_args(argv)
+        with phase('parse arguments'):
+            args = subcommand_parser.parse_args(argv)
         self._run_extension_hooks('__post_parse_args__', args)
 
         # Short-circuit and deal with help right away.
@@ -608,6 +677,22 @@ class OpenStackComputeShell(object):
                 raise exc.CommandError("You must provide an auth url "
                         "via either --os-auth-url or env[OS_AUTH_URL]")
 
+        if args.metrics_file:
+            metrics_registry = metrics.MetricsRegistry()
+        else:
+            metrics_registry = None
+
+        if args.request_log:
+            request_log = requestlog.RequestLog(args.request_log)
+        else:
+            request_log = None
+
+        collect_timings = args.timings or bool(args.timings_trace)
+        if collect_timings:
+            tracer = tracing.RecordingTracer()
+        else:
+            tracer = None
+
         self.cs = client.Client(options.os_compute_api_version, os_username,
                 os_password, os_tenant_name, tenant_id=os_tenant_id,
                 auth_url=os_auth_url, insecure=insecure,
@@ -616,9 +701,17 @@ class OpenStackComputeShell(object):
                 service_name=service_name, auth_system=os_auth_system,
                 auth_plugin=auth_plugin,
                 volume_service_name=volume_service_name,
-                timings=args.timings, bypass_url=bypass_url,
+                timings=collect_timings, bypass_url=bypass_url,
                 os_cache=os_cache, http_log_debug=options.debug,
-                cacert=cacert, timeout=timeout)
+                cacert=cacert, timeout=timeout,
+                prewarm_connections=args.prewarm_connections,
+                dns_cache_ttl=args.dns_cache_ttl,
+                metrics=metrics_registry, tracer=tracer,
+                request_log=request_log,
+                http_log_sample_rate=args.debug_sample_rate,
+                http_log_max_body=args.debug_max_body,
+                completion_cache=True,
+                idempotency_header=args.idempotency_header)
 
         # Now check for the password/token of which pieces of the
         # identifying keyring key can come from the underlying client
@@ -661,29 +754,85 @@ class OpenStackComputeShell(object):
                 self.cs.client.keyring_saver = helper
 
         try:
-            if not utils.isunauthenticated(args.func):
-                self.cs.authenticate()
-        except exc.Unauthorized:
-            raise exc.CommandError("Invalid OpenStack Nova credentials.")
-        except exc.AuthorizationFailure:
-            raise exc.CommandError("Unable to authorize user")
-
-        args.func(self.cs, args)
-
+            try:
+                if not utils.isunauthenticated(args.func):
+                    with phase('authenticate'):
+                        self.cs.authenticate()
+            except exc.Unauthorized:
+                raise exc.CommandError("Invalid OpenStack Nova credentials.")
+            except exc.AuthorizationFailure:
+                raise exc.CommandError("Unable to authorize user")
+
+            with phase('command'):
+                args.func(self.cs, args)
+        finally:
+            if metrics_registry is not None:
+                metrics_registry.write_textfile(args.metrics_file)
+            if request_log is not None:
+                request_log.close()
+
+        request_timings = self.cs.get_timings(detailed=True)
         if args.timings:
-            self._dump_timings(self.cs.get_timings())
+            self._dump_timings(request_timings)
+            self._dump_timings_summary(request_timings,
+                                       self.cs.client.management_url)
+        if args.timings_trace:
+            timings.write_chrome_trace(args.timings_trace,
+                                       request_timings=request_timings,
+                                       spans=tracer.spans,
+                                       phases=self.phase_timer.phases)
+
+    def _dump_timings_summary(self, request_timings, base_url):
+        class Row(object):
+            def __init__(self, **fields):
+                for key, value in fields.items():
+                    if isinstance(value, float):
+                        value = '%.4f' % value
+                    setattr(self, key, value)
+
+        rows = [Row(**row) for row in
+                timings.summarize_requests(request_timings, base_url)]
+        utils.print_list(rows, ["route", "count", "min", "p50", "max",
+                                "total"])
+
+        phases = [Row(phase=name, seconds=seconds)
+                  for name, seconds in self.phase_timer.totals()]
+        if request_timings:
+            wall = (max(t['end'] for t in request_timings) -
+                    min(t['start'] for t in request_timings))
+            phases.append(Row(phase='requests (wall clock, %d max in flight)'
+                                    % timings.max_concurrency(
+                                        request_timings),
+                              seconds=wall))
+        utils.print_list(phases, ["phase", "seconds"])
 
     def _dump_timings(self, timings):
+        phases = list(transport.PHASES) + ['bytes_sent', 'bytes_received']
+
         class Tyme(object):
-            def __init__(self, url, seconds):
+            def __init__(self, url, seconds, **phase_values):
                 self.url = url
                 self.seconds = seconds
-        results = [Tyme(url, end - start) for url, start, end in timings]
+                for phase in phases:
+                    value = phase_values.get(phase, '')
+                    if isinstance(value, float):
+                        value = '%.4f' % value
+                    setattr(self, phase, value)
+
+        results = []
+        totals = dict.fromkeys(phases, 0)
+        for timing in timings:
+            values = dict((phase, timing[phase]) for phase in phases)
+            results.append(Tyme(timing['url'],
+                                timing['end'] - timing['start'], **values))
+            for phase in phases:
+                totals[phase] += timing[phase]
         total = 0.0
         for tyme in results:
             total += tyme.seconds
-        results.append(Tyme("Total", total))
-        utils.print_list(results, ["url", "seconds"], sortby_index=None)
+        results.append(Tyme("Total", total, **totals))
+        utils.print_list(results, ["url", "seconds"] + phases,
+                         sortby_index=None)
 
     def _run_extension_hooks(self, hook_type, *args, **kwargs):
         """Run hooks for all registered extensions."""
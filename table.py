@@ -0,0 +1,274 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar tables for large listings.
+
+A :class:`ResourceTable` stores a listing column by column: integers in
+typed arrays, low-cardinality strings (status, protocol...) dictionary
+encoded as integer codes over interned categories, anything else in plain
+lists.  Filters, sorts and counts work on whole columns, using NumPy when
+it is installed, and resources are only built for the rows accessed.
+"""
+
+import array
+import collections
+
+import six
+from six.moves import intern
+
+try:
+    import numpy
+    HAS_NUMPY = True
+except ImportError:
+    numpy = None
+    HAS_NUMPY = False
+
+
+INT = 'int'
+CATEGORY = 'category'
+OBJECT = 'object'
+
+# Stored in integer columns for missing or non-integer values.
+NULL_INT = -1
+
+
+class Column(object):
+    """
+    Describes one column of a :class:`ResourceTable`.
+
+    :param name: column name.
+    :param kind: :data:`INT`, :data:`CATEGORY` or :data:`OBJECT`.
+    :param key: the resource dict key holding the value, or a callable
+                taking the dict; defaults to ``name``.
+    """
+
+    def __init__(self, name, kind=OBJECT, key=None):
+        self.name = name
+        self.kind = kind
+        self.key = key or name
+
+    def extract(self, info):
+        if callable(self.key):
+            return self.key(info)
+        return info.get(self.key)
+
+
+def _int_array(values):
+    if HAS_NUMPY:
+        return numpy.array(values, dtype=numpy.int64)
+    return array.array('l', values)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return NULL_INT
+
+
+class _Store(object):
+    """The full columns of a listing, shared by every view of it."""
+
+    def __init__(self, manager, data, columns, resource_class):
+        self.manager = manager
+        self.data = data
+        self.resource_class = resource_class
+        self.columns = collections.OrderedDict()
+        self.categories = {}
+        self.resources = {}
+
+        for column in columns:
+            values = [column.extract(info) for info in data]
+            if column.kind == INT:
+                self.columns[column.name] = _int_array(
+                    [_to_int(value) for value in values])
+            elif column.kind == CATEGORY:
+                codes = {}
+                categories = []
+                encoded = []
+                for value in values:
+                    code = codes.get(value)
+                    if code is None:
+                        code = codes[value] = len(categories)
+                        if isinstance(value, str):
+                            value = intern(value)
+                        categories.append(value)
+                    encoded.append(code)
+                self.columns[column.name] = _int_array(encoded)
+                self.categories[column.name] = categories
+            else:
+                self.columns[column.name] = values
+
+    def resource(self, row):
+        resource = self.resources.get(row)
+        if resource is None:
+            # Through the manager, so that an identity map is honoured.
+            resource = self.resources[row] = self.manager._make(
+                self.resource_class, self.data[row], loaded=True)
+        return resource
+
+
+class ResourceTable(object):
+    """
+    A columnar, read-only view over a listing.
+
+    Filtering, sorting and slicing return new views sharing the same
+    columns; indexing or iterating builds the resources of the selected
+    rows on demand (and only once per row).
+    """
+
+    def __init__(self, manager, data, columns, resource_class, _rows=None,
+                 _store=None):
+        self._store = _store or _Store(manager, data, columns,
+                                       resource_class)
+        if _rows is None:
+            _rows = _int_array(range(len(self._store.data)))
+        self._rows = _rows
+
+    def _view(self, rows):
+        return ResourceTable(None, None, None, None, _rows=rows,
+                             _store=self._store)
+
+    @property
+    def columns(self):
+        return list(self._store.columns)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        for row in self._rows:
+            yield self._store.resource(int(row))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._view(self._rows[index])
+        return self._store.resource(int(self._rows[index]))
+
+    def __repr__(self):
+        return "<ResourceTable %d rows: %s>" % (len(self), ', '.join(
+            self.columns))
+
+    def _codes(self, name):
+        """Return the column's stored values for the rows of this view."""
+        column = self._store.columns[name]
+        if HAS_NUMPY and not isinstance(column, list):
+            return column[self._rows]
+        return [column[row] for row in self._rows]
+
+    def column(self, name):
+        """Return the decoded values of a column, in row order."""
+        codes = self._codes(name)
+        categories = self._store.categories.get(name)
+        if categories is not None:
+            return [categories[code] for code in codes]
+        if HAS_NUMPY and not isinstance(codes, list):
+            return codes.tolist()
+        return list(codes)
+
+    def _mask(self, name, accepted):
+        """A per-row boolean sequence: is the row's value in accepted?"""
+        codes = self._codes(name)
+        categories = self._store.categories.get(name)
+        if categories is not None:
+            accepted = set(code for code, value in enumerate(categories)
+                           if value in accepted)
+        if HAS_NUMPY and not isinstance(codes, list):
+            return numpy.isin(codes, list(accepted))
+        return [code in accepted for code in codes]
+
+    def filter(self, **conditions):
+        """
+        Keep rows whose columns equal the given values; pass a list, tuple
+        or set to accept any of several values, e.g.
+        ``table.filter(status='ACTIVE', protocol=('HTTP', 'HTTPS'))``.
+        """
+        rows = self._rows
+        view = self
+        for name, value in six.iteritems(conditions):
+            if not isinstance(value, (list, tuple, set, frozenset)):
+                value = (value,)
+            mask = view._mask(name, set(value))
+            if HAS_NUMPY and not isinstance(mask, list):
+                rows = rows[mask]
+            else:
+                rows = _int_array([row for row, keep in zip(rows, mask)
+                                   if keep])
+            view = self._view(rows)
+        return view
+
+    def sort(self, name, reverse=False):
+        """Return a view ordered by a column (stable)."""
+        codes = self._codes(name)
+        categories = self._store.categories.get(name)
+        if categories is not None:
+            # Order codes by the value they stand for.
+            ranks = dict((code, rank) for rank, code in enumerate(
+                sorted(range(len(categories)),
+                       key=lambda code: _sort_key(categories[code]))))
+            codes = [ranks[code] for code in codes]
+
+        if HAS_NUMPY and not isinstance(self._store.columns[name], list):
+            keys = numpy.asarray(codes)
+            if reverse:
+                # Negate rather than flip so that equal values keep their
+                # order, as sorted(reverse=True) does.
+                keys = -keys
+            order = numpy.argsort(keys, kind='mergesort')
+            return self._view(self._rows[order])
+
+        order = sorted(range(len(codes)), key=lambda i: _sort_key(codes[i]),
+                       reverse=reverse)
+        return self._view(_int_array([self._rows[i] for i in order]))
+
+    def count_by(self, name):
+        """Return ``{value: number of rows}`` for a column."""
+        codes = self._codes(name)
+        categories = self._store.categories.get(name)
+        if categories is not None:
+            if HAS_NUMPY and not isinstance(codes, list):
+                counts = numpy.bincount(codes, minlength=len(categories))
+                return dict((categories[code], int(count))
+                            for code, count in enumerate(counts) if count)
+            counts = collections.Counter(codes)
+            return dict((categories[code], count)
+                        for code, count in counts.items())
+        return dict(collections.Counter(self.column(name)))
+
+    def group_by(self, name):
+        """Return ``{value: ResourceTable}`` with the rows of each value."""
+        groups = collections.OrderedDict()
+        for row, value in zip(self._rows, self.column(name)):
+            groups.setdefault(_hashable(value), []).append(row)
+        return collections.OrderedDict(
+            (value, self._view(_int_array(rows)))
+            for value, rows in groups.items())
+
+    def to_list(self):
+        """Build and return every selected resource."""
+        return list(self)
+
+
+def _sort_key(value):
+    # None sorts first; mixed types sort by type name, then value.
+    if value is None:
+        return (0, '', '')
+    return (1, type(value).__name__, value)
+
+
+def _hashable(value):
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
@@ -0,0 +1,32 @@
+import logging
+
+import six
+
+from lbaasclient import asynclog
+from lbaasclient.tests import utils
+
+
+class AsyncHandlerTest(utils.TestCase):
+
+    def test_stop_flushes_and_unregisters(self):
+        stream = six.StringIO()
+        handler, listener = asynclog.async_handler(
+            logging.StreamHandler(stream))
+        self.assertIn(listener, asynclog._running)
+        logger = logging.Logger('lbaasclient.test_asynclog')
+        logger.addHandler(handler)
+        logger.warning('hello')
+
+        listener.stop()
+        self.assertEqual(stream.getvalue(), 'hello\n')
+        self.assertNotIn(listener, asynclog._running)
+        # Stopped listeners are left alone at exit.
+        listener.stop()
+
+    def test_stop_with_closed_stream(self):
+        stream = six.StringIO()
+        _handler, listener = asynclog.async_handler(
+            logging.StreamHandler(stream))
+        stream.close()
+        listener.stop()
+        self.assertNotIn(listener, asynclog._running)
@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+import time
+
+import mock
+
+from lbaasclient import completion
+from lbaasclient import parallel
+from lbaasclient.tests import utils
+from lbaasclient.v1_0 import loadbalancers
+
+
+class CompletionCacheTest(utils.TestCase):
+
+    def setUp(self):
+        super(CompletionCacheTest, self).setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def read(self, cache_type):
+        path = completion.text_path(self.cache_dir, 'loadbalancer',
+                                    cache_type)
+        with open(path) as f:
+            return f.read().splitlines()
+
+    def write(self, mode, values):
+        cache = completion.CompletionCache(self.cache_dir, 'loadbalancer')
+        cache.open('human_id', mode)
+        for value in values:
+            cache.write('human_id', value)
+        cache.commit()
+
+    def test_write_replaces_and_append_merges(self):
+        self.write('w', ['web-1', 'web-2', 'db'])
+        self.write('a', ['web-2', 'web-3'])
+        self.assertEqual(self.read('human_id'),
+                         ['web-1', 'web-2', 'db', 'web-3'])
+
+        self.write('w', ['cache'])
+        self.assertEqual(self.read('human_id'), ['cache'])
+        self.assertEqual(completion.complete(self.cache_dir, 'loadbalancer',
+                                             'human_id'), ['cache'])
+        # No temporary files are left behind.
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         ['completion.lock', 'completion.sqlite',
+                          'loadbalancer-human-id-cache'])
+
+    def test_prefix_query(self):
+        self.write('w', ['web-1', 'web-2', 'weB', 'db', 'web'])
+        self.assertEqual(completion.complete(self.cache_dir, 'loadbalancer',
+                                             'human_id', 'web'),
+                         ['web', 'web-1', 'web-2'])
+        self.assertEqual(completion.complete(self.cache_dir, 'loadbalancer',
+                                             'human_id', 'web-', limit=1),
+                         ['web-1'])
+        self.assertEqual(completion.complete(self.cache_dir, 'loadbalancer',
+                                             'uuid', 'web'), [])
+
+    def test_complete_without_index(self):
+        self.assertEqual(completion.complete(self.cache_dir, 'loadbalancer',
+                                             'human_id', 'web'), [])
+
+
+class ManagerCompletionCacheTest(utils.TestCase):
+
+    def setUp(self):
+        super(ManagerCompletionCacheTest, self).setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        patcher = mock.patch('lbaasclient.base.get_cache_dir',
+                             return_value=self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_manager(self, enabled):
+        api = mock.Mock()
+        api.completion_cache = enabled
+        api.client.tracer = None
+        api.client.get.return_value = (None, {'loadBalancers': [
+            {'id': 1, 'name': 'Web One'}, {'id': 2, 'name': 'db'}]})
+        return loadbalancers.LoadbalancerManager(api)
+
+    def test_listing_commits_once(self):
+        manager = self.make_manager(True)
+        with mock.patch.object(completion.CompletionCache,
+                               'commit') as commit:
+            manager.list()
+        self.assertEqual(commit.call_count, 1)
+
+        manager.list()
+        self.assertEqual(completion.complete(self.cache_dir, 'loadbalancer',
+                                             'human_id'), ['db', 'web-one'])
+
+    def test_disabled_in_library_mode(self):
+        manager = self.make_manager(False)
+        manager.list()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_failed_listing_keeps_previous_cache(self):
+        manager = self.make_manager(True)
+        manager.list()
+
+        lbs = manager.iterlist(completion_cache=True)
+        next(lbs)
+        lbs.close()
+        self.assertEqual(completion.complete(self.cache_dir, 'loadbalancer',
+                                             'human_id'), ['db', 'web-one'])
+
+    def test_concurrent_creates(self):
+        manager = self.make_manager(True)
+
+        def post(url, body):
+            time.sleep(0.001)
+            return None, {'loadBalancer': {
+                'id': int(body['loadBalancer']['name'][3:]),
+                'name': body['loadBalancer']['name']}}
+        manager.api.client.post.side_effect = post
+
+        outcomes = parallel.run(
+            lambda i: manager.create('lb-%d' % i, 'HTTP', 'PUBLIC'),
+            range(200), concurrency=16)
+
+        self.assertTrue(all(outcome.ok for outcome in outcomes))
+        self.assertEqual(len(completion.complete(
+            self.cache_dir, 'loadbalancer', 'human_id')), 200)
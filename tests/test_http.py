@@ -1,5 +1,8 @@
+import threading
+
 import mock
 import requests
+from six.moves import BaseHTTPServer
 
 from lbaasclient import client
 from lbaasclient import exceptions
@@ -59,6 +62,8 @@ class ClientTest(utils.TestCase):
                 **self.TEST_REQUEST_BASE)
             # Automatic JSON parsing
             self.assertEqual(body, {"hi": "there"})
+            # Not timed unless timings are enabled.
+            self.assertEqual(cl.get_timings(), [])
 
         test_get_call()
 
@@ -120,3 +125,71 @@ class ClientTest(utils.TestCase):
         cl2 = client.HTTPClient("username", "password", "project_id",
                                 "auth_test", http_log_debug=True)
         self.assertEqual(len(cl2._logger.handlers), 1)
+
+    def test_debug_log_sampling_and_truncation(self):
+        cl = client.HTTPClient("username", "password", "project_id",
+                               "auth_test", http_log_debug=True,
+                               http_log_sample_rate=0.5, http_log_max_body=4)
+        cl.management_url = "http://example.com"
+        cl.auth_token = "token"
+        response = utils.TestResponse({"status_code": 200,
+                                       "text": '{"hi": "there"}'})
+        response._content = b'{"hi": "there"}'
+        response.encoding = 'utf-8'
+
+        with mock.patch.object(cl._logger, "isEnabledFor",
+                               return_value=True):
+            with mock.patch.object(cl._logger, "debug") as debug:
+                with mock.patch.object(requests.Session, "request",
+                                       return_value=response):
+                    with mock.patch("random.random", return_value=0.9):
+                        cl.get("/hi")
+                    self.assertFalse(debug.called)
+
+                    with mock.patch("random.random", return_value=0.1):
+                        cl.get("/hi")
+
+        self.assertEqual(debug.call_count, 2)
+        resp_message = str(debug.call_args_list[1][0][1])
+        self.assertIn('RESP BODY: {"hi... [11 more bytes]', resp_message)
+
+    def test_byte_length(self):
+        self.assertEqual(client._byte_length(None), 0)
+        self.assertEqual(client._byte_length(b'caf\xc3\xa9'), 5)
+        self.assertEqual(client._byte_length(u'caf\xe9'), 5)
+
+    def test_timings_record_phases(self):
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '15')
+                self.end_headers()
+                self.wfile.write(b'{"hi": "there"}')
+
+            def log_message(self, *args):
+                pass
+
+        server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Handler)
+        self.addCleanup(server.server_close)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+
+        cl = client.HTTPClient("username", "password", "project_id",
+                               "auth_test", timings=True)
+        cl.management_url = "http://localhost:%d" % server.server_port
+        cl.auth_token = "token"
+        resp, body = cl.get("/hi")
+        thread.join()
+
+        self.assertEqual(body, {"hi": "there"})
+        self.assertEqual(len(cl.get_timings()), 1)
+        timing = cl.get_timings(detailed=True)[0]
+        self.assertEqual(timing['url'], "GET %s/hi" % cl.management_url)
+        self.assertEqual(timing['bytes_received'], 15)
+        self.assertEqual(timing['bytes_sent'], 0)
+        self.assertTrue(timing['connect'] > 0)
+        self.assertTrue(timing['ttfb'] > 0)
+        self.assertEqual(timing['tls'], 0.0)
+
+        cl.reset_timings()
+        self.assertEqual(cl.get_timings(detailed=True), [])
@@ -0,0 +1,94 @@
+import mock
+
+from lbaasclient import exceptions
+from lbaasclient import inventory
+from lbaasclient.tests import utils
+from lbaasclient.v1_0 import loadbalancers
+
+
+class FakeLB(object):
+
+    def __init__(self, **info):
+        self._info = info
+        self.__dict__.update(info)
+
+
+class InventoryTest(utils.TestCase):
+
+    def setUp(self):
+        super(InventoryTest, self).setUp()
+        self.store = inventory.InventoryStore(':memory:')
+        self.calls = []
+        self.listings = []
+
+    def list_fn(self, changes_since):
+        self.calls.append(changes_since)
+        return self.listings.pop(0)
+
+    def test_seed_then_deltas(self):
+        self.listings = [
+            [FakeLB(id=1, name='a', status='ACTIVE'),
+             FakeLB(id=2, name='b', status='ACTIVE'),
+             FakeLB(id=10, name='c', status='BUILD')],
+            [FakeLB(id=2, status='DELETED'),
+             FakeLB(id=10, name='c', status='ACTIVE'),
+             FakeLB(id=11, name='d', status='BUILD')],
+        ]
+
+        result = inventory.sync(self.store, self.list_fn,
+                                clock=lambda: 1000.0)
+        self.assertTrue(result.full)
+        self.assertEqual(self.calls, [None])
+        self.assertEqual(self.store.synced_at, 1000.0)
+
+        result = inventory.sync(self.store, self.list_fn,
+                                clock=lambda: 2000.0)
+        self.assertFalse(result.full)
+        self.assertEqual(self.calls[1], 1000.0 - inventory.SYNC_OVERLAP)
+        self.assertEqual(result.deleted, ['2'])
+        self.assertEqual(self.store.synced_at, 2000.0)
+        self.assertEqual([(item['id'], item['status'])
+                          for item in self.store.items()],
+                         [(1, 'ACTIVE'), (10, 'ACTIVE'), (11, 'BUILD')])
+
+    def test_offline_list(self):
+        manager = loadbalancers.LoadbalancerManager(None)
+        manager.inventory = self.store
+        self.assertIsNone(manager.list(offline=True).synced_at)
+
+        self.store.replace_all([{'id': 1, 'name': 'a', 'status': 'ACTIVE'},
+                                {'id': 2, 'name': 'b', 'status': 'BUILD'},
+                                {'id': 3, 'name': 'c', 'status': 'ACTIVE'}],
+                               1000.0)
+
+        listing = manager.list(offline=True,
+                               search_opts={'status': 'ACTIVE'})
+        self.assertEqual([lb.name for lb in listing], ['a', 'c'])
+        self.assertEqual(listing.synced_at, 1000.0)
+        self.assertTrue(listing.age > 0)
+        self.assertEqual([lb.id for lb in manager.list(offline=True,
+                                                       marker=1, limit=1)],
+                         [2])
+
+    def test_lookup_nodes(self):
+        api = mock.Mock()
+        api.client.tracer = None
+
+        def get(url):
+            if url == '/loadbalancers/2':
+                raise exceptions.ClientException(500)
+            return None, {'loadBalancer': {
+                'id': 1, 'name': 'a',
+                'nodes': [{'address': '10.0.0.5', 'port': 80}]}}
+        api.client.get.side_effect = get
+        manager = loadbalancers.LoadbalancerManager(api)
+        manager.inventory = self.store
+        self.store.replace_all([{'id': 1, 'name': 'a'},
+                                {'id': 2, 'name': 'b'}], 1000.0)
+
+        matches = manager.lookup('10.0.0.5', sync=False, fetch_nodes=True)
+        self.assertEqual([(m.id, m.kind) for m in matches], [('1', 'node')])
+        self.assertEqual(list(manager.lookup_errors), [2])
+        # Stored with its nodes, but node addresses only match when asked.
+        self.assertEqual(manager.lookup('10.0.0.5', sync=False), [])
+        self.assertEqual(manager.lookup_errors, {})
@@ -0,0 +1,219 @@
+import os
+import shutil
+import tempfile
+
+import mock
+
+from lbaasclient import exceptions
+from lbaasclient import journal
+from lbaasclient.tests import utils
+from lbaasclient.v1_0 import loadbalancers
+from lbaasclient.v1_0 import nodes
+
+
+class JournalTest(utils.TestCase):
+
+    def setUp(self):
+        super(JournalTest, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'journal')
+
+    def test_resume(self):
+        with journal.Journal(self.path, 'delete') as first:
+            self.assertEqual(first.plan([(1, {}), (2, {}), (3, {})]),
+                             [1, 2, 3])
+            first.record(1, journal.DONE)
+            first.record_many([2, 3], journal.SUBMITTED)
+        # A line cut short by a crash.
+        with open(self.path, 'a') as f:
+            f.write('{"key": "3", "sta')
+
+        with journal.Journal(self.path, 'delete') as second:
+            self.assertEqual(second.plan([(1, {}), (2, {}), (3, {}),
+                                          (4, {})]), [2, 3, 4])
+            self.assertEqual([(key, entry['state'])
+                              for key, entry in second.entries()],
+                             [('1', 'done'), ('2', 'submitted'),
+                              ('3', 'submitted'), ('4', 'planned')])
+
+    def test_record_after_cut_line(self):
+        with journal.Journal(self.path, 'create') as first:
+            first.plan([('a', {}), ('b', {})])
+            first.record('b', journal.SUBMITTED)
+        with open(self.path) as f:
+            text = f.read()
+        # Cut the last record in the middle.
+        with open(self.path, 'w') as f:
+            f.write(text[:-10])
+
+        with journal.Journal(self.path, 'create') as second:
+            self.assertEqual(second.state('b'), journal.PLANNED)
+            second.record('a', journal.DONE)
+        with journal.Journal(self.path, 'create') as third:
+            self.assertEqual(third.state('a'), journal.DONE)
+            self.assertEqual(third.state('b'), journal.PLANNED)
+
+    def test_prune(self):
+        with journal.Journal(self.path, 'create') as first:
+            first.plan([('a', {}), ('b', {}), ('c', {'x': 1})])
+            first.record('a', journal.DONE, id=1)
+            first.record('b', journal.FAILED)
+            cutoff = first.get('b')['time'] + 1
+            first.record('c', journal.SUBMITTED)
+            self.assertEqual(first.prune(cutoff), 2)
+            self.assertEqual(first.prune(cutoff), 0)
+            first.record('c', journal.DONE, id=3)
+
+        with open(self.path) as f:
+            self.assertEqual(len(f.readlines()), 3)
+        with journal.Journal(self.path, 'create') as second:
+            self.assertEqual([key for key, _entry in second.entries()],
+                             ['c'])
+            self.assertEqual(second.get('c')['x'], 1)
+            self.assertEqual(second.state('c'), journal.DONE)
+
+    def test_other_operation(self):
+        journal.Journal(self.path, 'delete').close()
+        self.assertRaises(ValueError, journal.Journal, self.path, 'create')
+
+
+class ResumeTest(utils.TestCase):
+
+    def setUp(self):
+        super(ResumeTest, self).setUp()
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.path)
+        self.addCleanup(lambda: os.path.exists(self.path) and
+                        os.remove(self.path))
+
+    def make_manager(self):
+        api = mock.Mock()
+        api.client.tracer = None
+        return loadbalancers.LoadbalancerManager(api)
+
+    def interrupted(self, operation, states):
+        with journal.Journal(self.path, operation) as previous:
+            previous.plan([(key, data) for key, _state, data in states])
+            for key, state, data in states:
+                if state != journal.PLANNED:
+                    previous.record(key, state, **data)
+        return journal.Journal(self.path, operation)
+
+    def test_delete_many(self):
+        manager = self.make_manager()
+        ops = self.interrupted('delete', [
+            (1, journal.DONE, {}),
+            (2, journal.SUBMITTED, {}),
+            (3, journal.SUBMITTED, {}),
+            (4, journal.PLANNED, {})])
+
+        def get(url):
+            if url == '/loadbalancers/2':
+                raise exceptions.NotFound(404)
+            return None, {'loadBalancer': {'id': 3, 'status': 'ACTIVE'}}
+        manager.api.client.get.side_effect = get
+        manager.api.client.delete.return_value = (None, None)
+
+        results = manager.delete_many([1, 2, 3, 4], journal=ops)
+
+        self.assertTrue(all(outcome.ok for outcome in results.values()))
+        # Only the loadbalancers left in flight are checked.
+        self.assertEqual(sorted(c[0][0] for c in
+                                manager.api.client.get.call_args_list),
+                         ['/loadbalancers/2', '/loadbalancers/3'])
+        manager.api.client.delete.assert_called_once_with(
+            '/loadbalancers?id=3&id=4')
+        self.assertEqual([entry['state'] for _key, entry in ops.entries()],
+                         [journal.DONE] * 4)
+        ops.close()
+
+    def test_create_many(self):
+        manager = self.make_manager()
+        manager.idempotency_records = journal.Journal(
+            self.path + '.keys', 'idempotency')
+        self.addCleanup(manager.idempotency_records.close)
+        self.addCleanup(os.remove, self.path + '.keys')
+        templates = [{'name': name, 'protocol': 'HTTP',
+                      'vip_type': 'PUBLIC'} for name in ('a', 'b', 'c')]
+        ops = self.interrupted('create', [
+            (0, journal.DONE, {'template': dict(templates[0],
+                                                idempotency_key='k0'),
+                               'id': 10}),
+            (1, journal.SUBMITTED, {'template': dict(templates[1],
+                                                     idempotency_key='k1')}),
+            (2, journal.PLANNED, {'template': dict(templates[2],
+                                                   idempotency_key='k2')})])
+
+        def get(url):
+            if url.startswith('/loadbalancers?'):
+                # Another 'b', created by someone else, is listed first.
+                return None, {'loadBalancers': [{'id': 9, 'name': 'b'},
+                                                {'id': 11, 'name': 'b'}]}
+            lb_id = int(url.rsplit('/', 1)[1])
+            return None, {'loadBalancer': {
+                'id': lb_id, 'name': 'b',
+                'metadata': [{'key': loadbalancers.IDEMPOTENCY_METADATA_KEY,
+                              'value': 'k1' if lb_id == 11 else 'other'}]}}
+        manager.api.client.get.side_effect = get
+        manager.api.client.post.return_value = (
+            None, {'loadBalancer': {'id': 12, 'name': 'c'}})
+
+        outcomes = manager.create_many(templates, wait=False,
+                                       precheck=False, journal=ops)
+
+        self.assertEqual([outcome.result.id for outcome in outcomes],
+                         [10, 11, 12])
+        post, = manager.api.client.post.call_args_list
+        self.assertEqual(post[1]['body']['loadBalancer']['metadata'],
+                         [{'key': loadbalancers.IDEMPOTENCY_METADATA_KEY,
+                           'value': 'k2'}])
+        self.assertEqual(ops.get(1)['id'], 11)
+        self.assertEqual(ops.get(2)['id'], 12)
+        ops.close()
+
+    def test_create_many_journals_keys(self):
+        manager = self.make_manager()
+        ops = journal.Journal(self.path, 'create')
+        self.addCleanup(ops.close)
+        manager.create = mock.Mock(side_effect=RuntimeError('boom'))
+
+        templates = [{'name': 'a'}]
+        manager.create_many(templates, wait=False, precheck=False,
+                            journal=ops)
+        self.assertEqual(templates, [{'name': 'a'}])
+        key = ops.get(0)['template']['idempotency_key']
+        self.assertTrue(key)
+        manager.create.assert_called_once_with(name='a', idempotency_key=key)
+
+        # Resumed with the same templates, the journaled key is reused.
+        manager.create_many([{'name': 'a'}], wait=False, precheck=False,
+                            journal=ops)
+        manager.create.assert_called_with(name='a', idempotency_key=key)
+
+    def test_node_add_many(self):
+        api = mock.Mock()
+        api.client.tracer = None
+        api.client.get.return_value = (None, {'nodes': [
+            {'id': 1, 'address': '10.0.0.1', 'port': 80}]})
+        api.client.post.side_effect = lambda url, body: (None, {
+            'nodes': [dict(node, id=9) for node in body['nodes']]})
+        api.limits.get.return_value.absolute = []
+        manager = nodes.NodeManager(api)
+        ops = self.interrupted('node-add', [
+            (7, journal.SUBMITTED,
+             {'nodes': ['10.0.0.1:80', '10.0.0.2:80']}),
+            (8, journal.DONE, {'nodes': ['10.0.0.3:80']})])
+
+        outcomes = manager.add_many({7: ['10.0.0.1:80', '10.0.0.2:80'],
+                                     8: ['10.0.0.3:80']}, chunk_size=25,
+                                    journal=ops)
+
+        self.assertTrue(outcomes[7].ok and outcomes[8].ok)
+        api.client.post.assert_called_once_with(
+            '/loadbalancers/7/nodes',
+            body={'nodes': [{'address': '10.0.0.2', 'port': 80,
+                             'condition': 'ENABLED'}]})
+        self.assertEqual(ops.state(7), journal.DONE)
+        ops.close()
@@ -0,0 +1,377 @@
+import os
+import shutil
+import tempfile
+import time
+
+import mock
+import requests
+
+from lbaasclient import exceptions
+from lbaasclient import journal
+from lbaasclient import parallel
+from lbaasclient.tests import utils
+from lbaasclient.v1_0 import limits
+from lbaasclient.v1_0 import loadbalancers
+
+
+def lb_info(id=1, **kwargs):
+    info = {'id': id, 'name': 'web-%d' % id, 'status': 'ACTIVE',
+            'virtualIps': [{'address': '10.0.0.%d' % id}]}
+    info.update(kwargs)
+    return info
+
+
+class CompactLoadbalancerTest(utils.TestCase):
+
+    def test_attributes_come_from_info(self):
+        info = lb_info()
+        lb = loadbalancers.CompactLoadbalancer(None, info, loaded=True)
+
+        self.assertFalse(hasattr(lb, '__dict__'))
+        self.assertEqual(lb.name, 'web-1')
+        self.assertEqual(lb.human_id, 'web-1')
+        self.assertEqual(repr(lb), '<Loadbalancer: web-1>')
+        self.assertRaises(AttributeError, getattr, lb, 'missing')
+
+        lb.status = 'BUILD'
+        self.assertEqual(info['status'], 'BUILD')
+        self.assertEqual(lb, loadbalancers.CompactLoadbalancer(None,
+                                                               lb_info()))
+
+    def test_lazy_load(self):
+        manager = mock.Mock()
+        manager.get.return_value = loadbalancers.CompactLoadbalancer(
+            None, lb_info(nodes=[]), loaded=True)
+        lb = loadbalancers.CompactLoadbalancer(manager, {'id': 1})
+
+        self.assertEqual(lb.nodes, [])
+        manager.get.assert_called_once_with(1)
+
+    def test_compact_manager(self):
+        manager = loadbalancers.LoadbalancerManager(None, compact=True)
+        self.assertEqual(manager.resource_class,
+                         loadbalancers.CompactLoadbalancer)
+        manager = loadbalancers.LoadbalancerManager(None)
+        self.assertEqual(manager.resource_class, loadbalancers.Loadbalancer)
+
+
+class LoadbalancerManagerTest(utils.TestCase):
+
+    def make_manager(self, pages):
+        api = mock.Mock()
+        api.client.tracer = None
+        api.client.get.side_effect = [
+            (None, {'loadBalancers': page}) for page in pages]
+        return loadbalancers.LoadbalancerManager(api)
+
+    def test_iterlist_is_lazy_and_paged(self):
+        manager = self.make_manager([[lb_info(1), lb_info(2)],
+                                     [lb_info(3)]])
+
+        lbs = manager.iterlist(page_size=2)
+        self.assertFalse(manager.api.client.get.called)
+        first = next(lbs)
+        self.assertEqual(first.id, 1)
+        self.assertEqual(manager.api.client.get.call_count, 1)
+
+        self.assertEqual([lb.id for lb in lbs], [2, 3])
+        urls = [c[0][0] for c in manager.api.client.get.call_args_list]
+        self.assertEqual(urls[0], '/loadbalancers?limit=2')
+        self.assertEqual(sorted(urls[1].split('?')[1].split('&')),
+                         ['limit=2', 'marker=2'])
+
+    def test_iterlist_completion_cache_is_optional(self):
+        manager = self.make_manager([[lb_info(1)]])
+        with mock.patch.object(manager, 'completion_cache') as cache:
+            self.assertEqual(len(list(manager.iterlist())), 1)
+        self.assertFalse(cache.called)
+
+    def test_delete_many_batches_and_falls_back(self):
+        manager = self.make_manager([])
+
+        def delete(url):
+            if url.startswith('/loadbalancers?') and 'id=13' in url:
+                raise exceptions.BadRequest(400)
+            if url == '/loadbalancers/13':
+                raise exceptions.NotFound(404)
+            return None, None
+        manager.api.client.delete.side_effect = delete
+
+        results = manager.delete_many(list(range(1, 15)) + [1],
+                                      batch_size=10)
+        self.assertEqual(sorted(results), list(range(1, 15)))
+        self.assertEqual([lb_id for lb_id, outcome in results.items()
+                          if not outcome.ok], [13])
+        self.assertTrue(isinstance(results[13].error, exceptions.NotFound))
+
+        urls = [c[0][0] for c in manager.api.client.delete.call_args_list]
+        # One batch of 10, one failed batch of 4 retried one by one.
+        self.assertEqual(len(urls), 6)
+        self.assertIn('/loadbalancers?' + '&'.join(
+            'id=%d' % i for i in range(1, 11)), urls)
+        self.assertEqual(sorted(url for url in urls if '?' not in url),
+                         ['/loadbalancers/%d' % i for i in range(11, 15)])
+
+    def test_create_loaded_from_response(self):
+        manager = self.make_manager([])
+        manager.api.client.post.return_value = (
+            None, {'loadBalancer': lb_info(5, status='BUILD')})
+
+        lb = manager.create('web-5', 'HTTP', 'PUBLIC', loaded=True)
+        self.assertEqual(lb.status, 'BUILD')
+        self.assertRaises(AttributeError, getattr, lb, 'missing')
+        self.assertFalse(manager.api.client.get.called)
+        body = manager.api.client.post.call_args[1]['body']
+        self.assertNotIn('loaded', body['loadBalancer'])
+
+    def make_limits(self, absolute, rate=()):
+        return limits.Limits(None, {'absolute': absolute, 'rate': [
+            {'uri': '/loadbalancers', 'regex': '.*', 'limit': [
+                {'verb': verb, 'value': value, 'remaining': value,
+                 'unit': unit, 'next-available': None}]}
+            for verb, value, unit in rate]}, loaded=True)
+
+    def test_create_many(self):
+        manager = self.make_manager([[lb_info(1)],
+                                     [lb_info(100), lb_info(101)]])
+        manager.api.limits.get.return_value = self.make_limits(
+            {'LOADBALANCER_LIMIT': 3}, rate=[('POST', 600, 'MINUTE')])
+        created = iter([lb_info(100, status='BUILD'),
+                        lb_info(101, status='BUILD')])
+        manager.api.client.post.side_effect = lambda url, body: (
+            None, {'loadBalancer': next(created)})
+
+        with mock.patch.object(parallel.Pacer, 'wait') as wait:
+            outcomes = manager.create_many(
+                [{'name': 'a', 'protocol': 'HTTP', 'vip_type': 'PUBLIC'},
+                 {'name': 'b', 'protocol': 'HTTP', 'vip_type': 'PUBLIC'}],
+                concurrency=1)
+        self.assertEqual(wait.call_count, 2)
+
+        self.assertEqual([o.result.id for o in outcomes], [100, 101])
+        self.assertTrue(all(o.ok for o in outcomes))
+        self.assertEqual(outcomes[0].wait_result.status, 'ACTIVE')
+        # The limits precheck and the waiter each list once.
+        self.assertEqual(manager.api.client.get.call_count, 2)
+
+    def test_create_many_checks_limits_first(self):
+        manager = self.make_manager([[lb_info(1), lb_info(2)]])
+        manager.api.limits.get.return_value = self.make_limits(
+            {'LOADBALANCER_LIMIT': 3})
+        self.assertRaises(exceptions.OverLimit, manager.create_many,
+                          [{'name': 'a', 'protocol': 'HTTP',
+                            'vip_type': 'PUBLIC'}] * 2)
+        self.assertFalse(manager.api.client.post.called)
+
+        manager.api.limits.get.return_value = self.make_limits(
+            {'NODE_LIMIT': 1})
+        self.assertRaises(exceptions.OverLimit, manager.create_many,
+                          [{'name': 'a', 'protocol': 'HTTP',
+                            'vip_type': 'PUBLIC',
+                            'nodes': ['10.0.0.1:80', '10.0.0.2:80']}])
+
+    def test_create_loaded(self):
+        manager = self.make_manager([])
+        manager.api.client.post.return_value = (
+            None, {'loadBalancer': lb_info(5)})
+        with mock.patch.object(manager, 'run_hooks') as run_hooks:
+            lb = manager.create('web', 'HTTP', 'PUBLIC', loaded=True)
+        self.assertTrue(lb.is_loaded())
+        # loaded is not a setting of the body.
+        self.assertEqual(run_hooks.call_args[1], {})
+
+    def test_post_interval(self):
+        self.assertEqual(loadbalancers._post_interval(self.make_limits(
+            {}, rate=[('POST', 30, 'MINUTE'), ('GET', 600, 'MINUTE')])),
+            2.0)
+        self.assertEqual(loadbalancers._post_interval(
+            self.make_limits({})), 0)
+
+
+class SaveTest(utils.TestCase):
+
+    def make_manager(self, compact=False):
+        api = mock.Mock()
+        api.client.tracer = None
+        api.client.put.return_value = (None, None)
+        return loadbalancers.LoadbalancerManager(api, compact=compact)
+
+    def check_save(self, compact):
+        manager = self.make_manager(compact)
+        lb = manager.resource_class(manager, lb_info(1, port=80),
+                                    loaded=True)
+        self.assertFalse(lb.save())
+
+        lb.port = 80
+        lb.name = 'renamed'
+        lb.status = 'BUILD'
+        self.assertEqual(lb.dirty_fields(), {'name': 'renamed'})
+        self.assertTrue(lb.save())
+        manager.api.client.put.assert_called_once_with(
+            '/loadbalancers/1', body={'loadbalancer': {'name': 'renamed'}})
+
+        self.assertEqual(lb.dirty_fields(), {})
+        self.assertFalse(lb.save())
+        self.assertEqual(manager.api.client.put.call_count, 1)
+
+    def test_save_sends_changed_fields(self):
+        self.check_save(compact=False)
+
+    def test_compact_save_sends_changed_fields(self):
+        self.check_save(compact=True)
+
+    def test_update_sends_given_fields(self):
+        manager = self.make_manager()
+        lb = loadbalancers.Loadbalancer(manager, lb_info(1, port=80),
+                                        loaded=True)
+        # Even settings equal to the loaded values: they may be stale.
+        manager.update(lb, name='web-1', port=80)
+        manager.api.client.put.assert_called_once_with(
+            '/loadbalancers/1',
+            body={'loadbalancer': {'name': 'web-1', 'port': 80}})
+
+
+class IdentityMapTest(utils.TestCase):
+
+    def make_manager(self, responses, compact=False):
+        api = mock.Mock()
+        api.client.tracer = None
+        api.client.get.side_effect = responses
+        return loadbalancers.LoadbalancerManager(api, compact=compact,
+                                                 identity_map=True)
+
+    def test_refresh_in_place(self):
+        manager = self.make_manager([
+            (None, {'loadBalancers': [lb_info(1), lb_info(2)]}),
+            (None, {'loadBalancer': lb_info(1, status='BUILD')}),
+        ])
+
+        lb1, lb2 = manager.list()
+        self.assertIsNone(lb1.last_changes)
+        again = manager.get(1)
+
+        self.assertTrue(again is lb1)
+        self.assertEqual(lb1.status, 'BUILD')
+        self.assertEqual(lb1.last_changes, {'status': ('ACTIVE', 'BUILD')})
+        self.assertEqual(len(manager.identity_map), 2)
+
+        del lb1, again, lb2
+        self.assertEqual(len(manager.identity_map), 0)
+
+    def test_compact_refresh_in_place(self):
+        manager = self.make_manager([
+            (None, {'loadBalancers': [lb_info(1)]}),
+            (None, {'loadBalancers': [lb_info(1, name='renamed')]}),
+        ], compact=True)
+
+        lb = manager.list()[0]
+        self.assertTrue(manager.list()[0] is lb)
+        self.assertEqual(lb.name, 'renamed')
+        self.assertEqual(lb.last_changes, {'name': ('web-1', 'renamed')})
+
+    def test_resources_are_hashable(self):
+        manager = mock.Mock()
+        old = set(loadbalancers.Loadbalancer(manager, lb_info(id))
+                  for id in (1, 2, 3))
+        new = set(loadbalancers.Loadbalancer(manager, lb_info(id))
+                  for id in (2, 3, 4))
+
+        self.assertEqual(sorted(lb.id for lb in new - old), [4])
+        self.assertEqual(sorted(lb.id for lb in old - new), [1])
+        self.assertTrue(loadbalancers.Loadbalancer(manager, lb_info(1)) !=
+                        loadbalancers.Loadbalancer(manager, lb_info(2)))
+
+
+class IdempotencyTest(utils.TestCase):
+
+    def make_manager(self, header=None):
+        api = mock.Mock()
+        api.client.tracer = None
+        self.sleep = mock.Mock()
+        manager = loadbalancers.LoadbalancerManager(
+            api, idempotency_header=header, sleep=self.sleep)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        manager.idempotency_records = journal.Journal(
+            os.path.join(directory, 'keys'), 'idempotency')
+        return manager
+
+    def create(self, manager):
+        return manager.create('web', 'HTTP', 'PUBLIC', idempotency_key='k1')
+
+    def test_header_retries_with_same_key(self):
+        manager = self.make_manager(header='Idempotency-Key')
+        manager.api.client.post.side_effect = [
+            requests.exceptions.Timeout(),
+            (None, {'loadBalancer': lb_info(5)})]
+
+        self.assertEqual(self.create(manager).id, 5)
+        for call in manager.api.client.post.call_args_list:
+            self.assertEqual(call[1]['headers'], {'Idempotency-Key': 'k1'})
+            self.assertNotIn('metadata', call[1]['body']['loadBalancer'])
+        self.assertFalse(manager.api.client.get.called)
+        self.assertEqual(manager.idempotency_records.get('k1')['id'], 5)
+        self.sleep.assert_called_once_with(loadbalancers.CREATE_RETRY_DELAY)
+
+    def test_marker_lookup_after_timeout(self):
+        manager = self.make_manager()
+        manager.api.client.post.side_effect = requests.exceptions.Timeout()
+        marker = {'key': loadbalancers.IDEMPOTENCY_METADATA_KEY,
+                  'value': 'k1'}
+        manager.api.client.get.side_effect = [
+            (None, {'loadBalancers': [lb_info(5, name='web'),
+                                      lb_info(6, name='web')]}),
+            (None, {'loadBalancer': lb_info(5, name='web', metadata=[])}),
+            (None, {'loadBalancer': lb_info(6, name='web',
+                                            metadata=[marker])})]
+
+        self.assertEqual(self.create(manager).id, 6)
+        post, = manager.api.client.post.call_args_list
+        self.assertEqual(post[1]['body']['loadBalancer']['metadata'],
+                         [marker])
+        self.assertEqual(manager.api.client.get.call_args_list[0][0][0],
+                         '/loadbalancers?name=web&limit=100')
+
+    def test_known_key_is_not_created_again(self):
+        manager = self.make_manager()
+        manager.idempotency_records.record('k1', journal.DONE, id=5)
+        manager.api.client.get.return_value = (
+            None, {'loadBalancer': lb_info(5)})
+
+        self.assertEqual(self.create(manager).id, 5)
+        self.assertFalse(manager.api.client.post.called)
+
+    def test_old_records_are_pruned(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'loadbalancer-idempotency.journal')
+        with journal.Journal(path, 'idempotency') as records:
+            records.record('old', journal.DONE, id=1)
+            records.record('in-flight', journal.SUBMITTED)
+        now = time.time() + loadbalancers.IDEMPOTENCY_RECORD_TTL
+        manager = loadbalancers.LoadbalancerManager(mock.Mock())
+
+        with mock.patch('lbaasclient.base.get_cache_dir',
+                        return_value=directory):
+            with mock.patch.object(loadbalancers.time, 'time',
+                                   return_value=now):
+                records = manager.idempotency_records
+        self.addCleanup(records.close)
+        self.assertEqual([key for key, _entry in records.entries()],
+                         ['in-flight'])
+
+    def test_other_errors_are_not_retried(self):
+        manager = self.make_manager()
+        manager.api.client.post.side_effect = exceptions.BadRequest(400)
+        self.assertRaises(exceptions.BadRequest, self.create, manager)
+        self.assertEqual(manager.api.client.post.call_count, 1)
+        self.assertEqual(manager.idempotency_records.state('k1'),
+                         journal.FAILED)
+
+        # Nothing was created: the key is not looked up before trying again.
+        manager.api.client.post.side_effect = None
+        manager.api.client.post.return_value = (
+            None, {'loadBalancer': lb_info(5)})
+        self.assertEqual(self.create(manager).id, 5)
+        self.assertFalse(manager.api.client.get.called)
+        self.assertFalse(self.sleep.called)
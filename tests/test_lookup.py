@@ -0,0 +1,50 @@
+from lbaasclient import lookup
+from lbaasclient.tests import utils
+
+
+def lb(id, name, vips=(), nodes=()):
+    return {'id': id, 'name': name,
+            'virtualIps': [{'address': address} for address in vips],
+            'nodes': [{'address': address} for address in nodes]}
+
+
+class LookupIndexTest(utils.TestCase):
+
+    def setUp(self):
+        super(LookupIndexTest, self).setUp()
+        self.index = lookup.LookupIndex([
+            lb(1, 'web-prod', vips=['10.4.2.17'], nodes=['192.168.0.5']),
+            lb(2, 'web-staging', vips=['10.4.2.200', '2001:db8::1']),
+            lb(3, 'db-prod', vips=['10.4.3.1'],
+               nodes=['10.4.2.17', 'backend.example.com']),
+        ])
+
+    def test_by_address(self):
+        self.assertEqual(
+            sorted((m.id, m.kind) for m in self.index.lookup('10.4.2.17')),
+            [('1', 'vip'), ('3', 'node')])
+        self.assertEqual([m.id for m in self.index.lookup('2001:db8::1')],
+                         ['2'])
+        self.assertEqual(self.index.lookup('10.9.9.9'), [])
+
+    def test_by_network(self):
+        matches = self.index.lookup('10.4.2.0/24')
+        self.assertEqual(sorted(m.id for m in matches), ['1', '2', '3'])
+        self.assertEqual([m.value for m in self.index.lookup('10.4.3.0/24')],
+                         ['10.4.3.1'])
+
+    def test_by_name(self):
+        self.assertEqual([m.id for m in self.index.lookup('prod')],
+                         ['1', '3'])
+        self.assertEqual([m.id for m in self.index.lookup('^web-(p|s)')],
+                         ['1', '2'])
+
+    def test_incremental_updates(self):
+        self.index.update(lb(1, 'api-prod', vips=['10.5.0.1']))
+        self.index.remove(3)
+
+        self.assertEqual(self.index.lookup('10.4.2.17'), [])
+        self.assertEqual([m.id for m in self.index.lookup('10.5.0.0/16')],
+                         ['1'])
+        self.assertEqual([m.id for m in self.index.lookup('prod')], ['1'])
+        self.assertEqual(len(self.index), 2)
@@ -0,0 +1,106 @@
+import os
+import tempfile
+
+import mock
+import requests
+
+from lbaasclient import client
+from lbaasclient import exceptions
+from lbaasclient import metrics
+from lbaasclient.tests import utils
+
+
+class RouteTemplateTest(utils.TestCase):
+
+    def test_ids_are_templated(self):
+        base = "https://lb.example.com/v1.0/123456"
+        self.assertEqual(
+            metrics.route_template(base + "/loadbalancers/42/nodes?id=1",
+                                   base),
+            "/loadbalancers/{id}/nodes")
+        self.assertEqual(
+            metrics.route_template(
+                "http://auth/v2.0/tenants/"
+                "0c9e5e3c-0f8b-4b5a-9c39-d1bb2a8c5a3d"),
+            "/v2.0/tenants/{id}")
+
+    def test_status_class(self):
+        self.assertEqual(metrics.status_class(204), "2xx")
+        self.assertEqual(metrics.status_class(None), "error")
+
+
+class HistogramTest(utils.TestCase):
+
+    def test_percentiles(self):
+        histogram = metrics.Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.05, 0.5, 2.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.min, 0.05)
+        self.assertEqual(histogram.max, 2.0)
+        self.assertTrue(0.05 <= histogram.percentile(50) <= 0.1)
+        self.assertEqual(histogram.percentile(100), 2.0)
+        self.assertEqual(list(histogram.cumulative()),
+                         [(0.1, 2), (1.0, 3), (float('inf'), 4)])
+
+
+class MetricsRegistryTest(utils.TestCase):
+
+    def test_routes_are_bounded(self):
+        registry = metrics.MetricsRegistry(max_routes=2)
+        for route in ("/a", "/b", "/c", "/d"):
+            registry.observe_request("GET", route, 200, 0.1)
+
+        self.assertEqual(len(registry.latency), 3)
+        self.assertEqual(
+            registry.latency[("GET", metrics.OVERFLOW_ROUTE)].count, 2)
+
+    def test_prometheus_exposition(self):
+        registry = metrics.MetricsRegistry(buckets=(0.5,))
+        registry.observe_request("GET", "/loadbalancers/{id}", 404, 0.2,
+                                 bytes_received=10)
+        registry.inc_retry("unauthorized")
+        registry.inc_auth("success")
+
+        text = registry.to_prometheus()
+        self.assertIn('lbaasclient_requests_total{method="GET",'
+                      'route="/loadbalancers/{id}",status_class="4xx"} 1',
+                      text)
+        self.assertIn('lbaasclient_request_duration_seconds_bucket{le="+Inf",'
+                      'method="GET",route="/loadbalancers/{id}"} 1', text)
+        self.assertIn('lbaasclient_bytes_total{direction="received",'
+                      'method="GET",route="/loadbalancers/{id}"} 10', text)
+        self.assertIn('lbaasclient_retries_total{reason="unauthorized"} 1',
+                      text)
+        self.assertIn('lbaasclient_auth_total{outcome="success"} 1', text)
+
+    def test_write_textfile(self):
+        registry = metrics.MetricsRegistry()
+        registry.observe_request("GET", "/loadbalancers", 200, 0.2)
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "lbaas.prom")
+
+        registry.write_textfile(path)
+
+        with open(path) as f:
+            self.assertEqual(f.read(), registry.to_prometheus())
+        self.assertEqual(os.listdir(directory), ["lbaas.prom"])
+
+    def test_client_records_requests(self):
+        registry = metrics.MetricsRegistry()
+        cl = client.HTTPClient("username", "password", "project_id",
+                               "auth_test", metrics=registry)
+        cl.management_url = "http://example.com/v1.0/123"
+        cl.auth_token = "token"
+        response = utils.TestResponse({"status_code": 404, "text": ""})
+        response._content = b""
+
+        with mock.patch.object(requests.Session, "request",
+                               mock.Mock(return_value=response)):
+            self.assertRaises(exceptions.NotFound, cl.get,
+                              "/loadbalancers/42")
+
+        self.assertEqual(registry.requests,
+                         {("GET", "/loadbalancers/{id}", "4xx"): 1})
+        self.assertEqual(cl.get_timings(), [])
@@ -0,0 +1,88 @@
+import threading
+
+import mock
+
+from lbaasclient import exceptions
+from lbaasclient import mutations
+from lbaasclient.tests import utils
+from lbaasclient import waiter
+
+
+class FakeManager(object):
+    """Loadbalancers become immutable after each change, until listed."""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.puts = []
+        self.listings = 0
+        self.lock = threading.Lock()
+
+    def iterlist(self):
+        with self.lock:
+            self.listings += 1
+            listing = [mock.Mock(id=lb_id, status=status)
+                       for lb_id, status in self.statuses.items()]
+            for lb_id, status in self.statuses.items():
+                if status == 'PENDING_UPDATE':
+                    self.statuses[lb_id] = 'ACTIVE'
+        return listing
+
+    def change(self, lb_id):
+        with self.lock:
+            if self.statuses[lb_id] != 'ACTIVE':
+                raise exceptions.UnprocessableEntity(422)
+            self.statuses[lb_id] = 'PENDING_UPDATE'
+
+    def update(self, lb_id, **fields):
+        self.change(lb_id)
+        self.puts.append((lb_id, fields))
+
+
+class MutationQueueTest(utils.TestCase):
+
+    def make_queue(self, statuses):
+        self.manager = FakeManager(statuses)
+        return mutations.MutationQueue(self.manager, sleep=lambda s: None)
+
+    def test_serializes_and_coalesces(self):
+        queue = self.make_queue({1: 'ACTIVE', 2: 'ACTIVE'})
+        queue.update(1, name='a')
+        queue.update(1, port=81)
+        queue.call(1, self.manager.change, 1)
+        queue.update(1, name='b')
+        queue.update(2, name='c')
+        self.assertEqual(len(queue), 4)
+
+        results = queue.run()
+        self.assertEqual(len(queue), 0)
+        self.assertEqual([len(results[1]), len(results[2])], [3, 1])
+        self.assertTrue(all(outcome.ok for outcomes in results.values()
+                            for outcome in outcomes))
+        self.assertEqual([put for put in self.manager.puts if put[0] == 1],
+                         [(1, {'name': 'a', 'port': 81}), (1, {'name': 'b'})])
+
+    def test_retries_immutable(self):
+        queue = self.make_queue({1: 'PENDING_UPDATE'})
+        queue.update(1, name='a')
+        outcome, = queue.run()[1]
+        self.assertTrue(outcome.ok)
+        self.assertEqual(self.manager.puts, [(1, {'name': 'a'})])
+
+    def test_failure_skips_later_operations(self):
+        queue = self.make_queue({1: 'ACTIVE'})
+        error = exceptions.BadRequest(400)
+        queue.call(1, mock.Mock(side_effect=error))
+        queue.update(1, name='a')
+        outcomes = queue.run()[1]
+        self.assertEqual([outcome.error for outcome in outcomes],
+                         [error, error])
+        self.assertEqual(self.manager.puts, [])
+
+    def test_wait_error(self):
+        queue = self.make_queue({1: 'ACTIVE'})
+        queue.call(1, self.manager.statuses.__setitem__, 1, 'ERROR')
+        queue.update(1, name='a')
+        outcomes = queue.run()[1]
+        self.assertTrue(outcomes[0].ok)
+        self.assertTrue(isinstance(outcomes[1].error, waiter.WaitError))
+        self.assertEqual(outcomes[1].error.result.status, 'ERROR')
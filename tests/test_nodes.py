@@ -0,0 +1,112 @@
+import mock
+
+from lbaasclient import exceptions
+from lbaasclient import parallel
+from lbaasclient.tests import utils
+from lbaasclient import utils as lbaas_utils
+from lbaasclient.v1_0 import nodes
+
+
+class ParseNodeSpecTest(utils.TestCase):
+
+    def test_specs(self):
+        self.assertEqual(lbaas_utils.parse_node_spec('10.0.0.1:80'),
+                         {'address': '10.0.0.1', 'port': 80,
+                          'condition': 'ENABLED'})
+        self.assertEqual(lbaas_utils.parse_node_spec('[2001:db8::1]:443:5',
+                                                     condition='DRAINING'),
+                         {'address': '2001:db8::1', 'port': 443,
+                          'weight': 5, 'condition': 'DRAINING'})
+        self.assertEqual(lbaas_utils.parse_node_spec({'address': 'a',
+                                                      'port': 1}),
+                         {'address': 'a', 'port': 1,
+                          'condition': 'ENABLED'})
+
+    def test_invalid_specs(self):
+        for spec in ('10.0.0.1', '2001:db8::1:80', '[2001:db8::1]',
+                     '[2001:db8::1:80', 'host:http', ':80'):
+            self.assertRaises(ValueError, lbaas_utils.parse_node_spec, spec)
+
+
+class NodeManagerTest(utils.TestCase):
+
+    def make_manager(self):
+        api = mock.Mock()
+        api.client.tracer = None
+        api.client.post.side_effect = lambda url, body: (None, {
+            'nodes': [dict(node, id=i) for i, node in
+                      enumerate(body['nodes'])]})
+        api.client.delete.return_value = (None, None)
+        api.client.get.return_value = (None, {'nodes': [
+            {'id': 100, 'address': '10.1.0.1', 'port': 80}]})
+        api.loadbalancers.get.return_value = mock.Mock(id=7,
+                                                       status='ACTIVE')
+        limit = mock.Mock(value=8)
+        limit.name = 'NODE_LIMIT'
+        api.limits.get.return_value.absolute = [limit]
+        return nodes.NodeManager(api)
+
+    def test_add_in_chunks(self):
+        manager = self.make_manager()
+        added = manager.add(7, ['10.0.0.%d:80' % i for i in range(7)],
+                            chunk_size=3)
+
+        self.assertEqual(len(added), 7)
+        self.assertEqual(added[0].loadbalancer_id, 7)
+        posts = manager.api.client.post.call_args_list
+        self.assertEqual([len(c[1]['body']['nodes']) for c in posts],
+                         [3, 3, 1])
+        self.assertEqual(posts[0][0][0], '/loadbalancers/7/nodes')
+        # The loadbalancer is checked before each further chunk.
+        self.assertEqual(manager.api.loadbalancers.get.call_count, 2)
+        self.assertEqual(manager.api.limits.get.call_count, 1)
+        # The existing node was counted against NODE_LIMIT first.
+        self.assertEqual(manager.api.client.get.call_args[0][0],
+                         '/loadbalancers/7/nodes')
+
+    def test_add_over_node_limit(self):
+        manager = self.make_manager()
+        self.assertRaises(exceptions.OverLimit, manager.add, 7,
+                          ['10.0.0.%d:80' % i for i in range(8)])
+        self.assertRaises(exceptions.OverLimit, manager.add, 7,
+                          ['10.0.0.%d:80' % i for i in range(9)])
+        self.assertFalse(manager.api.client.post.called)
+
+    def test_delete_batches(self):
+        manager = self.make_manager()
+        manager.delete(7, range(12))
+
+        urls = [c[0][0] for c in manager.api.client.delete.call_args_list]
+        self.assertEqual(len(urls), 2)
+        self.assertEqual(urls[0], '/loadbalancers/7/nodes?' +
+                         '&'.join('id=%d' % i for i in range(10)))
+        self.assertEqual(urls[1], '/loadbalancers/7/nodes?id=10&id=11')
+
+        manager.delete(7, [3])
+        self.assertEqual(manager.api.client.delete.call_args[0][0],
+                         '/loadbalancers/7/nodes/3')
+
+    def test_add_many_reports_per_loadbalancer(self):
+        manager = self.make_manager()
+        outcomes = manager.add_many({1: ['10.0.0.1:80'], 2: ['bad']})
+
+        self.assertTrue(outcomes[1].ok)
+        self.assertEqual(len(outcomes[1].result), 1)
+        self.assertFalse(outcomes[2].ok)
+        self.assertTrue(isinstance(outcomes[2].error, ValueError))
+
+
+class ParallelTest(utils.TestCase):
+
+    def test_run_keeps_order_and_errors(self):
+        def fn(item):
+            if item == 3:
+                raise KeyError(item)
+            return item * 2
+
+        outcomes = parallel.run(fn, range(6), concurrency=3)
+        self.assertEqual([o.item for o in outcomes], list(range(6)))
+        self.assertEqual([o.result for o in outcomes],
+                         [0, 2, 4, None, 8, 10])
+        self.assertTrue(isinstance(outcomes[3].error, KeyError))
+        self.assertFalse(outcomes[3].ok)
@@ -0,0 +1,146 @@
+import json
+import os
+import tempfile
+
+import mock
+
+from lbaasclient import parallel
+from lbaasclient import reconcile
+from lbaasclient.tests import utils
+
+
+LIVE = {
+    1: {'id': 1, 'name': 'web', 'protocol': 'HTTP', 'port': 80,
+        'algorithm': 'ROUND_ROBIN',
+        'nodes': [{'id': 11, 'address': '10.0.0.1', 'port': 80,
+                   'condition': 'ENABLED'},
+                  {'id': 12, 'address': '10.0.0.2', 'port': 80,
+                   'condition': 'ENABLED'}],
+        'accessList': [{'id': 21, 'address': '10.1.0.0/16',
+                        'type': 'DENY'}],
+        'healthMonitor': {'type': 'CONNECT', 'delay': 10}},
+    2: {'id': 2, 'name': 'api', 'protocol': 'HTTP', 'port': 80,
+        'nodes': []},
+}
+
+
+def make_client():
+    cs = mock.Mock()
+    lbs = []
+    for info in LIVE.values():
+        lb = mock.Mock(id=info['id'])
+        lb.name = info['name']
+        lbs.append(lb)
+    cs.loadbalancers.iterlist.return_value = lbs
+    cs.loadbalancers.get.side_effect = lambda lb_id: mock.Mock(
+        _info=LIVE[lb_id])
+    return cs
+
+
+class LoadConfigTest(utils.TestCase):
+
+    def write(self, data):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            f.write(json.dumps(data))
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_list_or_mapping(self):
+        entries = [{'name': 'web', 'port': 81}]
+        self.assertEqual(reconcile.load_config(self.write(entries)), entries)
+        self.assertEqual(reconcile.load_config(
+            self.write({'loadbalancers': entries})), entries)
+
+    def test_invalid(self):
+        for data in ({'web': {}}, [{'port': 80}], ['web']):
+            self.assertRaises(ValueError, reconcile.load_config,
+                              self.write(data))
+
+
+class PlanTest(utils.TestCase):
+
+    def test_unchanged(self):
+        cs = make_client()
+        plan = reconcile.plan(cs, [{'name': 'web', 'port': 80,
+                                    'nodes': ['10.0.0.1:80', '10.0.0.2:80']},
+                                   {'id': 2}])
+        self.assertEqual(plan.calls, 0)
+        self.assertEqual(plan.changed, [])
+        self.assertTrue(plan.format().startswith("Plan: 0 API calls"))
+
+    def test_changes(self):
+        cs = make_client()
+        plan = reconcile.plan(cs, [{
+            'name': 'web',
+            'port': 8080,
+            'nodes': ['10.0.0.1:80:5', '10.0.0.3:80'],
+            'accessList': [{'address': '10.2.0.0/16', 'type': 'deny'}],
+            'healthMonitor': None}])
+
+        lb, = plan.changed
+        self.assertEqual(lb.id, 1)
+        self.assertEqual([str(change) for change in lb.changes], [
+            '~ update port 80 -> 8080',
+            '+ add nodes 10.0.0.3:80',
+            '- delete nodes 10.0.0.2:80',
+            '~ update node 10.0.0.1:80: weight None -> 5',
+            '+ add access list DENY 10.2.0.0/16',
+            '- delete access list DENY 10.1.0.0/16',
+            '- delete health monitor'])
+        self.assertEqual(plan.calls, 7)
+        # The details already hold the access list and monitor.
+        self.assertFalse(cs.access_lists.list.called)
+        self.assertFalse(cs.health_monitors.get.called)
+
+    def test_create(self):
+        cs = make_client()
+        plan = reconcile.plan(cs, [{
+            'name': 'new', 'protocol': 'HTTP', 'port': 80, 'timeout': 60,
+            'nodes': ['10.0.0.1:80'],
+            'healthMonitor': {'type': 'CONNECT'}}])
+
+        lb, = plan.changed
+        self.assertEqual(lb.create, {
+            'name': 'new', 'protocol': 'HTTP', 'port': 80,
+            'vip_type': 'PUBLIC', 'loaded': True,
+            'nodes': [{'address': '10.0.0.1', 'port': 80,
+                       'condition': 'ENABLED'}]})
+        self.assertEqual([str(change) for change in lb.changes], [
+            '~ update timeout None -> 60',
+            '~ update health monitor type None -> CONNECT'])
+        self.assertEqual(plan.calls, 3)
+        self.assertFalse(cs.loadbalancers.get.called)
+
+    def test_create_needs_protocol(self):
+        self.assertRaises(ValueError, reconcile.plan, make_client(),
+                          [{'name': 'new'}])
+
+    def test_ambiguous_name(self):
+        cs = make_client()
+        cs.loadbalancers.iterlist.return_value[1].name = 'web'
+        self.assertRaises(ValueError, reconcile.plan, cs, [{'name': 'web'}])
+
+    def test_apply(self):
+        cs = make_client()
+        plan = reconcile.plan(cs, [
+            {'name': 'web', 'port': 8080, 'nodes': ['10.0.0.1:80']},
+            {'name': 'new', 'protocol': 'HTTP', 'timeout': 60}])
+        queue = cs.loadbalancers.mutations.return_value
+        # Existing and new loadbalancers each get a run() of the queue.
+        queue.run.return_value = {
+            1: [parallel.Outcome(None),
+                parallel.Outcome(None, error=RuntimeError('boom'))],
+            3: [parallel.Outcome(None)]}
+        cs.loadbalancers.create_many.return_value = [
+            parallel.Outcome(None, result=mock.Mock(id=3))]
+
+        failed = plan.apply(concurrency=1)
+
+        self.assertEqual([str(change) for change in failed],
+                         ['- delete nodes 10.0.0.2:80'])
+        self.assertEqual(plan.changed[1].id, 3)
+        queue.update.assert_has_calls([mock.call(1, port=8080),
+                                       mock.call(3, timeout=60)],
+                                      any_order=True)
+        queue.call.assert_called_once_with(1, cs.nodes.delete, 1, [12])
@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+
+from lbaasclient import requestlog
+from lbaasclient.tests import utils
+
+
+class RequestLogTest(utils.TestCase):
+
+    def test_redact(self):
+        self.assertEqual(
+            requestlog.redact("http://auth/v2.0/tokens/abc?x=1"),
+            "http://auth/v2.0/tokens/***?x=1")
+        self.assertEqual(
+            requestlog.redact("http://lb/v1.0/1/loadbalancers?token=abc&a=b"),
+            "http://lb/v1.0/1/loadbalancers?token=***&a=b")
+
+    def test_log_writes_ndjson(self):
+        path = os.path.join(tempfile.mkdtemp(), "requests.log")
+        log = requestlog.RequestLog(path)
+        base = "http://lb/v1.0/123"
+        log.log("GET", base + "/loadbalancers/42", 200, 10.0, 10.5,
+                base_url=base, bytes_received=7, request_id="req-1")
+        log.log("DELETE", base + "/loadbalancers/42", 422, 11.0, 11.25,
+                base_url=base, retry_count=1)
+        log.close()
+
+        records = list(requestlog.read_records([path]))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]["route"], "/loadbalancers/{id}")
+        self.assertEqual(records[0]["duration"], 0.5)
+        self.assertEqual(records[0]["request_id"], "req-1")
+        self.assertEqual(records[1]["retry_count"], 1)
+
+    def test_read_records_skips_truncated_lines(self):
+        path = os.path.join(tempfile.mkdtemp(), "requests.log")
+        with open(path, "w") as f:
+            f.write(json.dumps({"method": "GET"}) + "\n\n{\"method\": ")
+
+        self.assertEqual(list(requestlog.read_records([path])),
+                         [{"method": "GET"}])
+
+    def test_analyze(self):
+        records = [
+            {"method": "GET", "route": "/loadbalancers", "status": 200,
+             "duration": 0.1, "retry_count": 0},
+            {"method": "GET", "route": "/loadbalancers", "status": 500,
+             "duration": 0.3, "retry_count": 1},
+            {"method": "POST", "route": "/v2.0/tokens", "status": 200,
+             "duration": 1.0, "retry_count": 0},
+        ]
+
+        summary = requestlog.analyze(records)
+
+        self.assertEqual([row["route"] for row in summary],
+                         ["POST /v2.0/tokens", "GET /loadbalancers"])
+        lbs = summary[1]
+        self.assertEqual(lbs["count"], 2)
+        self.assertEqual(lbs["errors"], 1)
+        self.assertEqual(lbs["error_rate"], 0.5)
+        self.assertEqual(lbs["max"], 0.3)
+        self.assertEqual(lbs["retries"], 1)
@@ -0,0 +1,89 @@
+import mock
+
+from lbaasclient import table
+from lbaasclient.tests import utils
+from lbaasclient.v1_0 import loadbalancers
+
+
+DATA = [
+    {'id': 1, 'name': 'a', 'status': 'ACTIVE', 'protocol': 'HTTP',
+     'port': 80, 'virtualIps': [{'address': '10.0.0.1'}]},
+    {'id': 2, 'name': 'b', 'status': 'BUILD', 'protocol': 'HTTPS',
+     'port': 443, 'virtualIps': []},
+    {'id': 3, 'name': 'c', 'status': 'ACTIVE', 'protocol': 'HTTPS',
+     'port': 443},
+    {'id': 4, 'name': 'd', 'status': 'ERROR', 'protocol': 'HTTP',
+     'port': None},
+]
+
+
+class ResourceTableTest(utils.TestCase):
+
+    def make_table(self, identity_map=False):
+        manager = loadbalancers.LoadbalancerManager(
+            mock.Mock(), identity_map=identity_map)
+        return table.ResourceTable(manager, DATA,
+                                   loadbalancers.TABLE_COLUMNS,
+                                   loadbalancers.Loadbalancer)
+
+    def test_columns(self):
+        t = self.make_table()
+        self.assertEqual(len(t), 4)
+        self.assertEqual(t.column('status'),
+                         ['ACTIVE', 'BUILD', 'ACTIVE', 'ERROR'])
+        self.assertEqual(t.column('port'), [80, 443, 443, table.NULL_INT])
+        self.assertEqual(t.column('vip'), ['10.0.0.1', None, None, None])
+
+    def test_filter_sort_slice(self):
+        t = self.make_table()
+        active = t.filter(status='ACTIVE')
+        self.assertEqual(active.column('id'), [1, 3])
+        self.assertEqual(t.filter(status=('ACTIVE', 'BUILD'),
+                                  protocol='HTTPS').column('id'), [2, 3])
+        self.assertEqual(len(t.filter(status='DELETED')), 0)
+
+        self.assertEqual(t.sort('status').column('id'), [1, 3, 2, 4])
+        self.assertEqual(t.sort('port', reverse=True).column('id'),
+                         [2, 3, 1, 4])
+        self.assertEqual(t.sort('name', reverse=True)[:2].column('name'),
+                         ['d', 'c'])
+
+    def test_count_and_group(self):
+        t = self.make_table()
+        self.assertEqual(t.count_by('status'),
+                         {'ACTIVE': 2, 'BUILD': 1, 'ERROR': 1})
+        self.assertEqual(t.filter(protocol='HTTP').count_by('port'),
+                         {80: 1, table.NULL_INT: 1})
+        groups = t.group_by('protocol')
+        self.assertEqual(list(groups), ['HTTP', 'HTTPS'])
+        self.assertEqual(groups['HTTPS'].column('id'), [2, 3])
+
+    def test_rows_are_built_lazily(self):
+        t = self.make_table()
+        self.assertEqual(t._store.resources, {})
+
+        lb = t.filter(status='BUILD')[0]
+        self.assertIsInstance(lb, loadbalancers.Loadbalancer)
+        self.assertEqual(lb.name, 'b')
+        self.assertEqual(list(t._store.resources), [1])
+        self.assertTrue(t[1] is lb)
+        self.assertEqual([lb.id for lb in t], [1, 2, 3, 4])
+
+    def test_rows_share_the_identity_map(self):
+        t = self.make_table(identity_map=True)
+        lb = t[0]
+        self.assertTrue(t._store.manager.identity_map.get(
+            loadbalancers.Loadbalancer, 1) is lb)
+        other = table.ResourceTable(t._store.manager, DATA,
+                                    loadbalancers.TABLE_COLUMNS,
+                                    loadbalancers.Loadbalancer)
+        self.assertTrue(other[0] is lb)
+
+
+class ResourceTableWithoutNumpyTest(ResourceTableTest):
+
+    def setUp(self):
+        super(ResourceTableWithoutNumpyTest, self).setUp()
+        patcher = mock.patch.object(table, 'HAS_NUMPY', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
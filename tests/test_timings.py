@@ -0,0 +1,68 @@
+from lbaasclient import timings
+from lbaasclient import tracing
+from lbaasclient.tests import utils
+
+
+def _timing(url, start, end, thread_id=1):
+    return {'url': url, 'start': start, 'end': end, 'thread_id': thread_id,
+            'ttfb': end - start}
+
+
+class TimingsTest(utils.TestCase):
+
+    def test_summarize_requests_groups_by_route(self):
+        base = "http://example.com/v1.0/123"
+        request_timings = [
+            _timing("GET %s/loadbalancers/1" % base, 0.0, 1.0),
+            _timing("GET %s/loadbalancers/2" % base, 0.0, 3.0),
+            _timing("GET %s/loadbalancers/3" % base, 0.0, 2.0),
+            _timing("DELETE %s/loadbalancers/3" % base, 0.0, 0.5),
+        ]
+
+        summary = timings.summarize_requests(request_timings, base)
+
+        self.assertEqual(summary[0], {'route': 'GET /loadbalancers/{id}',
+                                      'count': 3, 'min': 1.0, 'p50': 2.0,
+                                      'max': 3.0, 'total': 6.0})
+        self.assertEqual(summary[1]['route'], 'DELETE /loadbalancers/{id}')
+
+    def test_max_concurrency(self):
+        request_timings = [_timing("GET /a", 0.0, 2.0),
+                           _timing("GET /b", 1.0, 3.0),
+                           _timing("GET /c", 2.0, 4.0)]
+        self.assertEqual(timings.max_concurrency(request_timings), 2)
+        self.assertEqual(timings.max_concurrency([]), 0)
+
+    def test_phase_timer_totals(self):
+        timer = timings.PhaseTimer()
+        with timer.phase('parse'):
+            pass
+        with timer.phase('auth'):
+            pass
+        with timer.phase('parse'):
+            pass
+        self.assertEqual([name for name, _s in timer.totals()],
+                         ['parse', 'auth'])
+
+    def test_chrome_trace(self):
+        tracer = tracing.RecordingTracer()
+        with tracer.span('lbaas.authenticate', auth_system=None):
+            pass
+        span = tracer.spans[0]
+        span.start, span.end = 10.0, 10.5
+
+        trace = timings.chrome_trace(
+            request_timings=[_timing("GET /a", 10.1, 10.2, thread_id=7)],
+            spans=tracer.spans,
+            phases=[('parse arguments', 9.0, 9.5, 7)])
+
+        events = trace['traceEvents']
+        self.assertEqual([e['name'] for e in events],
+                         ['parse arguments', 'lbaas.authenticate', 'GET /a'])
+        self.assertEqual(events[0]['ts'], 0)
+        self.assertEqual(events[1]['ts'], 1e6)
+        self.assertEqual(events[1]['dur'], 0.5e6)
+        self.assertEqual(events[1]['args'], {})
+        self.assertEqual(events[2]['tid'], 7)
+        self.assertEqual(events[2]['cat'], 'http')
+        self.assertTrue(all(e['ph'] == 'X' for e in events))
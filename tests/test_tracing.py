@@ -0,0 +1,97 @@
+import mock
+import requests
+
+from lbaasclient import base
+from lbaasclient import client
+from lbaasclient import exceptions
+from lbaasclient import tracing
+from lbaasclient.tests import utils
+
+
+def _response(status_code, text='', headers=None):
+    return utils.TestResponse({"status_code": status_code, "text": text,
+                               "headers": headers or {}})
+
+
+class TracingTest(utils.TestCase):
+
+    def setUp(self):
+        super(TracingTest, self).setUp()
+        self.tracer = tracing.RecordingTracer()
+        self.cl = client.HTTPClient("username", "password", "project_id",
+                                    "auth_test", tracer=self.tracer)
+        self.cl.management_url = "http://example.com"
+        self.cl.auth_token = "token"
+
+    def test_noop_tracer_is_default(self):
+        cl = client.HTTPClient("username", "password", "project_id",
+                               "auth_test")
+        self.assertIs(cl.tracer, tracing.NOOP_TRACER)
+        self.assertIs(cl.tracer.span('x'), tracing.NOOP_SPAN)
+
+    def test_request_span(self):
+        resp = _response(200, '{"loadBalancer": {"id": 42}}',
+                         {'x-compute-request-id': 'req-1'})
+
+        with mock.patch.object(requests.Session, "request",
+                               mock.Mock(return_value=resp)):
+            self.cl.get("/loadbalancers/42")
+
+        span, = self.tracer.spans
+        self.assertEqual(span.name, 'lbaas.request')
+        self.assertEqual(span.attributes, {'method': 'GET',
+                                           'route': '/loadbalancers/{id}',
+                                           'status_code': 200,
+                                           'request_id': 'req-1',
+                                           'retry_count': 0})
+
+    def test_unauthorized_retry_is_recorded(self):
+        responses = [_response(401), _response(200, '{}')]
+
+        def fake_authenticate():
+            self.cl.management_url = "http://example.com"
+            self.cl.auth_token = "new-token"
+
+        with mock.patch.object(requests.Session, "request",
+                               mock.Mock(side_effect=responses)):
+            with mock.patch.object(self.cl, "_do_authenticate",
+                                   fake_authenticate):
+                self.cl.get("/loadbalancers")
+
+        names = [span.name for span in self.tracer.spans]
+        self.assertEqual(names, ['lbaas.authenticate', 'lbaas.request'])
+        self.assertEqual(self.tracer.spans[1].attributes['retry_count'], 1)
+        self.assertEqual(self.tracer.spans[1].attributes['retry_reason'],
+                         'unauthorized')
+
+    def test_manager_span_wraps_request(self):
+        class Api(object):
+            pass
+
+        api = Api()
+        api.client = self.cl
+        manager = base.Manager(api)
+        manager.resource_class = base.Resource
+        resp = _response(404, '',
+                         {'x-compute-request-id': 'req-2'})
+
+        with mock.patch.object(requests.Session, "request",
+                               mock.Mock(return_value=resp)):
+            self.assertRaises(exceptions.NotFound, manager._get,
+                              "/loadbalancers/7", "loadBalancer")
+
+        request_span, manager_span = self.tracer.spans
+        self.assertEqual(manager_span.name, 'lbaas.manager.get')
+        self.assertEqual(manager_span.attributes['route'],
+                         '/loadbalancers/{id}')
+        self.assertEqual(manager_span.attributes['status_code'], 404)
+        self.assertEqual(manager_span.attributes['request_id'], 'req-2')
+        self.assertTrue(request_span.start >= manager_span.start)
+
+    def test_slow_callback(self):
+        slow = []
+        tracer = tracing.RecordingTracer(slow_threshold=0,
+                                         on_slow=slow.append)
+        with tracer.span('lbaas.test'):
+            pass
+        self.assertEqual(slow, tracer.spans)
@@ -0,0 +1,119 @@
+import socket
+
+import fixtures
+import mock
+import requests
+
+from lbaasclient import client
+from lbaasclient import transport
+from lbaasclient.tests import utils
+
+
+class DNSCacheTest(utils.TestCase):
+
+    def test_cached_within_ttl(self):
+        fake_getaddrinfo = mock.Mock(return_value=[('addr',)])
+        self.useFixture(fixtures.MonkeyPatch(
+            'lbaasclient.transport._real_getaddrinfo', fake_getaddrinfo))
+        cache = transport.DNSCache(60)
+
+        self.assertEqual(cache.getaddrinfo('example.com', 443),
+                         [('addr',)])
+        self.assertEqual(cache.getaddrinfo('example.com', 443),
+                         [('addr',)])
+        self.assertEqual(fake_getaddrinfo.call_count, 1)
+
+        cache.getaddrinfo('example.com', 80)
+        self.assertEqual(fake_getaddrinfo.call_count, 2)
+
+    def test_expired_entries_are_resolved_again(self):
+        fake_getaddrinfo = mock.Mock(return_value=[('addr',)])
+        self.useFixture(fixtures.MonkeyPatch(
+            'lbaasclient.transport._real_getaddrinfo', fake_getaddrinfo))
+        cache = transport.DNSCache(0)
+
+        cache.getaddrinfo('example.com', 443)
+        cache.getaddrinfo('example.com', 443)
+        self.assertEqual(fake_getaddrinfo.call_count, 2)
+
+    def test_install_and_uninstall(self):
+        self.addCleanup(transport.uninstall_dns_cache)
+        cache = transport.install_dns_cache(30)
+        self.assertEqual(socket.getaddrinfo, transport._getaddrinfo)
+        self.assertIs(transport.install_dns_cache(60), cache)
+        self.assertEqual(cache.ttl, 60)
+
+        transport.uninstall_dns_cache()
+        self.assertEqual(socket.getaddrinfo, transport._real_getaddrinfo)
+
+    def test_expired_and_oldest_entries_are_evicted(self):
+        fake_getaddrinfo = mock.Mock(return_value=[('addr',)])
+        self.useFixture(fixtures.MonkeyPatch(
+            'lbaasclient.transport._real_getaddrinfo', fake_getaddrinfo))
+        now = [1000.0]
+        self.useFixture(fixtures.MonkeyPatch('time.time', lambda: now[0]))
+        cache = transport.DNSCache(60, max_entries=2)
+
+        cache.getaddrinfo('a.example.com', 443)
+        now[0] += 61
+        cache.getaddrinfo('b.example.com', 443)
+        cache.getaddrinfo('c.example.com', 443)
+        # a expired, so only it made room for c.
+        self.assertEqual(len(cache), 2)
+        cache.getaddrinfo('b.example.com', 443)
+        self.assertEqual(fake_getaddrinfo.call_count, 3)
+
+        cache.getaddrinfo('d.example.com', 443)
+        self.assertEqual(len(cache), 2)
+        cache.getaddrinfo('c.example.com', 443)
+        cache.getaddrinfo('b.example.com', 443)
+        self.assertEqual(fake_getaddrinfo.call_count, 5)
+
+    def test_chains_with_resolver_and_other_patches(self):
+        other = mock.Mock(return_value=[('addr',)])
+        self.useFixture(fixtures.MonkeyPatch('socket.getaddrinfo', other))
+        self.useFixture(fixtures.MonkeyPatch(
+            'lbaasclient.transport._real_getaddrinfo',
+            transport._real_getaddrinfo))
+        self.addCleanup(transport.uninstall_resolver)
+        self.addCleanup(transport.uninstall_dns_cache)
+
+        transport.install_resolver()
+        transport.install_dns_cache(30)
+        self.assertEqual(socket.getaddrinfo('example.com', 443),
+                         [('addr',)])
+        self.assertEqual(other.call_count, 1)
+
+        # Timing still needs the wrapper.
+        transport.uninstall_dns_cache()
+        self.assertEqual(socket.getaddrinfo, transport._getaddrinfo)
+        socket.getaddrinfo('example.com', 443)
+        self.assertEqual(other.call_count, 2)
+
+        transport.uninstall_resolver()
+        self.assertEqual(socket.getaddrinfo, other)
+
+
+class PrewarmTest(utils.TestCase):
+
+    def test_prewarm_opens_connections(self):
+        cl = client.HTTPClient("username", "password", "project_id",
+                               "auth_test", prewarm_connections=2)
+        cl.management_url = "http://example.com"
+        mock_request = mock.Mock()
+
+        with mock.patch.object(requests.Session, "request", mock_request):
+            cl.prewarm()
+            for thread in cl._prewarm_threads:
+                thread.join()
+
+        self.assertEqual(mock_request.call_count, 2)
+        mock_request.assert_called_with("HEAD", "http://example.com",
+                                        verify=True, timeout=None,
+                                        allow_redirects=False)
+
+    def test_prewarm_without_management_url(self):
+        cl = client.HTTPClient("username", "password", "project_id",
+                               "auth_test", prewarm_connections=2)
+        cl.prewarm()
+        self.assertEqual(cl._prewarm_threads, [])
@@ -0,0 +1,89 @@
+from lbaasclient import waiter
+from lbaasclient.tests import utils
+
+
+class FakeLB(object):
+
+    def __init__(self, id, status):
+        self.id = id
+        self.status = status
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class WaiterTest(utils.TestCase):
+
+    def _wait(self, listings, ids, **kwargs):
+        clock = FakeClock()
+        listings = iter(listings)
+        calls = []
+
+        def list_fn():
+            calls.append(clock.now)
+            return next(listings)
+
+        results = waiter.wait_for(list_fn, ids, sleep=clock.sleep,
+                                  clock=clock.time, **kwargs)
+        return results, calls, clock
+
+    def test_one_listing_per_tick(self):
+        listings = [
+            [FakeLB(1, 'BUILD'), FakeLB(2, 'BUILD'), FakeLB(3, 'ACTIVE')],
+            [FakeLB(1, 'ACTIVE'), FakeLB(2, 'BUILD'), FakeLB(3, 'ACTIVE')],
+            [FakeLB(1, 'ACTIVE'), FakeLB(2, 'ERROR'), FakeLB(3, 'ACTIVE')],
+        ]
+        transitions = []
+
+        results, calls, clock = self._wait(
+            listings, [1, '2'], target_states=['active'],
+            initial_interval=1, backoff=2,
+            on_transition=lambda *args: transitions.append(args))
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(clock.sleeps, [1, 2])
+        self.assertEqual(results['1'].outcome, 'done')
+        self.assertEqual(results['1'].elapsed, 1)
+        self.assertEqual(results['2'].outcome, 'error')
+        self.assertEqual(results['2'].status, 'ERROR')
+        self.assertEqual(transitions, [('1', None, 'BUILD'),
+                                       ('2', None, 'BUILD'),
+                                       ('1', 'BUILD', 'ACTIVE'),
+                                       ('2', 'BUILD', 'ERROR')])
+
+    def test_missing_resources_are_deleted(self):
+        listings = [[FakeLB(1, 'PENDING_DELETE')], []]
+
+        results, _calls, _clock = self._wait(listings, [1, 2],
+                                             target_states=['DELETED'])
+
+        self.assertTrue(results['1'].ok)
+        self.assertEqual(results['1'].transitions[-1][1:],
+                         ('PENDING_DELETE', 'DELETED'))
+        self.assertTrue(results['2'].ok)
+
+        results, _calls, _clock = self._wait([[]], [1],
+                                             target_states=['ACTIVE'])
+        self.assertEqual(results['1'].outcome, 'error')
+
+    def test_timeout(self):
+        listings = [[FakeLB(1, 'BUILD')]] * 10
+
+        results, calls, clock = self._wait(
+            listings, [1], target_states=['ACTIVE'], timeout=5,
+            initial_interval=2, max_interval=3)
+
+        self.assertEqual(results['1'].outcome, 'timeout')
+        self.assertEqual(clock.sleeps, [2, 3])
+        self.assertEqual(len(calls), 3)
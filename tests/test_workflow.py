@@ -0,0 +1,136 @@
+import threading
+
+import mock
+
+from lbaasclient import tracing
+from lbaasclient.tests import utils
+from lbaasclient import waiter
+from lbaasclient import workflow
+
+
+class FakeManager(object):
+    """Loadbalancers are PENDING_UPDATE after a change, until listed."""
+
+    def __init__(self):
+        self.statuses = {}
+        self.listings = 0
+        self.lock = threading.Lock()
+        self.tracer = tracing.RecordingTracer()
+
+    def _tracer(self):
+        return self.tracer
+
+    def create(self, lb_id):
+        with self.lock:
+            self.statuses[lb_id] = 'PENDING_UPDATE'
+        return mock.Mock(id=lb_id)
+
+    def change(self, lb_id, status='PENDING_UPDATE'):
+        with self.lock:
+            assert self.statuses[lb_id] == 'ACTIVE'
+            self.statuses[lb_id] = status
+
+    def iterlist(self):
+        with self.lock:
+            self.listings += 1
+            listing = [mock.Mock(id=lb_id, status=status)
+                       for lb_id, status in self.statuses.items()]
+            for lb_id, status in self.statuses.items():
+                if status == 'PENDING_UPDATE':
+                    self.statuses[lb_id] = 'ACTIVE'
+        return listing
+
+
+class WorkflowTest(utils.TestCase):
+
+    def setUp(self):
+        super(WorkflowTest, self).setUp()
+        self.manager = FakeManager()
+        self.flow = workflow.Workflow(self.manager, concurrency=4,
+                                      sleep=lambda s: None)
+
+    def add_chain(self, resource, fail_status='PENDING_UPDATE'):
+        def create(state):
+            state.loadbalancer = self.manager.create(resource)
+            return state.loadbalancer
+
+        self.flow.add(resource, 'create', create, wait=True)
+        self.flow.add(resource, 'nodes',
+                      lambda state: self.manager.change(resource,
+                                                        fail_status),
+                      requires=['create'], wait=True)
+        self.flow.add(resource, 'monitor',
+                      lambda state: self.manager.change(resource),
+                      requires=['nodes'], wait=True)
+        self.flow.add(resource, 'report',
+                      lambda state: set(state.results),
+                      requires=['nodes'])
+
+    def test_runs_in_order(self):
+        for resource in range(10):
+            self.add_chain(resource)
+        self.assertEqual(len(self.flow), 40)
+
+        results = self.flow.run()
+
+        self.assertEqual(len(self.flow), 0)
+        self.assertEqual(sorted(results), list(range(10)))
+        for outcomes in results.values():
+            self.assertTrue(all(outcome.ok for outcome in outcomes.values()))
+            self.assertTrue(set(['create', 'nodes']) <=
+                            outcomes['report'].result)
+            self.assertEqual(outcomes['monitor'].wait_result.status,
+                             'ACTIVE')
+        # Waits are shared: one listing per poll, not per loadbalancer.
+        self.assertTrue(self.manager.listings <= 6)
+
+        span, = [span for span in self.manager.tracer.spans
+                 if span.name == 'lbaas.workflow']
+        self.assertEqual(span.attributes['done'], 40)
+        self.assertEqual(len([span for span in self.manager.tracer.spans
+                              if span.name == 'lbaas.workflow.step']), 40)
+
+    def test_failure_cancels_dependents(self):
+        self.add_chain(1, fail_status='ERROR')
+        self.add_chain(2)
+
+        results = self.flow.run()
+
+        self.assertTrue(all(outcome.ok for outcome in results[2].values()))
+        self.assertTrue(results[1]['create'].ok)
+        self.assertTrue(isinstance(results[1]['nodes'].error,
+                                   waiter.WaitError))
+        for name in ('monitor', 'report'):
+            error = results[1][name].error
+            self.assertTrue(isinstance(error, workflow.StepCancelled))
+            self.assertEqual(error.failed, 'nodes')
+
+    def test_exception(self):
+        error = RuntimeError('boom')
+        self.flow.add(1, 'a', mock.Mock(side_effect=error))
+        self.flow.add(1, 'b', mock.Mock(), requires=['a'])
+        self.flow.add(1, 'c', mock.Mock(), requires=['b'])
+        results = self.flow.run()[1]
+        self.assertEqual(results['a'].error, error)
+        self.assertEqual(results['c'].error.failed, 'a')
+
+    def test_invalid_requirement(self):
+        self.flow.add(1, 'a', mock.Mock())
+        self.assertRaises(ValueError, self.flow.add, 1, 'a', mock.Mock())
+        self.assertRaises(ValueError, self.flow.add, 1, 'b', mock.Mock(),
+                          requires=['missing'])
+        self.assertRaises(ValueError, self.flow.add, 2, 'b', mock.Mock(),
+                          requires=['a'])
+
+    def test_rate(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        flow = workflow.Workflow(self.manager, concurrency=1, rate=2,
+                                 sleep=sleep, clock=lambda: now[0])
+        for resource in range(5):
+            flow.add(resource, 'step', mock.Mock())
+        flow.run()
+        self.assertEqual(now[0], 2.0)
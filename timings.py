@@ -0,0 +1,144 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Timing reports for the shell: CLI phases, per-route request summaries and
+Chrome/Perfetto trace export.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+from lbaasclient import metrics
+
+
+class PhaseTimer(object):
+    """Records named, possibly repeated, phases of a CLI run."""
+
+    def __init__(self):
+        self.phases = []  # [(name, start, end, thread_id), ...]
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.phases.append((name, start, time.time(),
+                                threading.current_thread().ident))
+
+    def totals(self):
+        """Return ``[(name, seconds)]`` in first-seen order."""
+        order = []
+        totals = {}
+        for name, start, end, _thread_id in self.phases:
+            if name not in totals:
+                order.append(name)
+                totals[name] = 0.0
+            totals[name] += end - start
+        return [(name, totals[name]) for name in order]
+
+
+def percentile(sorted_values, q):
+    """Return the nearest-rank ``q`` (0-100) percentile of a sorted list."""
+    if not sorted_values:
+        return None
+    index = int(round((len(sorted_values) - 1) * q / 100.0))
+    return sorted_values[index]
+
+
+def summarize_requests(timings, base_url=None):
+    """
+    Group detailed request timings by ``METHOD route-template``.
+
+    :returns: a list of dicts with ``route``, ``count``, ``min``, ``p50``,
+              ``max`` and ``total`` seconds, slowest total first.
+    """
+    groups = {}
+    for timing in timings:
+        method, _sep, url = timing['url'].partition(' ')
+        route = "%s %s" % (method, metrics.route_template(url, base_url))
+        groups.setdefault(route, []).append(timing['end'] - timing['start'])
+
+    summary = []
+    for route, durations in groups.items():
+        durations.sort()
+        summary.append({'route': route,
+                        'count': len(durations),
+                        'min': durations[0],
+                        'p50': percentile(durations, 50),
+                        'max': durations[-1],
+                        'total': sum(durations)})
+    summary.sort(key=lambda row: row['total'], reverse=True)
+    return summary
+
+
+def max_concurrency(timings):
+    """Return the largest number of requests that were in flight at once."""
+    events = []
+    for timing in timings:
+        events.append((timing['start'], 1))
+        events.append((timing['end'], -1))
+    # Ends sort before starts at the same instant.
+    events.sort(key=lambda event: (event[0], event[1]))
+    current = peak = 0
+    for _when, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def chrome_trace(request_timings=(), spans=(), phases=()):
+    """
+    Build a Chrome trace (``chrome://tracing``, Perfetto) from request
+    timings, tracing spans and CLI phases as complete ("X") events.
+    """
+    events = []
+    pid = os.getpid()
+
+    def _add(name, category, start, end, thread_id, args=None):
+        events.append({'name': name,
+                       'cat': category,
+                       'ph': 'X',
+                       'ts': start * 1e6,
+                       'dur': (end - start) * 1e6,
+                       'pid': pid,
+                       'tid': thread_id or 0,
+                       'args': args or {}})
+
+    for name, start, end, thread_id in phases:
+        _add(name, 'cli', start, end, thread_id)
+    for span in spans:
+        args = dict((k, v) for k, v in span.attributes.items()
+                    if v is not None)
+        _add(span.name, 'span', span.start, span.end,
+             getattr(span, 'thread_id', None), args)
+    for timing in request_timings:
+        args = dict((k, v) for k, v in timing.items()
+                    if k not in ('url', 'start', 'end', 'thread_id'))
+        _add(timing['url'], 'http', timing['start'], timing['end'],
+             timing.get('thread_id'), args)
+
+    if events:
+        origin = min(event['ts'] for event in events)
+        for event in events:
+            event['ts'] -= origin
+    events.sort(key=lambda event: event['ts'])
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_chrome_trace(path, request_timings=(), spans=(), phases=()):
+    with open(path, 'w') as f:
+        json.dump(chrome_trace(request_timings, spans, phases), f)
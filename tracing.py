@@ -0,0 +1,181 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Tracing hooks around authentication, HTTP requests and manager calls.
+
+A :class:`Tracer` receives a :class:`Span` for every traced operation.
+Subclass it and override ``_on_start``/``_on_end`` to feed spans into
+your tracing system, or use :class:`OpenTelemetryTracer`.  The default
+:data:`NOOP_TRACER` is checked through its ``enabled`` flag, so the
+instrumented code paths do no extra work when tracing is off.
+"""
+
+import threading
+import time
+
+try:
+    from opentelemetry import trace as otel_trace
+    HAS_OPENTELEMETRY = True
+except ImportError:
+    otel_trace = None
+    HAS_OPENTELEMETRY = False
+
+
+class Span(object):
+    """A traced operation: a name, attributes, start and end times."""
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.start = None
+        self.end = None
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+    def __enter__(self):
+        self.start = time.time()
+        self.tracer._on_start(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end = time.time()
+        if exc_value is not None:
+            self.error = exc_value
+            code = getattr(exc_value, 'code', None)
+            if code is not None:
+                self.attributes.setdefault('status_code', code)
+            request_id = getattr(exc_value, 'request_id', None)
+            if request_id:
+                self.attributes.setdefault('request_id', request_id)
+        self.tracer._on_end(self)
+        return False
+
+    def __repr__(self):
+        return "<Span %s %s>" % (self.name, self.attributes)
+
+
+class _NoopSpan(object):
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer(object):
+    """
+    Base tracer.
+
+    :param slow_threshold: seconds after which a finished span is considered
+                           slow and passed to ``on_slow``.
+    :param on_slow: callable receiving slow :class:`Span` objects.
+    """
+
+    enabled = True
+
+    def __init__(self, slow_threshold=None, on_slow=None):
+        self.slow_threshold = slow_threshold
+        self.on_slow = on_slow
+
+    def span(self, name, **attributes):
+        return Span(self, name, attributes)
+
+    def _on_start(self, span):
+        pass
+
+    def _on_end(self, span):
+        if (self.on_slow is not None and self.slow_threshold is not None and
+                span.duration >= self.slow_threshold):
+            self.on_slow(span)
+
+
+class NoopTracer(Tracer):
+    """A tracer that records nothing."""
+
+    enabled = False
+
+    def span(self, name, **attributes):
+        return NOOP_SPAN
+
+
+NOOP_TRACER = NoopTracer()
+
+
+class RecordingTracer(Tracer):
+    """Keeps finished spans in memory, mostly useful for tests and reports."""
+
+    def __init__(self, *args, **kwargs):
+        super(RecordingTracer, self).__init__(*args, **kwargs)
+        self.spans = []
+
+    def _on_start(self, span):
+        span.thread_id = threading.current_thread().ident
+
+    def _on_end(self, span):
+        self.spans.append(span)
+        super(RecordingTracer, self)._on_end(span)
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Emits spans through OpenTelemetry.
+
+    Spans are made current while they run, so HTTP request spans nest under
+    the manager call that issued them.  Requires the ``opentelemetry-api``
+    package.
+    """
+
+    def __init__(self, tracer=None, *args, **kwargs):
+        if not HAS_OPENTELEMETRY:
+            raise ImportError("OpenTelemetry tracing requires the "
+                              "opentelemetry-api package")
+        super(OpenTelemetryTracer, self).__init__(*args, **kwargs)
+        self.otel_tracer = tracer or otel_trace.get_tracer('lbaasclient')
+
+    def _on_start(self, span):
+        attributes = dict((k, v) for k, v in span.attributes.items()
+                          if v is not None)
+        span.otel_span = self.otel_tracer.start_span(span.name,
+                                                     attributes=attributes)
+        span.otel_context = otel_trace.use_span(span.otel_span,
+                                                end_on_exit=False)
+        span.otel_context.__enter__()
+
+    def _on_end(self, span):
+        otel_span = span.otel_span
+        for key, value in span.attributes.items():
+            if value is not None:
+                otel_span.set_attribute(key, value)
+        if span.error is not None:
+            otel_span.record_exception(span.error)
+            otel_span.set_status(otel_trace.Status(
+                otel_trace.StatusCode.ERROR, str(span.error)))
+        span.otel_context.__exit__(None, None, None)
+        otel_span.end()
+        super(OpenTelemetryTracer, self)._on_end(span)
@@ -0,0 +1,312 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Transport level helpers used by the HTTP client: DNS caching, connection
+pre-warming and per-request phase timing.
+"""
+
+import collections
+import socket
+import threading
+import time
+
+from requests import adapters
+from requests.packages.urllib3 import connection as urllib3_connection
+from requests.packages.urllib3 import connectionpool
+
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'download', 'decode',
+          'resources')
+
+# Most host/port pairs a DNSCache holds.
+DNS_CACHE_SIZE = 256
+
+# The getaddrinfo the resolver wraps: socket's own, or whatever replaced it
+# before the resolver was installed.
+_real_getaddrinfo = socket.getaddrinfo
+_dns_cache = None
+_timing_resolver = False
+_resolver_lock = threading.Lock()
+_local = threading.local()
+
+
+def start_phases():
+    """Start recording request phases for the calling thread."""
+    phases = dict.fromkeys(PHASES, 0.0)
+    phases['bytes_sent'] = 0
+    phases['bytes_received'] = 0
+    _local.phases = phases
+    _local.last = None
+    return phases
+
+
+def finish_phases():
+    """Stop recording and remember the phases of the finished request."""
+    phases = getattr(_local, 'phases', None)
+    _local.phases = None
+    _local.last = phases
+    return phases
+
+
+def current_phases():
+    return getattr(_local, 'phases', None)
+
+
+def last_phases():
+    """Return the phases of the last request finished on this thread."""
+    return getattr(_local, 'last', None)
+
+
+def record_phase(name, seconds):
+    """
+    Add ``seconds`` to phase ``name`` of the request in flight on this
+    thread or, failing that, of the last finished one (this is how the
+    managers account for building resources from a response body).
+    """
+    phases = current_phases() or last_phases()
+    if phases is not None:
+        phases[name] += seconds
+
+
+class DNSCache(object):
+    """
+    Caches ``socket.getaddrinfo`` results for ``ttl`` seconds.
+
+    Failed lookups are never cached, so a transient resolver error is
+    retried on the next connection attempt.  Expired entries are dropped
+    when looked up, and at most ``max_entries`` are kept: the oldest go
+    first once the expired ones are gone.
+    """
+
+    def __init__(self, ttl, max_entries=DNS_CACHE_SIZE):
+        self.ttl = float(ttl)
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def getaddrinfo(self, host, port, *args, **kwargs):
+        return _resolve(self._lookup, host, port, *args, **kwargs)
+
+    def _lookup(self, host, port, *args, **kwargs):
+        key = (host, port, args, tuple(sorted(kwargs.items())))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+        if entry is not None:
+            return list(entry[1])
+
+        result = _real_getaddrinfo(host, port, *args, **kwargs)
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.max_entries:
+                self._evict(now)
+            self._entries[key] = (now + self.ttl, result)
+        return list(result)
+
+    def _evict(self, now):
+        # Called with the lock held.
+        for key, (expires, _result) in list(self._entries.items()):
+            if expires <= now:
+                del self._entries[key]
+        while len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _resolve(lookup, host, port, *args, **kwargs):
+    phases = current_phases()
+    if phases is None:
+        return lookup(host, port, *args, **kwargs)
+    start = time.time()
+    try:
+        return lookup(host, port, *args, **kwargs)
+    finally:
+        phases['dns'] += time.time() - start
+
+
+def _getaddrinfo(host, port, *args, **kwargs):
+    cache = _dns_cache
+    if cache is not None:
+        return cache.getaddrinfo(host, port, *args, **kwargs)
+    return _resolve(_real_getaddrinfo, host, port, *args, **kwargs)
+
+
+def _wrap():
+    # Called with the lock held.
+    global _real_getaddrinfo
+    if socket.getaddrinfo is not _getaddrinfo:
+        _real_getaddrinfo = socket.getaddrinfo
+        socket.getaddrinfo = _getaddrinfo
+
+
+def _unwrap():
+    # Called with the lock held: restore what was wrapped once neither DNS
+    # timing nor the cache needs the wrapper.  If something replaced it in
+    # turn, it is left in place: it then just calls what it wrapped.
+    if (_dns_cache is None and not _timing_resolver and
+            socket.getaddrinfo is _getaddrinfo):
+        socket.getaddrinfo = _real_getaddrinfo
+
+
+def install_resolver():
+    """
+    Route name resolution through this module to time it.
+
+    requests (through urllib3) resolves hosts with ``socket.getaddrinfo``
+    for every new connection, so that is where DNS caching and DNS timing
+    hook in.  This patches the ``socket`` module, i.e. every thread and
+    every library of the process.  Without a cache or an active phase
+    recording the wrapper simply calls the function it replaced.
+    """
+    global _timing_resolver
+    with _resolver_lock:
+        _timing_resolver = True
+        _wrap()
+
+
+def uninstall_resolver():
+    """Stop timing name resolution, see :func:`install_resolver`."""
+    global _timing_resolver
+    with _resolver_lock:
+        _timing_resolver = False
+        _unwrap()
+
+
+def install_dns_cache(ttl):
+    """
+    Cache name resolution in a :class:`DNSCache`.
+
+    Like :func:`install_resolver`, this affects the whole process: every
+    connection it opens, not only the client's, resolves through the
+    cache.  Installing twice keeps the existing cache and only adjusts its
+    TTL.
+    """
+    global _dns_cache
+    with _resolver_lock:
+        if _dns_cache is None:
+            _dns_cache = DNSCache(ttl)
+        else:
+            _dns_cache.ttl = float(ttl)
+        _wrap()
+        return _dns_cache
+
+
+def uninstall_dns_cache():
+    """
+    Drop the DNS cache.  DNS timing, if installed, keeps resolving through
+    this module.
+    """
+    global _dns_cache
+    with _resolver_lock:
+        _dns_cache = None
+        _unwrap()
+
+
+class _PhaseTimingMixin(object):
+    """Accounts connection setup to the phases of the request in flight."""
+
+    records_tls = False
+
+    def _new_conn(self):
+        phases = current_phases()
+        if phases is None:
+            return super(_PhaseTimingMixin, self)._new_conn()
+        dns_before = phases['dns']
+        start = time.time()
+        try:
+            return super(_PhaseTimingMixin, self)._new_conn()
+        finally:
+            elapsed = time.time() - start
+            self._new_conn_time = elapsed
+            # Name resolution happens inside _new_conn and is recorded
+            # separately by the resolver.
+            phases['connect'] += elapsed - (phases['dns'] - dns_before)
+
+    def connect(self):
+        phases = current_phases()
+        if phases is None or not self.records_tls:
+            return super(_PhaseTimingMixin, self).connect()
+        self._new_conn_time = 0.0
+        start = time.time()
+        try:
+            return super(_PhaseTimingMixin, self).connect()
+        finally:
+            phases['tls'] += time.time() - start - self._new_conn_time
+
+
+class TimedHTTPConnection(_PhaseTimingMixin,
+                          urllib3_connection.HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_PhaseTimingMixin,
+                           urllib3_connection.HTTPSConnection):
+    records_tls = True
+
+
+class TimedHTTPConnectionPool(connectionpool.HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(connectionpool.HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimingAdapter(adapters.HTTPAdapter):
+    """
+    An ``HTTPAdapter`` whose connections report DNS, TCP connect and TLS
+    handshake times to the phase recording of the calling thread.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(TimingAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+def prewarm(session, url, count=1, verify=True, timeout=None):
+    """
+    Open ``count`` pooled connections to ``url`` in background threads.
+
+    Each thread issues a ``HEAD`` request; the response is discarded but the
+    resolved address, the TCP connection and the TLS session stay in the
+    session's pool for the next real request.  Errors are ignored, the real
+    request will simply pay for the handshake itself.
+
+    :returns: the list of started (daemon) threads.
+    """
+    def _warm():
+        try:
+            session.request('HEAD', url, verify=verify, timeout=timeout,
+                            allow_redirects=False)
+        except Exception:
+            pass
+
+    threads = []
+    for _i in range(count):
+        thread = threading.Thread(target=_warm, name='lbaas-prewarm')
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    return threads
@@ -366,3 +366,39 @@ def is_integer_like(val):
         return True
     except (TypeError, ValueError, AttributeError):
         return False
+
+
+def parse_node_spec(spec, condition='ENABLED'):
+    """
+    Parse a node given as ``address:port[:weight]`` into a node dict.
+
+    IPv6 addresses go in brackets: ``[2001:db8::1]:80:5``.  Dicts are
+    returned unchanged, with ``condition`` filled in if missing.
+    """
+    if isinstance(spec, dict):
+        node = dict(spec)
+        node.setdefault('condition', condition)
+        return node
+
+    if spec.startswith('['):
+        address, bracket, rest = spec[1:].partition(']')
+        if bracket and rest.startswith(':'):
+            parts = rest[1:].split(':')
+        else:
+            parts = []
+    else:
+        parts = spec.split(':')
+        address = parts.pop(0)
+
+    if not address or len(parts) not in (1, 2):
+        raise ValueError("Invalid node %r, expected address:port[:weight] "
+                         "or [ipv6-address]:port[:weight]" % spec)
+    try:
+        node = {'address': address, 'port': int(parts[0]),
+                'condition': condition}
+        if len(parts) == 2:
+            node['weight'] = int(parts[1])
+    except ValueError:
+        raise ValueError("Invalid node %r, port and weight must be "
+                         "integers" % spec)
+    return node
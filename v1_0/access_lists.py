@@ -0,0 +1,69 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Access list interface: the networks allowed or denied by a loadbalancer.
+"""
+
+from lbaasclient import base
+from lbaasclient.openstack.common.py3kcompat import urlutils
+
+
+# The API deletes at most this many network items per request.
+DELETE_CHUNK_SIZE = 10
+
+
+class NetworkItem(base.Resource):
+    HUMAN_ID = False
+    COMPLETION_CACHE = False
+
+    def __repr__(self):
+        return "<NetworkItem: %s %s>" % (getattr(self, 'type', None),
+                                         getattr(self, 'address', None))
+
+
+class AccessListManager(base.Manager):
+    resource_class = NetworkItem
+
+    def list(self, loadbalancer):
+        """
+        Get the access list of a loadbalancer.
+
+        :rtype: list of :class:`NetworkItem`
+        """
+        return self._list("/loadbalancers/%s/accesslist" %
+                          base.getid(loadbalancer), "accessList")
+
+    def add(self, loadbalancer, items):
+        """
+        Add network items, dicts with an ``address`` (IP or CIDR) and a
+        ``type`` (``ALLOW`` or ``DENY``), in one request.
+        """
+        self.api.client.post("/loadbalancers/%s/accesslist" %
+                             base.getid(loadbalancer),
+                             body={'accessList': list(items)})
+
+    def delete(self, loadbalancer, items):
+        """
+        Delete network items, up to :data:`DELETE_CHUNK_SIZE` per request.
+
+        :param items: :class:`NetworkItem` objects or IDs.
+        """
+        ids = [base.getid(item) for item in items]
+        url = "/loadbalancers/%s/accesslist" % base.getid(loadbalancer)
+        for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+            chunk = ids[start:start + DELETE_CHUNK_SIZE]
+            if len(chunk) == 1:
+                self._delete("%s/%s" % (url, chunk[0]))
+            else:
+                self._delete("%s?%s" % (url, urlutils.urlencode(
+                    [('id', id) for id in chunk])))
@@ -15,6 +15,7 @@
 #    under the License.
 
 from lbaasclient import client
+from lbaasclient.v1_0 import access_lists
 #from lbaasclient.v1_0 import agents
 #from lbaasclient.v1_0 import certs
 #from lbaasclient.v1_0 import cloudpipe
@@ -27,17 +28,19 @@ from lbaasclient import client
 #from lbaasclient.v1_0 import floating_ips
 #from lbaasclient.v1_0 import floating_ip_pools
 #from lbaasclient.v1_0 import fping
+from lbaasclient.v1_0 import health_monitors
 #from lbaasclient.v1_0 import hosts
 #from lbaasclient.v1_0 import hypervisors
 #from lbaasclient.v1_0 import images
 #from lbaasclient.v1_0 import keypairs
-#from lbaasclient.v1_0 import limits
+from lbaasclient.v1_0 import limits
 #from lbaasclient.v1_0 import networks
 #from lbaasclient.v1_0 import quota_classes
 #from lbaasclient.v1_0 import quotas
 #from lbaasclient.v1_0 import security_group_rules
 #from lbaasclient.v1_0 import security_groups
 from lbaasclient.v1_0 import loadbalancers
+from lbaasclient.v1_0 import nodes
 #from lbaasclient.v1_0 import usage
 #from lbaasclient.v1_0 import virtual_interfaces
 #from lbaasclient.v1_0 import volumes
@@ -75,17 +78,29 @@ class Client(object):
                   bypass_url=None, os_cache=False, no_cache=True,
                   http_log_debug=False, auth_system='keystone',
                   auth_plugin=None,
-                  cacert=None, tenant_id=None):
+                  cacert=None, tenant_id=None,
+                  prewarm_connections=0, dns_cache_ttl=None,
+                  metrics=None, tracer=None, request_log=None,
+                  http_log_sample_rate=1.0,
+                  http_log_max_body=client.DEFAULT_LOG_BODY_BYTES,
+                  compact_resources=False, identity_map=False,
+                  completion_cache=False, idempotency_header=None):
         # FIXME(comstud): Rename the api_key argument above when we
         # know it's not being used as keyword argument
         password = api_key
         self.projectid = project_id
         self.tenant_id = tenant_id
+        self.completion_cache = completion_cache
         #self.flavors = flavors.FlavorManager(self)
         #self.flavor_access = flavor_access.FlavorAccessManager(self)
         #self.images = images.ImageManager(self)
-        #self.limits = limits.LimitsManager(self)
-        self.loadbalancers = loadbalancers.LoadbalancerManager(self)
+        self.limits = limits.LimitsManager(self)
+        self.loadbalancers = loadbalancers.LoadbalancerManager(
+            self, compact=compact_resources, identity_map=identity_map,
+            idempotency_header=idempotency_header)
+        self.nodes = nodes.NodeManager(self)
+        self.access_lists = access_lists.AccessListManager(self)
+        self.health_monitors = health_monitors.HealthMonitorManager(self)
 
         # extensions
         #self.agents = agents.AgentsManager(self)
@@ -147,13 +162,20 @@ class Client(object):
                                     bypass_url=bypass_url,
                                     os_cache=self.os_cache,
                                     http_log_debug=http_log_debug,
-                                    cacert=cacert)
+                                    cacert=cacert,
+                                    prewarm_connections=prewarm_connections,
+                                    dns_cache_ttl=dns_cache_ttl,
+                                    metrics=metrics,
+                                    tracer=tracer,
+                                    request_log=request_log,
+                                    http_log_sample_rate=http_log_sample_rate,
+                                    http_log_max_body=http_log_max_body)
 
     def set_management_url(self, url):
         self.client.set_management_url(url)
 
-    def get_timings(self):
-        return self.client.get_timings()
+    def get_timings(self, detailed=False):
+        return self.client.get_timings(detailed=detailed)
 
     def reset_timings(self):
         self.client.reset_timings()
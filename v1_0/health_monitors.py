@@ -0,0 +1,54 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Health monitor interface: how a loadbalancer checks its nodes.
+"""
+
+from lbaasclient import base
+
+
+class HealthMonitor(base.Resource):
+    HUMAN_ID = False
+    COMPLETION_CACHE = False
+
+    def __repr__(self):
+        return "<HealthMonitor: %s>" % getattr(self, 'type', None)
+
+
+class HealthMonitorManager(base.Manager):
+    resource_class = HealthMonitor
+
+    def get(self, loadbalancer):
+        """
+        Get the health monitor of a loadbalancer; it has no attributes
+        when none is configured.
+
+        :rtype: :class:`HealthMonitor`
+        """
+        _resp, body = self.api.client.get("/loadbalancers/%s/healthmonitor" %
+                                          base.getid(loadbalancer))
+        return self._make(self.resource_class,
+                          dict(body.get('healthMonitor') or {}), loaded=True)
+
+    def update(self, loadbalancer, **monitor):
+        """
+        Configure the health monitor, e.g. ``type='CONNECT', delay=10,
+        timeout=5, attemptsBeforeDeactivation=3``.
+        """
+        self._update("/loadbalancers/%s/healthmonitor" %
+                     base.getid(loadbalancer), {'healthMonitor': monitor})
+
+    def delete(self, loadbalancer):
+        """Remove the health monitor."""
+        self._delete("/loadbalancers/%s/healthmonitor" %
+                     base.getid(loadbalancer))
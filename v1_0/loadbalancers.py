@@ -19,15 +19,105 @@
 Loadbalancer interface.
 """
 
+import os
+import threading
+import time
+import uuid
+
+import requests
 import six
 
 from lbaasclient import base
 from lbaasclient import crypto
+from lbaasclient import exceptions
+from lbaasclient import inventory
+from lbaasclient import journal as journal_
+from lbaasclient import lookup
+from lbaasclient import mutations
 from lbaasclient.openstack.common.py3kcompat import urlutils
+from lbaasclient.openstack.common import timeutils
+from lbaasclient import parallel
+from lbaasclient import table
+from lbaasclient import waiter
+
+
+# Loadbalancers fetched per request by iterlist() and list_all().
+DEFAULT_PAGE_SIZE = 100
+
+# The API deletes at most this many loadbalancers per request.
+DELETE_BATCH_SIZE = 10
+
+# Retries of a create rejected with a Retry-After, see create_many().
+CREATE_RETRIES = 3
+
+# Seconds before the first retry of an idempotent create whose outcome is
+# unknown, doubled for each further one: a loadbalancer created by the
+# failed attempt takes a moment to be listed.
+CREATE_RETRY_DELAY = 1.0
+
+# Metadata key marking a loadbalancer with the idempotency key of its
+# create, when the server does not take the key as a header.
+IDEMPOTENCY_METADATA_KEY = 'lbaasclient:idempotency-key'
+
+# Seconds the idempotency keys of finished creates are remembered for.
+IDEMPOTENCY_RECORD_TTL = 7 * 24 * 3600
+
+# HTTP statuses after which a create may or may not have happened.
+_AMBIGUOUS_STATUSES = (500, 502, 503, 504)
+
+_UNIT_SECONDS = {'SECOND': 1, 'MINUTE': 60, 'HOUR': 3600, 'DAY': 86400}
+
+
+def _first_vip(info):
+    vips = info.get('virtualIps') or ()
+    return vips[0].get('address') if vips else None
+
+
+def _is_ambiguous(error):
+    """Whether a create failing with ``error`` may have happened anyway."""
+    if isinstance(error, (requests.exceptions.Timeout,
+                          requests.exceptions.ConnectionError)):
+        return True
+    return (isinstance(error, exceptions.ClientException) and
+            error.code in _AMBIGUOUS_STATUSES)
+
+
+def _post_interval(limits):
+    """Seconds between creates allowed by the POST /loadbalancers limit."""
+    interval = 0
+    for rate in limits.rate:
+        if rate.verb != 'POST' or 'loadbalancers' not in rate.uri:
+            continue
+        seconds = _UNIT_SECONDS.get(str(rate.unit).upper())
+        if seconds and rate.value:
+            interval = max(interval, float(seconds) / rate.value)
+    return interval
+
+
+# Settings changed with PUT /loadbalancers/{id}.
+UPDATABLE_FIELDS = ('name', 'algorithm', 'protocol', 'port', 'timeout',
+                    'halfClosed', 'httpsRedirect')
+
+
+# Columns of list(as_table=True).
+TABLE_COLUMNS = (
+    table.Column('id', table.INT),
+    table.Column('name'),
+    table.Column('status', table.CATEGORY),
+    table.Column('protocol', table.CATEGORY),
+    table.Column('algorithm', table.CATEGORY),
+    table.Column('port', table.INT),
+    table.Column('nodeCount', table.INT),
+    table.Column('vip', key=_first_vip),
+)
+
 
+class _LoadbalancerMixin(object):
+    """Behaviour shared by :class:`Loadbalancer` and its compact form."""
+    __slots__ = ()
 
-class Loadbalancer(base.Resource):
     HUMAN_ID = True
+    TRACKED_FIELDS = UPDATABLE_FIELDS
 
     def __repr__(self):
         return "<Loadbalancer: %s>" % self.name
@@ -38,14 +128,28 @@ class Loadbalancer(base.Resource):
         """
         self.manager.delete(self)
 
-    def update(self, name=None):
+    def update(self, name=None, **fields):
         """
-        Update the name or the password for this loadbalancer.
+        Update the name or other settings of this loadbalancer.
 
         :param name: Update the loadbalancer's name.
-        :param password: Update the root password.
         """
-        self.manager.update(self, name=name)
+        self.manager.update(self, name=name, **fields)
+
+    def save(self):
+        """
+        Send the settings changed since this loadbalancer was loaded, e.g.
+        after ``lb.port = 8080``, in one PUT.
+
+        :returns: whether anything was sent: nothing is when no setting
+                  changed.
+        """
+        changes = self.dirty_fields()
+        if not changes:
+            return False
+        self.manager.update(self, **changes)
+        self._mark_saved(changes)
+        return True
 
     @property
     def networks(self):
@@ -61,9 +165,48 @@ class Loadbalancer(base.Resource):
             return {}
 
 
+class Loadbalancer(_LoadbalancerMixin, base.Resource):
+    pass
+
+
+class CompactLoadbalancer(_LoadbalancerMixin, base.CompactResource):
+    """
+    A :class:`Loadbalancer` backed directly by its API dict, see
+    :class:`lbaasclient.base.CompactResource`.
+    """
+    __slots__ = ()
+
+
 class LoadbalancerManager(base.BootingManagerWithFind):
     resource_class = Loadbalancer
 
+    # Header taking the idempotency key of creates, for servers that
+    # support one, e.g. 'Idempotency-Key'.
+    idempotency_header = None
+
+    def __init__(self, api, compact=False, identity_map=False,
+                 idempotency_header=None, sleep=time.sleep):
+        """
+        :param compact: build :class:`CompactLoadbalancer` objects, which
+                        are cheaper to create and hold for large listings.
+        :param identity_map: keep one live object per loadbalancer id and
+                             refresh it in place, see
+                             :class:`lbaasclient.base.IdentityMap`.
+        :param idempotency_header: header the server takes idempotency
+                                   keys of creates in, see :meth:`create`.
+        :param sleep: called to wait before retrying a create.
+        """
+        super(LoadbalancerManager, self).__init__(api)
+        self._sleep = sleep
+        self._records_lock = threading.Lock()
+        self.lookup_errors = {}
+        if idempotency_header:
+            self.idempotency_header = idempotency_header
+        if compact:
+            self.resource_class = CompactLoadbalancer
+        if identity_map:
+            self.identity_map = base.IdentityMap()
+
     def get(self, loadbalancer):
         """
         Get a loadbalancer.
@@ -73,7 +216,8 @@ class LoadbalancerManager(base.BootingManagerWithFind):
         """
         return self._get("/loadbalancers/%s" % base.getid(loadbalancer), "loadBalancer")
 
-    def list(self, detailed=True, search_opts=None, marker=None, limit=None):
+    def list(self, detailed=True, search_opts=None, marker=None, limit=None,
+             offline=False, as_table=False):
         """
         Get a list of loadbalancers.
 
@@ -82,12 +226,28 @@ class LoadbalancerManager(base.BootingManagerWithFind):
         :param marker: Begin returning loadbalancers that appear later in the loadbalancer
                        list than that represented by this loadbalancer id (optional).
         :param limit: Maximum number of loadbalancers to return (optional).
+        :param offline: Read the local inventory (see :meth:`sync`) instead
+                        of calling the API; the result is a
+                        :class:`lbaasclient.inventory.CachedList` carrying
+                        ``synced_at`` and ``age`` (optional).
+        :param as_table: Return a :class:`lbaasclient.table.ResourceTable`
+                         with the :data:`TABLE_COLUMNS` columns instead of a
+                         list (optional).
 
         :rtype: list of :class:`Loadbalancer`
         """
         if search_opts is None:
             search_opts = {}
 
+        if offline:
+            items = self._list_offline(search_opts, marker, limit)
+            if as_table:
+                return table.ResourceTable(self, items, TABLE_COLUMNS,
+                                           self.resource_class)
+            return inventory.CachedList(
+                [self._make(self.resource_class, item, loaded=True)
+                 for item in items], self.inventory.synced_at)
+
         qparams = {}
 
         for opt, val in six.iteritems(search_opts):
@@ -102,10 +262,193 @@ class LoadbalancerManager(base.BootingManagerWithFind):
 
         query_string = "?%s" % urlutils.urlencode(qparams) if qparams else ""
 
-        return self._list("/loadbalancers%s" % (query_string,), "loadBalancers")
+        url = "/loadbalancers%s" % (query_string,)
+        if as_table:
+            return self._list_table(url, "loadBalancers", TABLE_COLUMNS)
+        return self._list(url, "loadBalancers")
+
+    def _list_offline(self, search_opts, marker, limit):
+        filters = [(opt, val) for opt, val in six.iteritems(search_opts)
+                   if val and opt != 'changes-since']
+        items = []
+        for item in self.inventory.items():
+            if marker and int(item['id']) <= int(marker):
+                continue
+            if any(str(item.get(opt)) != str(val) for opt, val in filters):
+                continue
+            items.append(item)
+            if limit and len(items) >= limit:
+                break
+        return items
+
+    def _get_inventory(self):
+        if getattr(self, '_inventory', None) is None:
+            path = os.path.join(base.get_cache_dir(),
+                                'loadbalancer-inventory.sqlite')
+            self._inventory = inventory.InventoryStore(path)
+        return self._inventory
+
+    def _set_inventory(self, store):
+        self._inventory = store
+
+    inventory = property(_get_inventory, _set_inventory,
+                         doc="The local :class:`InventoryStore`.")
+
+    def sync(self, full=False, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Update the local inventory.
+
+        The first sync (or ``full=True``) stores a complete listing; later
+        ones only fetch loadbalancers changed since the previous sync,
+        using the ``changes-since`` filter, which also reports deletions.
+
+        :rtype: :class:`lbaasclient.inventory.SyncResult`
+        """
+        def list_fn(changes_since):
+            search_opts = None
+            if changes_since is not None:
+                search_opts = {'changes-since':
+                               timeutils.iso8601_from_timestamp(
+                                   changes_since)}
+            return self.iterlist(search_opts=search_opts,
+                                 page_size=page_size)
+
+        result = inventory.sync(self.inventory, list_fn, full=full)
+        index = getattr(self, '_lookup_index', None)
+        if result.full:
+            self._lookup_index = None
+        elif index is not None:
+            for item in result.changed:
+                index.update(item)
+            for lb_id in result.deleted:
+                index.remove(lb_id)
+        return result
+
+    def get_lookup_index(self, sync=True, fetch_nodes=False,
+                         concurrency=parallel.DEFAULT_CONCURRENCY):
+        """
+        Return the :class:`lbaasclient.lookup.LookupIndex` over the local
+        inventory, built on first use and updated in place by :meth:`sync`.
+
+        :param sync: sync the inventory first.
+        :param fetch_nodes: also index node addresses.  Listings carry no
+                            nodes, so this GETs the details of every
+                            loadbalancer stored without them, i.e. only
+                            new or changed ones after the first time,
+                            ``concurrency`` at a time.  The loadbalancers
+                            that could not be fetched are left in
+                            :attr:`lookup_errors` as ``{id: exception}``,
+                            and fetched again next time.
+        """
+        if sync:
+            self.sync()
+        index = getattr(self, '_lookup_index', None)
+        self.lookup_errors = {}
+        if fetch_nodes:
+            ids = [item['id'] for item in self.inventory.items()
+                   if 'nodes' not in item]
+            details = []
+            for outcome in parallel.run(self.get, ids,
+                                        concurrency=concurrency):
+                if outcome.ok:
+                    details.append(outcome.result._info)
+                else:
+                    self.lookup_errors[outcome.item] = outcome.error
+            self.inventory.put(details)
+            if index is not None:
+                for item in details:
+                    index.update(item)
+        if index is None:
+            index = self._lookup_index = lookup.LookupIndex(
+                self.inventory.items())
+        return index
+
+    def lookup(self, query, sync=True, fetch_nodes=False):
+        """
+        Find loadbalancers by virtual IP or node address, by network
+        (CIDR) or by name regex.
+
+        Node addresses only match with ``fetch_nodes``, even for the
+        loadbalancers already stored with their nodes.
+
+        :rtype: list of :class:`lbaasclient.lookup.Match`
+        """
+        index = self.get_lookup_index(sync=sync, fetch_nodes=fetch_nodes)
+        matches = index.lookup(query)
+        if not fetch_nodes:
+            matches = [match for match in matches if match.kind != 'node']
+        return matches
+
+    def iterlist(self, search_opts=None, page_size=DEFAULT_PAGE_SIZE,
+                 completion_cache=False):
+        """
+        Iterate over every loadbalancer, following markers ``page_size`` at
+        a time and building one :class:`Loadbalancer` at a time.
+
+        Only the current page is held in memory.
+
+        :param completion_cache: rewrite the completion caches (optional).
+        """
+        obj_class = self.resource_class
+        if completion_cache and obj_class.COMPLETION_CACHE:
+            # Opened once around all pages: each page would truncate them.
+            with self._completion_caches(obj_class, mode="w"):
+                for loadbalancer in self._iterpages(search_opts, page_size):
+                    yield loadbalancer
+        else:
+            for loadbalancer in self._iterpages(search_opts, page_size):
+                yield loadbalancer
+
+    def _iterpages(self, search_opts, page_size):
+        qparams = {}
+        for opt, val in six.iteritems(search_opts or {}):
+            if val:
+                qparams[opt] = val
+        qparams['limit'] = page_size
+
+        while True:
+            count = 0
+            page = self._iter_list(
+                "/loadbalancers?%s" % urlutils.urlencode(qparams),
+                "loadBalancers")
+            for loadbalancer in page:
+                count += 1
+                qparams['marker'] = loadbalancer.id
+                yield loadbalancer
+            if count < page_size:
+                return
+
+    def list_all(self, detailed=True, search_opts=None,
+                 page_size=DEFAULT_PAGE_SIZE):
+        """
+        Get every loadbalancer, following markers ``page_size`` at a time.
+
+        :rtype: list of :class:`Loadbalancer`
+        """
+        return list(self.iterlist(search_opts=search_opts,
+                                  page_size=page_size))
+
+    def wait_for(self, loadbalancers, target_states=('ACTIVE',),
+                 timeout=None, on_transition=None, **kwargs):
+        """
+        Wait until each loadbalancer reaches one of ``target_states``.
+
+        All loadbalancers are checked with a single paged listing per poll,
+        see :func:`lbaasclient.waiter.wait_for` for the other arguments.
+
+        :param loadbalancers: :class:`Loadbalancer` objects or IDs.
+        :param target_states: statuses to wait for, e.g. ``('ACTIVE',)`` or
+                              ``('DELETED',)``.
+        :param timeout: give up after this many seconds (optional).
+        :returns: ``{id: WaitResult}``.
+        """
+        ids = [base.getid(lb) for lb in loadbalancers]
+        return waiter.wait_for(self.iterlist, ids, target_states,
+                               timeout=timeout, on_transition=on_transition,
+                               **kwargs)
 
     def create(self, name, protocol, vip_type, port=None, algorithm=None,
-               nodes=None, **kwargs):
+               nodes=None, idempotency_key=None, loaded=False, **kwargs):
         # TODO(anthony): indicate in doc string if param is an extension
         # and/or optional
         """
@@ -114,31 +457,294 @@ class LoadbalancerManager(base.BootingManagerWithFind):
         :param name: Something to name the loadbalancer.
         :param protocol: The :class:`Image` to boot with.
         :param vip_type: The :class:`Flavor` to boot onto.
+        :param idempotency_key: a key of the caller's choosing (e.g. a
+                                UUID) making the create safe to retry, see
+                                :meth:`_create_idempotent` (optional).
+        :param loaded: the create response already holds the whole
+                       loadbalancer; mark the returned object as loaded so
+                       that reading a missing attribute does not GET it
+                       again (optional).
+        :param kwargs: ``metadata``, a list of ``{'key': ..., 'value':
+                       ...}`` dicts; the rest is passed to the
+                       ``modify_body_for_create`` hooks.
         """
         boot_args = [name, protocol, vip_type]
 
         boot_kwargs = dict(
             port=port, algorithm=algorithm, nodes=nodes, **kwargs)
 
+        if idempotency_key is not None:
+            return self._create_idempotent(idempotency_key, boot_args,
+                                           boot_kwargs, loaded=loaded)
         resource_url = "/loadbalancers"
         response_key = "loadBalancer"
         return self._do_create(resource_url, response_key, *boot_args,
-                **boot_kwargs)
+                loaded=loaded, **boot_kwargs)
+
+    def _get_idempotency_records(self):
+        with self._records_lock:
+            if getattr(self, '_idempotency_records', None) is None:
+                path = os.path.join(base.get_cache_dir(),
+                                    'loadbalancer-idempotency.journal')
+                records = journal_.Journal(path, 'idempotency')
+                # Otherwise every process would load an ever growing file.
+                records.prune(time.time() - IDEMPOTENCY_RECORD_TTL)
+                self._idempotency_records = records
+        return self._idempotency_records
+
+    def _set_idempotency_records(self, records):
+        self._idempotency_records = records
+
+    idempotency_records = property(
+        _get_idempotency_records, _set_idempotency_records,
+        doc="The local :class:`lbaasclient.journal.Journal` of the "
+            "idempotency keys used by :meth:`create`; keys of creates "
+            "finished more than IDEMPOTENCY_RECORD_TTL seconds ago are "
+            "forgotten.")
+
+    def _create_idempotent(self, key, boot_args, boot_kwargs, loaded=False):
+        """
+        Create a loadbalancer at most once per ``key``.
+
+        A key already used by this client returns the loadbalancer it
+        created.  Otherwise the create is retried after errors leaving it
+        unknown whether it happened (timeouts, connection errors, 5xx),
+        after :data:`CREATE_RETRY_DELAY` seconds, doubled each time.  With
+        :attr:`idempotency_header` set, the server takes the key as that
+        header and does not create twice.  Without it, the key is stored
+        in the loadbalancer metadata, and before a retry the loadbalancers
+        of the same name are checked for it.  A key whose create was
+        rejected is recorded as failed and can be used again.
+        """
+        records = self.idempotency_records
+        name = boot_args[0]
+        entry = records.get(key)
+        if entry is not None and entry.get('id') is not None:
+            return self.get(entry['id'])
+
+        headers = None
+        if self.idempotency_header:
+            headers = {self.idempotency_header: key}
+        else:
+            boot_kwargs['metadata'] = list(
+                boot_kwargs.get('metadata') or ()) + [
+                {'key': IDEMPOTENCY_METADATA_KEY, 'value': key}]
+            if entry is not None and entry['state'] != journal_.FAILED:
+                # A previous run may have created it before dying.
+                lb = self._find_by_idempotency_key(name, key)
+                if lb is not None:
+                    records.record(key, journal_.DONE, id=lb.id)
+                    return lb
+
+        records.record(key, journal_.SUBMITTED, name=name)
+        for attempt in range(CREATE_RETRIES + 1):
+            try:
+                lb = self._do_create("/loadbalancers", "loadBalancer",
+                                     *boot_args, headers=headers,
+                                     loaded=loaded, **boot_kwargs)
+                break
+            except Exception as e:
+                if not _is_ambiguous(e):
+                    records.record(key, journal_.FAILED, error=str(e))
+                    raise
+                if attempt == CREATE_RETRIES:
+                    # Left submitted: the next run checks for it again.
+                    raise
+            self._sleep(CREATE_RETRY_DELAY * 2 ** attempt)
+            if headers is None:
+                lb = self._find_by_idempotency_key(name, key)
+                if lb is not None:
+                    break
+        records.record(key, journal_.DONE, id=lb.id)
+        return lb
+
+    def _find_by_idempotency_key(self, name, key):
+        """
+        Return the loadbalancer named ``name`` whose metadata holds the
+        idempotency ``key``, or ``None``: one GET per loadbalancer of that
+        name, no full listing.
+        """
+        for candidate in self.iterlist(search_opts={'name': name}):
+            if candidate.name != name:
+                continue
+            lb = self.get(candidate.id)
+            for item in getattr(lb, 'metadata', None) or ():
+                if (item.get('key') == IDEMPOTENCY_METADATA_KEY and
+                        item.get('value') == key):
+                    return lb
+        return None
+
+    def create_many(self, templates, concurrency=parallel.DEFAULT_CONCURRENCY,
+                    wait=True, timeout=None, precheck=True,
+                    on_transition=None, journal=None):
+        """
+        Create several loadbalancers, at most ``concurrency`` at a time.
+
+        Unless ``precheck`` is false, the absolute limits are checked
+        before anything is created and submissions are paced under the
+        POST rate limit.  Creates rejected with a ``Retry-After`` are
+        retried.  With ``wait``, every created loadbalancer is then
+        waited for with a single :meth:`wait_for`.
+
+        With a :class:`lbaasclient.journal.Journal`, templates are
+        journaled by position: those created by a previous run with the
+        same journal are not created again.  Each template is journaled
+        with an idempotency key (one is made up unless given), so those
+        left in flight are first looked up by it.  Every journaled create
+        is therefore an idempotent one (see :meth:`_create_idempotent`):
+        the key is recorded in :attr:`idempotency_records` and, unless the
+        server takes it as :attr:`idempotency_header`, stored as an entry
+        of the loadbalancer's metadata.  The keys are added to copies,
+        ``templates`` are left unchanged.
+
+        :param templates: dicts of :meth:`create` keyword arguments.
+        :returns: a list of :class:`lbaasclient.parallel.Outcome`, in the
+                  order of ``templates``; the result of each is the created
+                  :class:`Loadbalancer`, failed waits have a
+                  :class:`lbaasclient.waiter.WaitError` error.
+        """
+        # Copies: journaled creates add an idempotency key to them.
+        templates = [dict(template) for template in templates]
+        created = {}
+        if journal is not None:
+            created = self._journaled_creates(journal, templates)
+        todo = [template for index, template in enumerate(templates)
+                if index not in created]
+        interval = 0
+        if precheck and todo:
+            limits = self.api.limits.get()
+            self._check_absolute_limits(limits, todo)
+            interval = _post_interval(limits)
+        pacer = parallel.Pacer(interval)
+
+        def create(index):
+            if index in created:
+                return created[index]
+            template = templates[index]
+            if journal is not None:
+                journal.record(index, journal_.SUBMITTED)
+            for attempt in range(CREATE_RETRIES + 1):
+                pacer.wait()
+                try:
+                    lb = self.create(**template)
+                    break
+                except exceptions.OverLimit as e:
+                    if not e.retry_after or attempt == CREATE_RETRIES:
+                        if journal is not None:
+                            journal.record(index, journal_.FAILED,
+                                           error=str(e))
+                        raise
+                    self._sleep(e.retry_after)
+                except Exception as e:
+                    if journal is not None:
+                        journal.record(index, journal_.FAILED, error=str(e))
+                    raise
+            if journal is not None:
+                journal.record(index, journal_.DONE, id=lb.id)
+            return lb
+
+        outcomes = parallel.run(create, range(len(templates)),
+                                concurrency=concurrency)
+        for outcome in outcomes:
+            outcome.item = templates[outcome.item]
+
+        created = [outcome for outcome in outcomes if outcome.ok]
+        if wait and created:
+            results = self.wait_for([outcome.result for outcome in created],
+                                    timeout=timeout,
+                                    on_transition=on_transition)
+            for outcome in created:
+                outcome.wait_result = results[str(outcome.result.id)]
+                if not outcome.wait_result.ok:
+                    outcome.error = waiter.WaitError(outcome.wait_result)
+        return outcomes
+
+    def _journaled_creates(self, journal, templates):
+        """
+        Plan ``templates`` in ``journal``; return ``{index: Loadbalancer}``
+        for those already created, including those left in flight that
+        turn out to exist.
 
-    def update(self, loadbalancer, name=None):
+        Templates without an idempotency key get the one journaled for
+        them or, the first time, a new one, set in place: ``templates``
+        are :meth:`create_many`'s copies.
+        """
+        for index, template in enumerate(templates):
+            if template.get('idempotency_key') is None:
+                planned = (journal.get(index) or {}).get('template') or {}
+                template['idempotency_key'] = (
+                    planned.get('idempotency_key') or str(uuid.uuid4()))
+        journal.plan([(index, {'template': template})
+                      for index, template in enumerate(templates)])
+        created = {}
+        in_flight = []
+        for index, template in enumerate(templates):
+            entry = journal.get(index)
+            if entry['state'] == journal_.DONE:
+                # Only what the journal knows, without a GET for the rest.
+                created[index] = self._make(
+                    self.resource_class,
+                    {'id': entry['id'], 'name': template.get('name')},
+                    loaded=True)
+            elif entry['state'] == journal_.SUBMITTED:
+                in_flight.append(index)
+        for index in in_flight:
+            lb = self._find_created(templates[index])
+            if lb is not None:
+                journal.record(index, journal_.DONE, id=lb.id)
+                created[index] = lb
+        return created
+
+    def _find_created(self, template):
         """
-        Update the name or the password for a loadbalancer.
+        Find the loadbalancer created from ``template`` whose response was
+        lost, by its idempotency key.  A name alone could match one created
+        by someone else.
+        """
+        if self.idempotency_header:
+            # Creating it again returns it.
+            return None
+        return self._find_by_idempotency_key(template.get('name'),
+                                             template['idempotency_key'])
+
+    def _check_absolute_limits(self, limits, templates):
+        absolute = dict((limit.name, limit.value)
+                        for limit in limits.absolute)
+        max_lbs = absolute.get('LOADBALANCER_LIMIT')
+        if max_lbs is not None:
+            existing = sum(1 for _lb in self.iterlist())
+            if existing + len(templates) > max_lbs:
+                raise exceptions.OverLimit(
+                    413, "Creating %d loadbalancers would exceed "
+                    "LOADBALANCER_LIMIT: %d of %d are in use" % (
+                        len(templates), existing, max_lbs))
+        max_nodes = absolute.get('NODE_LIMIT')
+        if max_nodes is not None:
+            for template in templates:
+                if len(template.get('nodes') or ()) > max_nodes:
+                    raise exceptions.OverLimit(
+                        413, "Loadbalancer %s has more than NODE_LIMIT "
+                        "(%d) nodes" % (template.get('name'), max_nodes))
+
+    def update(self, loadbalancer, name=None, **fields):
+        """
+        Update the name or other settings of a loadbalancer.
 
         :param loadbalancer: The :class:`Loadbalancer` (or its ID) to update.
         :param name: Update the loadbalancer's name.
+        :param fields: other settings to change, e.g. ``algorithm``,
+                       ``protocol``, ``port`` or ``timeout``.
+
+        The settings are sent as given; :meth:`Loadbalancer.save` sends
+        only the ones changed.
         """
-        if name is None:
+        if name is not None:
+            fields['name'] = name
+        if not fields:
             return
 
         body = {
-            "loadbalancer": {
-                "name": name,
-            },
+            "loadbalancer": fields,
         }
 
         return self._update("/loadbalancers/%s" % base.getid(loadbalancer), body, "loadbalancer")
@@ -149,6 +755,106 @@ class LoadbalancerManager(base.BootingManagerWithFind):
         """
         self._delete("/loadbalancers/%s" % base.getid(loadbalancer))
 
+    def delete_many(self, loadbalancers, batch_size=DELETE_BATCH_SIZE,
+                    concurrency=parallel.DEFAULT_CONCURRENCY, journal=None):
+        """
+        Delete several loadbalancers with ``DELETE /loadbalancers?id=..``,
+        ``batch_size`` ids per request.
+
+        A batch is all or nothing: when one fails (e.g. because one of its
+        loadbalancers is immutable or already gone) its loadbalancers are
+        deleted one by one, at most ``concurrency`` at a time, so that each
+        gets its own result.
+
+        With a :class:`lbaasclient.journal.Journal`, loadbalancers deleted
+        by a previous run with the same journal are skipped, and those it
+        left in flight are checked with a GET first.
+
+        :param loadbalancers: :class:`Loadbalancer` objects or IDs.
+        :returns: ``{id: Outcome}``, see :class:`lbaasclient.parallel.Outcome`.
+        """
+        ids = []
+        for lb in loadbalancers:
+            lb_id = base.getid(lb)
+            if lb_id not in ids:
+                ids.append(lb_id)
+
+        results = {}
+        if journal is not None:
+            todo = self._journaled_deletes(journal, ids, concurrency)
+            for lb_id in ids:
+                if lb_id not in todo:
+                    results[lb_id] = parallel.Outcome(lb_id)
+            ids = todo
+        batches = [ids[i:i + batch_size]
+                   for i in range(0, len(ids), batch_size)]
+
+        retry = []
+        for outcome in parallel.run(
+                lambda batch: self._delete_batch(batch, journal), batches,
+                concurrency=concurrency):
+            if outcome.ok:
+                for lb_id in outcome.item:
+                    results[lb_id] = parallel.Outcome(lb_id)
+            else:
+                retry.extend(outcome.item)
+        for outcome in parallel.run(
+                lambda lb_id: self._delete_batch([lb_id], journal), retry,
+                concurrency=concurrency):
+            results[outcome.item] = outcome
+        return results
+
+    def _journaled_deletes(self, journal, ids, concurrency):
+        """
+        Plan ``ids`` in ``journal``; return those still to delete, checking
+        the ones left in flight.
+        """
+        todo = journal.plan([(lb_id, {}) for lb_id in ids])
+        in_flight = [lb_id for lb_id in todo
+                     if journal.state(lb_id) == journal_.SUBMITTED]
+        gone = set()
+        for outcome in parallel.run(self._is_deleted, in_flight,
+                                    concurrency=concurrency):
+            if outcome.ok and outcome.result:
+                gone.add(outcome.item)
+        if gone:
+            journal.record_many(gone, journal_.DONE)
+        return [lb_id for lb_id in todo if lb_id not in gone]
+
+    def _is_deleted(self, lb_id):
+        try:
+            lb = self.get(lb_id)
+        except exceptions.NotFound:
+            return True
+        return (lb.status or '').upper() in ('DELETED', 'PENDING_DELETE')
+
+    def _delete_batch(self, ids, journal=None):
+        if journal is not None:
+            journal.record_many(ids, journal_.SUBMITTED)
+        try:
+            if len(ids) == 1:
+                self.delete(ids[0])
+            else:
+                self._delete("/loadbalancers?%s" % urlutils.urlencode(
+                    [('id', lb_id) for lb_id in ids]))
+        except Exception as e:
+            # A failed batch is retried one by one.
+            if journal is not None and len(ids) == 1:
+                journal.record_many(ids, journal_.FAILED, error=str(e))
+            raise
+        if journal is not None:
+            journal.record_many(ids, journal_.DONE)
+
+    def mutations(self, concurrency=parallel.DEFAULT_CONCURRENCY,
+                  **kwargs):
+        """
+        Return a :class:`lbaasclient.mutations.MutationQueue` to apply many
+        changes, each loadbalancer's in order and waiting for ACTIVE in
+        between, different loadbalancers in parallel.
+        """
+        return mutations.MutationQueue(self, concurrency=concurrency,
+                                       **kwargs)
+
     def _action(self, action, loadbalancer, info=None, **kwargs):
         """
         Perform a loadbalancer "action" -- reboot/rebuild/resize/etc.
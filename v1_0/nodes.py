@@ -0,0 +1,258 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Node interface: the back-end servers of a loadbalancer.
+"""
+
+import six
+
+from lbaasclient import base
+from lbaasclient import exceptions
+from lbaasclient import journal as journal_
+from lbaasclient.openstack.common.py3kcompat import urlutils
+from lbaasclient import parallel
+from lbaasclient import utils
+from lbaasclient import waiter
+
+
+# Nodes added per request by NodeManager.add().
+ADD_CHUNK_SIZE = 25
+
+# The API deletes at most this many nodes per request.
+DELETE_CHUNK_SIZE = 10
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Node(base.Resource):
+    HUMAN_ID = False
+    COMPLETION_CACHE = False
+
+    def __repr__(self):
+        return "<Node: %s:%s>" % (getattr(self, 'address', None),
+                                  getattr(self, 'port', None))
+
+    def update(self, **kwargs):
+        return self.manager.update(self.loadbalancer_id, self, **kwargs)
+
+    def delete(self):
+        self.manager.delete(self.loadbalancer_id, [self])
+
+
+class NodeManager(base.Manager):
+    resource_class = Node
+
+    def __init__(self, api, wait_interval=1.0):
+        super(NodeManager, self).__init__(api)
+        self.wait_interval = wait_interval
+        self._node_limit = None
+        self._node_limit_read = False
+
+    def _bind(self, loadbalancer, nodes):
+        lb_id = base.getid(loadbalancer)
+        for node in nodes:
+            node.loadbalancer_id = lb_id
+        return nodes
+
+    def list(self, loadbalancer):
+        """
+        Get the nodes of a loadbalancer.
+
+        :rtype: list of :class:`Node`
+        """
+        return self._bind(loadbalancer, self._list(
+            "/loadbalancers/%s/nodes" % base.getid(loadbalancer), "nodes"))
+
+    def get(self, loadbalancer, node):
+        """
+        Get one node of a loadbalancer.
+
+        :rtype: :class:`Node`
+        """
+        return self._bind(loadbalancer, [self._get(
+            "/loadbalancers/%s/nodes/%s" % (base.getid(loadbalancer),
+                                            base.getid(node)),
+            "node")])[0]
+
+    def node_limit(self):
+        """
+        The most nodes a loadbalancer may have: the ``NODE_LIMIT`` absolute
+        limit, read once from the limits API; ``None`` if unknown.
+        """
+        if not self._node_limit_read:
+            limits = getattr(self.api, 'limits', None)
+            if limits is not None:
+                try:
+                    for limit in limits.get().absolute:
+                        if limit.name == 'NODE_LIMIT' and limit.value > 0:
+                            self._node_limit = int(limit.value)
+                except exceptions.ClientException:
+                    pass
+            self._node_limit_read = True
+        return self._node_limit
+
+    def _check_node_limit(self, loadbalancer, count):
+        limit = self.node_limit()
+        if limit is None:
+            return
+        existing = len(self.list(loadbalancer)) if count <= limit else 0
+        if existing + count > limit:
+            raise exceptions.OverLimit(
+                413, "Adding %d nodes to loadbalancer %s would exceed "
+                "NODE_LIMIT: it has %d of %d" % (
+                    count, base.getid(loadbalancer), existing, limit))
+
+    def _wait_active(self, loadbalancer):
+        """Wait for the loadbalancer to accept the next change."""
+        lb_id = base.getid(loadbalancer)
+        results = waiter.wait_for(
+            lambda: [self.api.loadbalancers.get(lb_id)], [lb_id],
+            ('ACTIVE',), initial_interval=self.wait_interval)
+        result = results[str(lb_id)]
+        if not result.ok:
+            raise waiter.WaitError(result)
+
+    def add(self, loadbalancer, nodes, chunk_size=ADD_CHUNK_SIZE):
+        """
+        Add nodes to a loadbalancer, ``chunk_size`` per request; each
+        further chunk waits for the loadbalancer to be ACTIVE again.
+
+        When the ``NODE_LIMIT`` absolute limit is known, the nodes the
+        loadbalancer already has are counted first, so that an add going
+        over the limit fails before anything is changed.
+
+        :param nodes: node dicts or ``address:port[:weight]`` strings.
+        :raises: :class:`lbaasclient.exceptions.OverLimit` if the
+                 loadbalancer would have more than ``NODE_LIMIT`` nodes.
+        :rtype: list of :class:`Node`
+        """
+        nodes = [utils.parse_node_spec(node) for node in nodes]
+        self._check_node_limit(loadbalancer, len(nodes))
+        url = "/loadbalancers/%s/nodes" % base.getid(loadbalancer)
+        added = []
+        for index, chunk in enumerate(_chunks(nodes, chunk_size)):
+            if index:
+                self._wait_active(loadbalancer)
+            _resp, body = self.api.client.post(url, body={'nodes': chunk})
+            added.extend(self._make(self.resource_class, info, loaded=True)
+                         for info in body['nodes'])
+        return self._bind(loadbalancer, added)
+
+    def update(self, loadbalancer, node, condition=None, weight=None,
+               type=None):
+        """Change the condition, weight or type of a node."""
+        body = {}
+        if condition is not None:
+            body['condition'] = condition
+        if weight is not None:
+            body['weight'] = weight
+        if type is not None:
+            body['type'] = type
+        if not body:
+            return
+        self._update("/loadbalancers/%s/nodes/%s" % (
+            base.getid(loadbalancer), base.getid(node)), {'node': body})
+
+    def delete(self, loadbalancer, nodes):
+        """
+        Delete nodes of a loadbalancer, up to :data:`DELETE_CHUNK_SIZE` per
+        request; each further chunk waits for the loadbalancer to be ACTIVE
+        again.
+
+        :param nodes: :class:`Node` objects or IDs.
+        """
+        ids = [base.getid(node) for node in nodes]
+        url = "/loadbalancers/%s/nodes" % base.getid(loadbalancer)
+        for index, chunk in enumerate(_chunks(ids, DELETE_CHUNK_SIZE)):
+            if index:
+                self._wait_active(loadbalancer)
+            if len(chunk) == 1:
+                self._delete("%s/%s" % (url, chunk[0]))
+            else:
+                self._delete("%s?%s" % (url, urlutils.urlencode(
+                    [('id', id) for id in chunk])))
+
+    def add_many(self, changes, chunk_size=ADD_CHUNK_SIZE,
+                 concurrency=parallel.DEFAULT_CONCURRENCY, journal=None):
+        """
+        Add nodes to several loadbalancers; the chunks of one loadbalancer
+        are sent in order, different loadbalancers concurrently.
+
+        With a :class:`lbaasclient.journal.Journal`, loadbalancers done by
+        a previous run with the same journal are skipped, and those it left
+        in flight only get the nodes they do not have yet.
+
+        :param changes: ``{loadbalancer: [node, ...]}``.
+        :returns: ``{loadbalancer id: Outcome}``, the result of each
+                  outcome being the added nodes.
+        """
+        return self._run_many(self.add, changes, concurrency, journal,
+                              chunk_size=chunk_size)
+
+    def delete_many(self, changes, concurrency=parallel.DEFAULT_CONCURRENCY,
+                    journal=None):
+        """
+        Delete nodes of several loadbalancers, see :meth:`add_many`.
+
+        :param changes: ``{loadbalancer: [node, ...]}``.
+        :returns: ``{loadbalancer id: Outcome}``.
+        """
+        changes = dict((lb, [base.getid(node) for node in nodes])
+                       for lb, nodes in six.iteritems(changes))
+        return self._run_many(self.delete, changes, concurrency, journal)
+
+    def _run_many(self, method, changes, concurrency, journal=None,
+                  **kwargs):
+        changes = dict((base.getid(lb), nodes)
+                       for lb, nodes in six.iteritems(changes))
+        ids = sorted(changes)
+        if journal is not None:
+            todo = set(journal.plan([(lb_id, {'nodes': changes[lb_id]})
+                                     for lb_id in ids]))
+
+        def run(lb_id):
+            if journal is None:
+                return method(lb_id, changes[lb_id], **kwargs)
+            if lb_id not in todo:
+                return None
+            nodes = changes[lb_id]
+            if journal.state(lb_id) == journal_.SUBMITTED:
+                nodes = self._unapplied(method, lb_id, nodes)
+            journal.record(lb_id, journal_.SUBMITTED)
+            try:
+                result = method(lb_id, nodes, **kwargs) if nodes else []
+            except Exception as e:
+                journal.record(lb_id, journal_.FAILED, error=str(e))
+                raise
+            journal.record(lb_id, journal_.DONE)
+            return result
+
+        outcomes = parallel.run(run, ids, concurrency=concurrency)
+        return dict((outcome.item, outcome) for outcome in outcomes)
+
+    def _unapplied(self, method, loadbalancer, nodes):
+        """
+        Return the ``nodes`` an interrupted :meth:`add` or :meth:`delete`
+        did not get to, listing the nodes of the loadbalancer once.
+        """
+        current = self.list(loadbalancer)
+        if method == self.add:
+            present = set((node.address, int(node.port)) for node in current)
+            nodes = [utils.parse_node_spec(node) for node in nodes]
+            return [node for node in nodes
+                    if (node['address'], int(node['port'])) not in present]
+        present = set(str(node.id) for node in current)
+        return [node for node in nodes if str(node) in present]
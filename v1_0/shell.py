@@ -22,6 +22,7 @@ import argparse
 import copy
 import datetime
 import getpass
+import json
 import locale
 import os
 import sys
@@ -29,9 +30,15 @@ import time
 
 import six
 
+from lbaasclient import base
+from lbaasclient import completion
 from lbaasclient import exceptions
+from lbaasclient import journal
 from lbaasclient.openstack.common import strutils
 from lbaasclient.openstack.common import timeutils
+from lbaasclient import parallel
+from lbaasclient import reconcile
+from lbaasclient import requestlog
 from lbaasclient import utils
 from lbaasclient.v1_0 import quotas
 from lbaasclient.v1_0 import loadbalancers
@@ -63,7 +70,8 @@ def _create(cs, args):
     return boot_args, boot_kwargs
 
 
-@utils.arg('name', metavar="<name>", help="Name for the new loadbalancer")
+@utils.arg('name', metavar="<name>", nargs='?', default=None,
+     help="Name for the new loadbalancer (optional with --from-template)")
 @utils.arg('--algorithm',
      default=None,
      metavar='<algorithm>',
@@ -91,20 +99,52 @@ def _create(cs, args):
      action="store_true",
      default=False,
      help='Blocks while loadbalancer builds so progress can be reported.')
-
+@utils.arg('--count',
+     type=int,
+     default=None,
+     metavar='<count>',
+     help="Create <count> loadbalancers named <name>-1, <name>-2...")
+@utils.arg('--from-template',
+     dest='template',
+     default=None,
+     metavar='<file>',
+     help="JSON file with the create arguments (name, protocol, vip_type, "
+          "port, algorithm, nodes) of one loadbalancer, or a list of them.")
+@utils.arg('--concurrency',
+     type=int,
+     default=parallel.DEFAULT_CONCURRENCY,
+     metavar='<count>',
+     help="Loadbalancers created at a time with --count or "
+          "--from-template (default: %d)." % parallel.DEFAULT_CONCURRENCY)
+@utils.arg('--journal',
+     default=None,
+     metavar='<file>',
+     help="Record the progress of --count or --from-template in <file>, "
+          "so that an interrupted run can be resumed with --resume.")
+@utils.arg('--resume',
+     default=None,
+     metavar='<file>',
+     help="Resume the creates journaled in <file>, skipping those done.")
+@utils.arg('--idempotency-key',
+     default=None,
+     metavar='<key>',
+     help="Key making the create safe to retry: a loadbalancer is created "
+          "at most once per key.")
 def do_create(cs, args):
     """Create a new loadbalancer."""
+    if args.count is not None or args.template or args.resume:
+        return _create_many(cs, args)
+
     boot_args, boot_kwargs = _create(cs, args)
 
     #extra_boot_kwargs = utils.get_resource_manager_extra_kwargs(do_boot, args)
     #boot_kwargs.update(extra_boot_kwargs)
 
-    loadbalancer = cs.loadbalancers.create(*boot_args, **boot_kwargs)
-
-    # Keep any information (like adminPass) returned by create
-    info = loadbalancer._info
-    loadbalancer = cs.loadbalancers.get(info['id'])
-    info.update(loadbalancer._info)
+    # The create response holds the whole loadbalancer, no need to GET it.
+    loadbalancer = cs.loadbalancers.create(
+        *boot_args, loaded=True, idempotency_key=args.idempotency_key,
+        **boot_kwargs)
+    info = loadbalancer._info.copy()
 
     #info.pop('links', None)
     info.pop('sourceAddresses', None)
@@ -112,14 +152,110 @@ def do_create(cs, args):
     utils.print_dict(info)
 
     if args.poll:
-        _poll_for_status(cs.loadbalancers.get, info['id'], 'building', ['active'])
+        _poll_for_status(cs.loadbalancers.get, info['id'], 'building',
+                         ['active'], initial=loadbalancer)
+
+
+def _load_templates(args):
+    templates = [{}]
+    if args.template:
+        try:
+            with open(args.template) as f:
+                loaded = json.load(f)
+        except (IOError, ValueError) as e:
+            raise exceptions.CommandError("Unable to read template %s: %s"
+                                          % (args.template, e))
+        templates = loaded if isinstance(loaded, list) else [loaded]
+
+    # Options with a default only fill in what the template leaves out,
+    # the others override it.
+    overrides = dict((key, value) for key, value in (
+        ('name', args.name), ('port', args.port),
+        ('algorithm', args.algorithm), ('nodes', args.node)) if value)
+    result = []
+    for template in templates:
+        template = dict(template)
+        template.setdefault('protocol', args.protocol)
+        template.setdefault('vip_type', args.vip_type)
+        template.update(overrides)
+        if not template.get('name'):
+            raise exceptions.CommandError("you need to specify a name")
+        try:
+            template['nodes'] = [utils.parse_node_spec(node)
+                                 for node in template.get('nodes') or ()]
+        except ValueError as e:
+            raise exceptions.CommandError(str(e))
+
+        count = args.count or 1
+        for index in range(count):
+            item = dict(template)
+            if count > 1:
+                item['name'] = '%s-%d' % (template['name'], index + 1)
+            result.append(item)
+    return result
+
+
+def _open_journal(path, operation):
+    try:
+        return journal.Journal(path, operation)
+    except (IOError, ValueError) as e:
+        raise exceptions.CommandError(str(e))
+
+
+def _create_many(cs, args):
+    if args.resume:
+        create_journal = _open_journal(args.resume, 'create')
+        templates = [entry['template']
+                     for _key, entry in create_journal.entries()]
+        if not templates:
+            raise exceptions.CommandError("%s has no creates to resume"
+                                          % args.resume)
+    else:
+        templates = _load_templates(args)
+        create_journal = None
+        if args.journal:
+            create_journal = _open_journal(args.journal, 'create')
+
+    def on_transition(lb_id, old, new):
+        print("Loadbalancer %s: %s -> %s" % (lb_id, old, new),
+              file=sys.stderr)
+
+    try:
+        outcomes = cs.loadbalancers.create_many(
+            templates, concurrency=args.concurrency, wait=args.poll,
+            on_transition=on_transition if args.poll else None,
+            journal=create_journal)
+    except exceptions.OverLimit as e:
+        raise exceptions.CommandError(e.message)
+    finally:
+        if create_journal is not None:
+            create_journal.close()
+
+    class Row(object):
+        def __init__(self, outcome):
+            self.name = outcome.item['name']
+            self.id = outcome.result.id if outcome.result else None
+            if outcome.wait_result is not None:
+                self.status = outcome.wait_result.status
+            else:
+                self.status = getattr(outcome.result, 'status', None)
+            self.result = 'ok' if outcome.ok else outcome.error
+
+    rows = [Row(outcome) for outcome in outcomes]
+    utils.print_list(rows, ['Name', 'ID', 'Status', 'Result'])
+    if not any(outcome.ok for outcome in outcomes):
+        raise exceptions.CommandError("Unable to create any of the "
+                                      "loadbalancers.")
 
 
 def _poll_for_status(poll_fn, obj_id, action, final_ok_states,
                      poll_period=5, show_progress=True,
-                     status_field="status", silent=False):
+                     status_field="status", silent=False, initial=None):
     """Block while an action is being performed, periodically printing
     progress.
+
+    ``initial`` is the object as already known, e.g. from a create
+    response; it stands in for the first poll.
     """
     def print_progress(progress):
         if show_progress:
@@ -134,8 +270,10 @@ def _poll_for_status(poll_fn, obj_id, action, final_ok_states,
     if not silent:
         print
 
+    obj = initial
     while True:
-        obj = poll_fn(obj_id)
+        if obj is None:
+            obj = poll_fn(obj_id)
 
         status = getattr(obj, status_field)
 
@@ -157,6 +295,7 @@ def _poll_for_status(poll_fn, obj_id, action, final_ok_states,
             print_progress(progress)
 
         time.sleep(poll_period)
+        obj = None
 
 
 def _translate_keys(collection, convert):
@@ -228,6 +367,16 @@ def _extract_metadata(args):
     metavar='<fields>',
     help='Comma-separated list of fields to display. '
          'Use the show command to see which fields are available.')
+@utils.arg('--cached',
+    action='store_true',
+    default=False,
+    help='List from the local inventory instead of the API; it is synced '
+         'first if it was never synced or is older than --max-age.')
+@utils.arg('--max-age',
+    metavar='<seconds>',
+    type=float,
+    default=None,
+    help='With --cached, sync the inventory if it is older than this.')
 def do_list(cs, args):
     """List active loadbalancers."""
     def vip_filter(lb):
@@ -244,7 +393,14 @@ def do_list(cs, args):
             formatters[field_title] = formatter
     id_col = 'ID'
 
-    loadbalancers = cs.loadbalancers.list()
+    if args.cached:
+        synced_at = cs.loadbalancers.inventory.synced_at
+        if synced_at is None or (args.max_age is not None and
+                                 time.time() - synced_at > args.max_age):
+            cs.loadbalancers.sync()
+        loadbalancers = cs.loadbalancers.list(offline=True)
+    else:
+        loadbalancers = cs.loadbalancers.list()
     convert = [('OS-EXT-SRV-ATTR:host', 'host'),
                ('hostId', 'host_id')]
     _translate_keys(loadbalancers, convert)
@@ -263,6 +419,56 @@ def do_list(cs, args):
         ]
     utils.print_list(loadbalancers, columns,
                      formatters, sortby_index=1)
+    if args.cached:
+        print("Inventory synced %s (%d seconds ago)" % (
+              timeutils.iso8601_from_timestamp(loadbalancers.synced_at),
+              loadbalancers.age), file=sys.stderr)
+
+
+@utils.arg('--full',
+    action='store_true',
+    default=False,
+    help='Download the complete inventory instead of the changes since the '
+         'last sync.')
+def do_sync(cs, args):
+    """Update the local loadbalancer inventory used by list --cached."""
+    result = cs.loadbalancers.sync(full=args.full)
+    print("%s sync: %d changed, %d deleted, %d loadbalancers stored" % (
+          'Full' if result.full else 'Incremental', len(result.changed),
+          len(result.deleted), len(cs.loadbalancers.inventory)))
+
+
+@utils.arg('query', metavar='<ip|cidr|name-regex>',
+           help='IP address, network in CIDR notation or name regex.')
+@utils.arg('--nodes',
+           action='store_true',
+           default=False,
+           help='Also match node addresses (fetches the details of '
+                'loadbalancers not indexed with their nodes yet).')
+@utils.arg('--no-sync',
+           dest='sync',
+           action='store_false',
+           default=True,
+           help='Only use the local inventory, do not sync it first.')
+def do_lookup(cs, args):
+    """Find loadbalancers by virtual IP, node IP, network or name."""
+    class Row(object):
+        def __init__(self, match, status):
+            self.id = match.id
+            self.name = match.name
+            self.status = status
+            self.match = match.kind
+            self.value = match.value
+
+    matches = cs.loadbalancers.lookup(args.query, sync=args.sync,
+                                      fetch_nodes=args.nodes)
+    for lb_id, error in sorted(cs.loadbalancers.lookup_errors.items()):
+        print("WARNING: nodes of loadbalancer %s not indexed: %s" % (
+              lb_id, error), file=sys.stderr)
+    inventory = cs.loadbalancers.inventory
+    rows = [Row(match, (inventory.get(match.id) or {}).get('status'))
+            for match in matches]
+    utils.print_list(rows, ['ID', 'Name', 'Status', 'Match', 'Value'])
 
 
 def _print_server(cs, args):
@@ -291,24 +497,216 @@ def do_show(cs, args):
     _print_server(cs, args)
 
 
-@utils.arg('server', metavar='<server>', nargs='+',
+@utils.arg('server', metavar='<server>', nargs='*',
            help='Name or ID of server(s).')
+@utils.arg('--journal',
+           default=None,
+           metavar='<file>',
+           help='Record the progress in <file>, so that an interrupted run '
+                'can be resumed with --resume.')
+@utils.arg('--resume',
+           default=None,
+           metavar='<file>',
+           help='Resume the deletes journaled in <file>, skipping those '
+                'done.')
 def do_delete(cs, args):
     """Immediately shut down and delete specified server(s)."""
-    failure_count = 0
+    delete_journal = None
+    if args.resume:
+        delete_journal = _open_journal(args.resume, 'delete')
+        args.server = [key for key, _entry in delete_journal.entries()]
+    elif args.journal:
+        delete_journal = _open_journal(args.journal, 'delete')
+    if not args.server:
+        raise exceptions.CommandError("you need to specify a loadbalancer")
+
+    # IDs are deleted as given, only names need to be looked up first.
+    names = [server for server in args.server
+             if not utils.is_integer_like(server)]
+    resolved = dict((outcome.item, outcome) for outcome in parallel.run(
+        lambda name: _find_server(cs, name).id, names))
 
+    failure_count = 0
+    ids = []
     for server in args.server:
-        try:
-            _find_server(cs, server).delete()
-        except Exception as e:
+        outcome = resolved.get(server)
+        if outcome is None:
+            ids.append(server)
+        elif outcome.ok:
+            ids.append(str(outcome.result))
+        else:
+            failure_count += 1
+            print(outcome.error)
+
+    try:
+        results = cs.loadbalancers.delete_many(ids, journal=delete_journal)
+    finally:
+        if delete_journal is not None:
+            delete_journal.close()
+    for lb_id in sorted(results, key=ids.index):
+        if not results[lb_id].ok:
             failure_count += 1
-            print(e)
+            print(results[lb_id].error)
 
     if failure_count == len(args.server):
         raise exceptions.CommandError("Unable to delete any of the specified "
                                       "loadbalancers.")
 
 
+@utils.arg('loadbalancer', metavar='<loadbalancer>',
+           help='Name or ID of loadbalancer.')
+def do_node_list(cs, args):
+    """List the nodes of a loadbalancer."""
+    loadbalancer = _find_server(cs, args.loadbalancer)
+    utils.print_list(cs.nodes.list(loadbalancer),
+                     ['ID', 'Address', 'Port', 'Condition', 'Weight',
+                      'Status'])
+
+
+@utils.arg('loadbalancer', metavar='<loadbalancer>',
+           help='Name or ID of loadbalancer.')
+@utils.arg('node', metavar='<address:port[:weight]>', nargs='+',
+           help='Node(s) to add; IPv6 addresses go in brackets, e.g. '
+                '[2001:db8::1]:80.')
+@utils.arg('--condition',
+           metavar='<condition>',
+           default='ENABLED',
+           help='Condition of the new nodes (default: ENABLED).')
+def do_node_add(cs, args):
+    """Add nodes to a loadbalancer, several per request."""
+    try:
+        nodes = [utils.parse_node_spec(node, condition=args.condition)
+                 for node in args.node]
+    except ValueError as e:
+        raise exceptions.CommandError(str(e))
+    loadbalancer = _find_server(cs, args.loadbalancer)
+    utils.print_list(cs.nodes.add(loadbalancer, nodes),
+                     ['ID', 'Address', 'Port', 'Condition', 'Weight',
+                      'Status'])
+
+
+@utils.arg('loadbalancer', metavar='<loadbalancer>',
+           help='Name or ID of loadbalancer.')
+@utils.arg('node', metavar='<node>', nargs='+',
+           help='ID of node(s) to delete.')
+def do_node_delete(cs, args):
+    """Delete nodes of a loadbalancer, several per request."""
+    loadbalancer = _find_server(cs, args.loadbalancer)
+    cs.nodes.delete(loadbalancer, args.node)
+
+
+@utils.arg('loadbalancer', metavar='<loadbalancer>', nargs='+',
+           help='Name or ID of loadbalancer(s).')
+@utils.arg('--status',
+           metavar='<status>',
+           action='append',
+           default=None,
+           help='Status to wait for, may be repeated (default: ACTIVE). '
+                'Use DELETED to wait for deletions.')
+@utils.arg('--timeout',
+           metavar='<seconds>',
+           type=float,
+           default=None,
+           help='Give up after this many seconds.')
+@utils.arg('--poll-interval',
+           metavar='<seconds>',
+           type=float,
+           default=1.0,
+           help='Initial delay between polls, it grows up to '
+                '--max-poll-interval.')
+@utils.arg('--max-poll-interval',
+           metavar='<seconds>',
+           type=float,
+           default=30.0,
+           help='Longest delay between polls.')
+def do_wait(cs, args):
+    """Wait for loadbalancer(s) to reach a status."""
+    class Row(object):
+        def __init__(self, result):
+            self.id = result.id
+            self.status = result.status
+            self.result = result.outcome
+            self.elapsed = '%.1f' % (result.elapsed or 0)
+
+    def print_transition(lb_id, old, new):
+        print("%s: %s -> %s" % (lb_id, old or '-', new))
+
+    target_states = [status.upper() for status in args.status or ['ACTIVE']]
+    # Names are always resolved: an unknown name would look DELETED.  IDs
+    # are waited for as given, one already gone counts as DELETED.
+    ids = []
+    for lb in args.loadbalancer:
+        if utils.is_integer_like(lb):
+            ids.append(lb)
+        else:
+            ids.append(_find_server(cs, lb).id)
+
+    results = cs.loadbalancers.wait_for(
+        ids, target_states, timeout=args.timeout,
+        on_transition=print_transition,
+        initial_interval=args.poll_interval,
+        max_interval=args.max_poll_interval)
+
+    rows = [Row(results[str(lb_id)]) for lb_id in ids]
+    utils.print_list(rows, ['ID', 'Status', 'Result', 'Elapsed'])
+    failed = [row.id for row in rows if row.result != 'done']
+    if failed:
+        raise exceptions.CommandError("Loadbalancer(s) %s did not reach %s."
+                                      % (', '.join(failed),
+                                         ' or '.join(target_states)))
+
+
+def _load_plan(cs, args):
+    try:
+        config = reconcile.load_config(args.file)
+        return reconcile.plan(cs, config, concurrency=args.concurrency)
+    except (IOError, ValueError) as e:
+        raise exceptions.CommandError(str(e))
+
+
+@utils.arg('-f', '--file',
+           metavar='<file>',
+           required=True,
+           help='YAML (needs PyYAML) or JSON file listing the loadbalancers.')
+@utils.arg('--concurrency',
+           metavar='<n>',
+           type=int,
+           default=parallel.DEFAULT_CONCURRENCY,
+           help='Loadbalancers fetched at a time.')
+def do_plan(cs, args):
+    """Show the changes needed to match a loadbalancer config."""
+    print(_load_plan(cs, args).format())
+
+
+@utils.arg('-f', '--file',
+           metavar='<file>',
+           required=True,
+           help='YAML (needs PyYAML) or JSON file listing the loadbalancers.')
+@utils.arg('--concurrency',
+           metavar='<n>',
+           type=int,
+           default=parallel.DEFAULT_CONCURRENCY,
+           help='Loadbalancers changed at a time.')
+def do_apply(cs, args):
+    """Change the loadbalancers to match a config."""
+    plan = _load_plan(cs, args)
+    print(plan.format())
+    if not plan.changed:
+        return
+    failed = plan.apply(concurrency=args.concurrency)
+    for lb in plan.changed:
+        if lb.create_outcome is not None and not lb.create_outcome.ok:
+            print("%s: create failed: %s" % (lb, lb.create_outcome.error))
+        for change in lb.changes:
+            if change.outcome is None:
+                continue
+            print("%s: %s: %s" % (lb, change, 'done' if change.outcome.ok
+                                  else change.outcome.error))
+    if failed or any(lb.create_outcome is not None and
+                     not lb.create_outcome.ok for lb in plan.changed):
+        raise exceptions.CommandError("Some changes failed.")
+
+
 def _find_server(cs, server):
     """Get a server by name or ID."""
     return utils.find_resource(cs.loadbalancers, server)
@@ -484,6 +882,43 @@ def do_x509_get_root_cert(cs, args):
         print("Wrote x509 root cert to %s" % args.filename)
 
 
+@utils.arg('files', metavar='<file>', nargs='+',
+           help='Request log(s) written with --request-log.')
+@utils.arg('--limit', metavar='<count>', type=int, default=None,
+           help='Only show the slowest <count> routes.')
+@utils.unauthenticated
+def do_log_analyze(cs, args):
+    """Summarize latency percentiles and error rates of request logs."""
+    class Row(object):
+        def __init__(self, row):
+            for key, value in row.items():
+                if isinstance(value, float):
+                    value = '%.4f' % value
+                setattr(self, key, value)
+
+    summary = requestlog.analyze(requestlog.read_records(args.files))
+    if args.limit:
+        summary = summary[:args.limit]
+    utils.print_list([Row(row) for row in summary],
+                     ['Route', 'Count', 'Errors', 'Error_Rate', 'P50', 'P90',
+                      'P99', 'Max', 'Retries'])
+
+
+@utils.arg('prefix', metavar='<prefix>', nargs='?', default='',
+           help='Only print values starting with <prefix>.')
+@utils.arg('--type', dest='cache_type', metavar='<type>',
+           choices=['human-id', 'uuid'], default='human-id',
+           help='Complete human-friendly ids (default) or UUIDs.')
+@utils.unauthenticated
+def do_complete(cs, args):
+    """Print cached loadbalancer ids for bash completion."""
+    values = completion.complete(base.get_cache_dir(), 'loadbalancer',
+                                 args.cache_type.replace('-', '_'),
+                                 args.prefix)
+    for value in values:
+        print(value)
+
+
 def ensure_service_catalog_present(cs):
     if not hasattr(cs.client, 'service_catalog'):
         # Turn off token caching and re-auth
@@ -0,0 +1,133 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Wait for many resources at once.
+
+Every tick fetches the whole collection with one (paged) listing instead
+of one GET per resource, so the request rate does not grow with the
+number of resources being waited for.
+"""
+
+import time
+
+
+# Pseudo status of a resource that is missing from the listing.
+DELETED = 'DELETED'
+
+DEFAULT_ERROR_STATES = ('ERROR',)
+
+
+class WaitResult(object):
+    """
+    The outcome of waiting for one resource.
+
+    :ivar status: last status seen (upper case), ``None`` if never seen.
+    :ivar transitions: ``[(seconds_since_start, old_status, new_status)]``.
+    :ivar outcome: ``'done'``, ``'error'`` or ``'timeout'``; ``None`` while
+                   still waiting.
+    """
+
+    def __init__(self, id):
+        self.id = id
+        self.status = None
+        self.transitions = []
+        self.outcome = None
+        self.elapsed = None
+
+    @property
+    def ok(self):
+        return self.outcome == 'done'
+
+    def __repr__(self):
+        return "<WaitResult %s: %s (%s)>" % (self.id, self.status,
+                                             self.outcome)
+
+
+class WaitError(Exception):
+    """A resource did not reach one of the target states."""
+
+    def __init__(self, result):
+        self.result = result
+        super(WaitError, self).__init__(
+            "%s is %s (%s)" % (result.id, result.status, result.outcome))
+
+
+def wait_for(list_fn, ids, target_states, timeout=None,
+             error_states=DEFAULT_ERROR_STATES, initial_interval=1.0,
+             max_interval=30.0, backoff=1.5, on_transition=None,
+             status_field='status', sleep=time.sleep, clock=time.time):
+    """
+    Poll ``list_fn()`` until every resource in ``ids`` reaches one of
+    ``target_states`` or one of ``error_states``, or ``timeout`` expires.
+
+    The interval between listings starts at ``initial_interval`` and grows
+    by ``backoff`` up to ``max_interval``: most transitions either happen
+    quickly or take minutes.  Resources missing from a listing have the
+    status :data:`DELETED`, so waiting for deletions works too; when
+    :data:`DELETED` is not a target state it counts as an error.
+
+    :param list_fn: callable returning every resource of interest.
+    :param on_transition: called as ``on_transition(id, old, new)`` on each
+                          status change, including the first status seen.
+    :returns: ``{id: WaitResult}`` keyed by ``str(id)``.
+    """
+    targets = set(state.upper() for state in target_states)
+    errors = set(state.upper() for state in error_states or ())
+    results = dict((str(id), WaitResult(str(id))) for id in ids)
+    pending = set(results)
+    start = clock()
+    deadline = start + timeout if timeout is not None else None
+    interval = initial_interval
+
+    while pending:
+        seen = {}
+        for resource in list_fn():
+            resource_id = str(getattr(resource, 'id', None))
+            if resource_id in pending:
+                status = getattr(resource, status_field, None)
+                seen[resource_id] = (status or '').upper()
+
+        now = clock()
+        for resource_id in sorted(pending):
+            result = results[resource_id]
+            status = seen.get(resource_id, DELETED)
+            if status != result.status:
+                result.transitions.append((now - start, result.status,
+                                           status))
+                if on_transition is not None:
+                    on_transition(resource_id, result.status, status)
+                result.status = status
+            if status in targets:
+                result.outcome = 'done'
+            elif status in errors or status == DELETED:
+                result.outcome = 'error'
+            else:
+                continue
+            result.elapsed = now - start
+            pending.discard(resource_id)
+
+        if not pending:
+            break
+        if deadline is not None and now >= deadline:
+            for resource_id in pending:
+                results[resource_id].outcome = 'timeout'
+                results[resource_id].elapsed = now - start
+            break
+
+        delay = interval
+        if deadline is not None:
+            delay = min(delay, deadline - now)
+        sleep(max(delay, 0))
+        interval = min(interval * backoff, max_interval)
+
+    return results
@@ -0,0 +1,356 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Run multi-step workflows over many loadbalancers.
+
+Each resource (usually a loadbalancer) has its own graph of steps, e.g.
+create, then add nodes, then set the health monitor.  A step starts once
+the steps it requires are done, so independent steps and different
+resources run concurrently, within one budget of worker threads and an
+optional rate of steps per second for the whole workflow.  When a step
+fails, the steps depending on it are cancelled.
+
+A step can wait for its loadbalancer to be ACTIVE again before counting
+as done.  Waiting does not hold a worker: one listing per poll serves
+every waiting step.
+
+Every step runs in an ``lbaas.workflow.step`` span of the client's tracer,
+so the API calls it makes nest under it.
+"""
+
+import collections
+import sys
+import threading
+import time
+
+from six.moves import queue
+
+from lbaasclient import base
+from lbaasclient import parallel
+from lbaasclient import waiter
+
+
+class StepCancelled(Exception):
+    """A step was not run because a step it requires failed."""
+
+    def __init__(self, resource, step, failed):
+        self.failed = failed
+        super(StepCancelled, self).__init__(
+            "%s: %s cancelled, %s failed" % (resource, step, failed))
+
+
+class ResourceState(object):
+    """
+    What the steps of one resource share, passed to each step function.
+
+    :ivar loadbalancer: the loadbalancer (or its id) waited for by steps
+                        with ``wait=True``.  A step creating it sets it.
+    :ivar results: ``{step name: return value}`` of the steps done.
+    """
+
+    def __init__(self, resource, loadbalancer=None):
+        self.resource = resource
+        self.loadbalancer = loadbalancer
+        self.results = {}
+
+
+class Step(object):
+
+    def __init__(self, state, name, fn, requires, wait):
+        self.state = state
+        self.name = name
+        self.fn = fn
+        self.requires = requires
+        self.wait = wait
+        self.dependents = []
+        self.pending = len(requires)
+        self.outcome = None
+
+    def __repr__(self):
+        return "<Step %s: %s>" % (self.state.resource, self.name)
+
+
+class Workflow(object):
+    """
+    Steps of many resources, run with :meth:`run`.
+
+    :param manager: the :class:`LoadbalancerManager` listed while steps
+                    wait for their loadbalancer to be ACTIVE.
+    :param concurrency: steps running at a time.
+    :param rate: most steps started per second, ``None`` for no limit.
+    :param timeout: longest wait of a step for its loadbalancer.
+    """
+
+    def __init__(self, manager, concurrency=parallel.DEFAULT_CONCURRENCY,
+                 rate=None, initial_interval=1.0, max_interval=10.0,
+                 backoff=1.5, timeout=None,
+                 error_states=waiter.DEFAULT_ERROR_STATES,
+                 sleep=time.sleep, clock=time.time):
+        self.manager = manager
+        self.concurrency = concurrency
+        self.pacer = parallel.Pacer(1.0 / rate, clock=clock,
+                                    sleep=sleep) if rate else None
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.error_states = set(state.upper() for state in error_states)
+        self._sleep = sleep
+        self._clock = clock
+        self._states = collections.OrderedDict()
+        self._steps = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._steps)
+
+    def resource(self, resource, loadbalancer=None):
+        """
+        Return the :class:`ResourceState` of ``resource``, setting its
+        loadbalancer if given.
+        """
+        state = self._states.get(resource)
+        if state is None:
+            state = self._states[resource] = ResourceState(resource)
+        if loadbalancer is not None:
+            state.loadbalancer = loadbalancer
+        return state
+
+    def add(self, resource, name, fn, requires=(), wait=False):
+        """
+        Add the step ``name`` of ``resource``.
+
+        :param fn: called as ``fn(state)`` with the :class:`ResourceState`.
+        :param requires: names of earlier steps of the same resource that
+                         must be done first.
+        :param wait: whether the step is done only once the resource's
+                     loadbalancer is ACTIVE again.
+        """
+        state = self.resource(resource)
+        if (resource, name) in self._steps:
+            raise ValueError("%s already has a step %s" % (resource, name))
+        required = []
+        for requirement in requires:
+            step = self._steps.get((resource, requirement))
+            if step is None:
+                raise ValueError("%s has no step %s" % (resource,
+                                                        requirement))
+            required.append(step)
+        step = Step(state, name, fn, required, wait)
+        for requirement in required:
+            requirement.dependents.append(step)
+        self._steps[(resource, name)] = step
+        return step
+
+    def run(self):
+        """
+        Run every step and clear the workflow.
+
+        :returns: ``{resource: {step name: Outcome}}`` with one
+                  :class:`lbaasclient.parallel.Outcome` per step; cancelled
+                  steps have a :class:`StepCancelled` error.
+        """
+        steps = list(self._steps.values())
+        self._states = collections.OrderedDict()
+        self._steps = collections.OrderedDict()
+        tracer = self.manager._tracer()
+        with tracer.span('lbaas.workflow', steps=len(steps)) as span:
+            _Run(self, tracer, steps).run()
+            counts = collections.Counter(
+                'done' if step.outcome.ok else
+                'cancelled' if isinstance(step.outcome.error, StepCancelled)
+                else 'failed' for step in steps)
+            for key in ('done', 'failed', 'cancelled'):
+                span.set_attribute(key, counts[key])
+
+        results = collections.OrderedDict()
+        for step in steps:
+            results.setdefault(step.state.resource, collections.OrderedDict())
+            results[step.state.resource][step.name] = step.outcome
+        return results
+
+
+class _Run(object):
+    """The state of one :meth:`Workflow.run`."""
+
+    def __init__(self, workflow, tracer, steps):
+        self.workflow = workflow
+        self.tracer = tracer
+        self.steps = steps
+        self.remaining = len(steps)
+        self.ready = queue.Queue()
+        self.cond = threading.Condition()
+        self.polls = 0
+        self.waiting = {}   # {step: (first poll to trust, started)}
+        self.interval = workflow.initial_interval
+
+    def run(self):
+        for step in self.steps:
+            if not step.pending:
+                self.ready.put(step)
+        threads = [threading.Thread(target=self._worker,
+                                    name='lbaas-workflow-%d' % i)
+                   for i in range(min(self.workflow.concurrency,
+                                      len(self.steps)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        with self.cond:
+            while self.remaining:
+                if self.waiting:
+                    self._poll()
+                else:
+                    self.cond.wait()
+        for thread in threads:
+            self.ready.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _worker(self):
+        while True:
+            step = self.ready.get()
+            if step is None:
+                return
+            if self.workflow.pacer is not None:
+                self.workflow.pacer.wait()
+            state = step.state
+            try:
+                with self.tracer.span('lbaas.workflow.step',
+                                      resource=str(state.resource),
+                                      step=step.name):
+                    result = step.fn(state)
+                if step.wait and state.loadbalancer is None:
+                    raise ValueError("%s: %s waits for a loadbalancer, but "
+                                     "none is set" % (state.resource,
+                                                      step.name))
+            except Exception as e:
+                outcome = parallel.Outcome(step, error=e,
+                                           exc_info=sys.exc_info())
+            else:
+                state.results[step.name] = result
+                outcome = parallel.Outcome(step, result)
+            with self.cond:
+                if outcome.ok and step.wait:
+                    self.waiting[step] = (self.polls + 1,
+                                          self.workflow._clock())
+                    step.outcome = outcome
+                    self.cond.notify_all()
+                else:
+                    self._finish(step, outcome)
+
+    def _finish(self, step, outcome):
+        # Called with the condition held.
+        step.outcome = outcome
+        self.remaining -= 1
+        for dependent in step.dependents:
+            if outcome.ok:
+                dependent.pending -= 1
+                if not dependent.pending:
+                    self.ready.put(dependent)
+            elif dependent.outcome is None:
+                failed = step.name if not isinstance(
+                    outcome.error, StepCancelled) else outcome.error.failed
+                self._finish(dependent, parallel.Outcome(
+                    dependent, error=StepCancelled(step.state.resource,
+                                                   dependent.name, failed)))
+        self.cond.notify_all()
+
+    def _poll(self):
+        # Called with the condition held; released while listing.
+        workflow = self.workflow
+        self.polls += 1
+        index = self.polls
+        interval = self.interval
+        self.cond.release()
+        try:
+            workflow._sleep(interval)
+            with self.tracer.span('lbaas.workflow.poll',
+                                  waiting=len(self.waiting)):
+                statuses = dict((str(lb.id), (lb.status or '').upper())
+                                for lb in workflow.manager.iterlist())
+            error = None
+        except Exception as e:
+            statuses, error = None, (e, sys.exc_info())
+        finally:
+            self.cond.acquire()
+
+        now = workflow._clock()
+        for step, (needed, started) in list(self.waiting.items()):
+            if index < needed:
+                continue
+            result = waiter.WaitResult(base.getid(step.state.loadbalancer))
+            result.elapsed = now - started
+            if error is not None:
+                outcome = parallel.Outcome(step, error=error[0],
+                                           exc_info=error[1])
+            else:
+                result.status = statuses.get(str(result.id), waiter.DELETED)
+                if result.status == 'ACTIVE':
+                    result.outcome = 'done'
+                elif (result.status in workflow.error_states or
+                        result.status == waiter.DELETED):
+                    result.outcome = 'error'
+                elif (workflow.timeout is not None and
+                        result.elapsed >= workflow.timeout):
+                    result.outcome = 'timeout'
+                else:
+                    continue
+                if result.ok:
+                    outcome = step.outcome
+                else:
+                    outcome = parallel.Outcome(
+                        step, error=waiter.WaitError(result))
+                outcome.wait_result = result
+            del self.waiting[step]
+            self._finish(step, outcome)
+
+        if self.waiting:
+            self.interval = min(interval * workflow.backoff,
+                                workflow.max_interval)
+        else:
+            self.interval = workflow.initial_interval
+
+
+def provision(workflow, cs, resource, template, nodes=None,
+              health_monitor=None, access_list=None):
+    """
+    Add the steps provisioning a new loadbalancer to ``workflow``: create
+    it from ``template`` (keyword arguments of ``create``), then add
+    ``nodes``, set ``health_monitor`` and add ``access_list``, waiting for
+    it to be ACTIVE after each step.
+
+    The steps are named ``create``, ``nodes``, ``health_monitor`` and
+    ``access_list``.
+    """
+    def create(state):
+        state.loadbalancer = cs.loadbalancers.create(
+            **dict(template, loaded=True))
+        return state.loadbalancer
+
+    workflow.add(resource, 'create', create, wait=True)
+    previous = 'create'
+    if nodes:
+        workflow.add(resource, 'nodes',
+                     lambda state: cs.nodes.add(state.loadbalancer, nodes),
+                     requires=[previous], wait=True)
+        previous = 'nodes'
+    if health_monitor:
+        workflow.add(resource, 'health_monitor',
+                     lambda state: cs.health_monitors.update(
+                         state.loadbalancer, **health_monitor),
+                     requires=[previous], wait=True)
+        previous = 'health_monitor'
+    if access_list:
+        workflow.add(resource, 'access_list',
+                     lambda state: cs.access_lists.add(state.loadbalancer,
+                                                       access_list),
+                     requires=[previous], wait=True)